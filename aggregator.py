@@ -0,0 +1,338 @@
+# File: aggregator.py
+#
+# 'python main.py aggregate PATHS' rolls up existing JSON reports (both
+# formats written by reporter.py) into a fleet compliance matrix: pass/fail
+# counts per rule, per OS and per compliance tag. Reports are streamed one
+# check at a time and counters live in flat arrays, so memory depends on the
+# number of distinct rules and OSes, not on the number of hosts or files.
+# Files are read in parallel by a process pool.
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Tuple
+
+from json_stream import CHUNK_SIZE, JsonStream
+
+REPORT_SUFFIXES = (".json", ".ndjson", ".jsonl")
+BATCH_SIZE = 256
+
+###################################################
+# Reading reports
+###################################################
+
+@contextmanager
+def open_report(path: str) -> Iterator[Tuple[dict, Iterator[dict]]]:
+    """
+    with open_report(path) as (header, checks): read a report file without
+    loading it whole. 'header' holds the top-level fields that precede
+    "checks" (host, os, ...), and 'checks' yields one check object at a
+    time while the block runs. Handles the indented document and the NDJSON
+    format. The file is closed when the block exits, however it exits.
+    """
+    with open(path, encoding="utf-8") as f:
+        first = f.readline(CHUNK_SIZE)
+        try:
+            record = json.loads(first)
+        except ValueError:
+            record = None
+        if isinstance(record, dict) and record.get("type") == "header":
+            yield record, _iter_ndjson_checks(f)
+            return
+        f.seek(0)
+        stream = JsonStream(f)
+        stream.expect("{")
+        header = {}
+        while stream.peek() not in ("}", ""):
+            key = stream.value()
+            stream.expect(":")
+            if key == "checks":
+                # Later top-level fields (timings) aren't needed for the roll-up
+                yield header, _iter_array(stream)
+                return
+            header[key] = stream.value()
+            if stream.peek() == ",":
+                stream.expect(",")
+        yield header, iter(())
+
+def _iter_ndjson_checks(f) -> Iterator[dict]:
+    for line in f:
+        if line.strip():
+            record = json.loads(line)
+            if record.get("type") == "check":
+                yield record
+
+def _iter_array(stream: JsonStream) -> Iterator[dict]:
+    stream.expect("[")
+    if stream.peek() == "]":
+        return
+    while True:
+        yield stream.value()
+        if stream.peek() != ",":
+            break
+        stream.expect(",")
+    stream.expect("]")
+
+###################################################
+# Counters
+###################################################
+
+def compliance_tags(compliance) -> Iterator[str]:
+    """'framework:control' for each control of a check's compliance list, e.g. 'cis:2.3.1.2'."""
+    for entry in compliance or []:
+        for framework, controls in entry.items():
+            for control in controls if isinstance(controls, list) else [controls]:
+                yield f"{framework}:{control}"
+
+class FleetCounters:
+    """
+    Compact roll-up state. Rules, OSes and compliance tags are numbered in
+    order of first appearance; pass/fail counts are array('q') columns
+    indexed by those numbers ('by_os' holds one pair of columns per OS).
+    """
+    def __init__(self):
+        self.rule_index = {}           # rule id -> row
+        self.titles = []               # row -> title
+        self.rule_tags = []            # row -> tag rows of the rule's compliance entries
+        self.rule_passed = array("q")
+        self.rule_failed = array("q")
+        self.os_index = {}             # os name -> column
+        self.os_hosts = array("q")
+        self.by_os = []                # column -> (passed array, failed array) by rule row
+        self.tag_index = {}            # "framework:control" -> row
+        self.tag_passed = array("q")
+        self.tag_failed = array("q")
+        self.reports = 0
+        self.errors = []               # (path, message) of unreadable files
+        self.skipped = 0               # JSON files that aren't scan reports
+
+    def _rule(self, rule_id, title, tags: Iterable[str]) -> int:
+        row = self.rule_index.get(rule_id)
+        if row is None:
+            row = self.rule_index[rule_id] = len(self.titles)
+            self.titles.append(title or "")
+            # A rule's compliance mapping is the same in every report, so its tags are resolved once
+            self.rule_tags.append(tuple(self._tag(tag) for tag in tags))
+            self.rule_passed.append(0)
+            self.rule_failed.append(0)
+            for passed, failed in self.by_os:
+                passed.append(0)
+                failed.append(0)
+        return row
+
+    def _os(self, os_name: str) -> int:
+        column = self.os_index.get(os_name)
+        if column is None:
+            column = self.os_index[os_name] = len(self.by_os)
+            rows = len(self.titles)
+            self.by_os.append((array("q", bytes(8 * rows)), array("q", bytes(8 * rows))))
+            self.os_hosts.append(0)
+        return column
+
+    def _tag(self, tag: str) -> int:
+        row = self.tag_index.get(tag)
+        if row is None:
+            row = self.tag_index[tag] = len(self.tag_passed)
+            self.tag_passed.append(0)
+            self.tag_failed.append(0)
+        return row
+
+    def add_report(self, header: dict, checks: Iterable[dict]):
+        """
+        Count one report. 'checks' is read to the end before anything is
+        counted, so a report that fails to parse part way (see add_file)
+        leaves the counters untouched.
+        """
+        rule_index = self.rule_index
+        passed_rows, failed_rows = [], []
+        new_rules = []   # (check, passed) for rules not seen yet, added once the report is complete
+        for check in checks:
+            row = rule_index.get(check.get("id"))
+            passed = check.get("status") == "PASS"
+            if row is None:
+                new_rules.append((check, passed))
+            elif passed:
+                passed_rows.append(row)
+            else:
+                failed_rows.append(row)
+        for check, passed in new_rules:
+            row = self._rule(check.get("id"), check.get("title"), compliance_tags(check.get("compliance")))
+            (passed_rows if passed else failed_rows).append(row)
+
+        column = self._os(str(header.get("os") or "Unknown"))
+        self.os_hosts[column] += 1
+        self.reports += 1
+        os_passed, os_failed = self.by_os[column]
+        for rows, rule_counts, os_counts, tag_counts in (
+                (passed_rows, self.rule_passed, os_passed, self.tag_passed),
+                (failed_rows, self.rule_failed, os_failed, self.tag_failed)):
+            for row in rows:
+                rule_counts[row] += 1
+                os_counts[row] += 1
+                for tag in self.rule_tags[row]:
+                    tag_counts[tag] += 1
+
+    def add_file(self, path: str):
+        try:
+            with open_report(path) as (header, checks):
+                if "host" not in header and "os" not in header:
+                    # fleet.json and other JSON files that aren't scan reports
+                    self.skipped += 1
+                    return
+                self.add_report(header, checks)
+        except (OSError, ValueError) as e:
+            self.errors.append((path, str(e)))
+
+    def merge(self, other: "FleetCounters"):
+        """Add another worker's counts into this one."""
+        os_columns = [self._os(name) for name in other.os_index]
+        for other_column, column in enumerate(os_columns):
+            self.os_hosts[column] += other.os_hosts[other_column]
+        for tag, other_row in other.tag_index.items():
+            row = self._tag(tag)
+            self.tag_passed[row] += other.tag_passed[other_row]
+            self.tag_failed[row] += other.tag_failed[other_row]
+        other_tags = list(other.tag_index)
+        for rule_id, other_row in other.rule_index.items():
+            row = self._rule(rule_id, other.titles[other_row],
+                             [other_tags[t] for t in other.rule_tags[other_row]])
+            self.rule_passed[row] += other.rule_passed[other_row]
+            self.rule_failed[row] += other.rule_failed[other_row]
+            for other_column, column in enumerate(os_columns):
+                self.by_os[column][0][row] += other.by_os[other_column][0][other_row]
+                self.by_os[column][1][row] += other.by_os[other_column][1][other_row]
+        self.reports += other.reports
+        self.errors.extend(other.errors)
+        self.skipped += other.skipped
+
+    def to_dict(self) -> dict:
+        """The compliance matrix: rules x OS, compliance tags and per-OS totals."""
+        os_names = list(self.os_index)
+        return {
+            "reports": self.reports,
+            "os": {
+                name: {
+                    "hosts": self.os_hosts[column],
+                    "passed": sum(self.by_os[column][0]),
+                    "failed": sum(self.by_os[column][1])
+                }
+                for name, column in self.os_index.items()
+            },
+            "rules": [
+                {
+                    "id": rule_id,
+                    "title": self.titles[row],
+                    "passed": self.rule_passed[row],
+                    "failed": self.rule_failed[row],
+                    "by_os": {name: [self.by_os[column][0][row], self.by_os[column][1][row]]
+                              for column, name in enumerate(os_names)
+                              if self.by_os[column][0][row] or self.by_os[column][1][row]}
+                }
+                for rule_id, row in sorted(self.rule_index.items(), key=lambda item: str(item[0]))
+            ],
+            "compliance": {
+                tag: {"passed": self.tag_passed[row], "failed": self.tag_failed[row]}
+                for tag, row in sorted(self.tag_index.items())
+            },
+            "errors": [{"file": path, "error": message} for path, message in self.errors],
+            "skipped_files": self.skipped
+        }
+
+    def write_csv(self, path: str):
+        """Rule x OS matrix of pass percentages (empty where no host of that OS ran the rule)."""
+        os_names = list(self.os_index)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["rule_id", "title", "passed", "failed"] + os_names)
+            for rule_id, row in sorted(self.rule_index.items(), key=lambda item: str(item[0])):
+                cells = []
+                for column in range(len(os_names)):
+                    passed, failed = self.by_os[column][0][row], self.by_os[column][1][row]
+                    cells.append(f"{passed / (passed + failed) * 100:.1f}" if passed + failed else "")
+                writer.writerow([rule_id, self.titles[row], self.rule_passed[row], self.rule_failed[row]] + cells)
+
+###################################################
+# Command line
+###################################################
+
+def report_files(paths: List[str]) -> Iterator[str]:
+    """Report files named directly, plus every .json/.ndjson/.jsonl file under the directories."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, _, names in os.walk(path):
+            for name in sorted(names):
+                if name.lower().endswith(REPORT_SUFFIXES):
+                    yield os.path.join(root, name)
+
+def _batches(files: Iterator[str]) -> Iterator[List[str]]:
+    batch = []
+    for path in files:
+        batch.append(path)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def aggregate_files(paths: List[str]) -> FleetCounters:
+    """Worker task: counters for one batch of files."""
+    counters = FleetCounters()
+    for path in paths:
+        counters.add_file(path)
+    return counters
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="main.py aggregate",
+                                     description="Roll up existing JSON scan reports into a fleet compliance matrix")
+    parser.add_argument("paths", nargs="+", help="Report files or directories searched for *.json/*.ndjson/*.jsonl")
+    parser.add_argument("--output", default="./output/fleet_matrix.json", help="Where to write the matrix (JSON)")
+    parser.add_argument("--csv", default="", help="Also write a rule x OS pass-percentage matrix as CSV")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Processes reading files (default: number of CPUs)")
+    args = parser.parse_args(argv)
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+
+    start = time.monotonic()
+    counters = FleetCounters()
+    batches = _batches(report_files(args.paths))
+    if args.processes == 1:
+        for batch in batches:
+            counters.merge(aggregate_files(batch))
+    else:
+        with ProcessPoolExecutor(args.processes) as pool:
+            # Only lists of paths are queued; each worker sends back one small FleetCounters per batch
+            for partial in pool.map(aggregate_files, batches):
+                counters.merge(partial)
+    elapsed = time.monotonic() - start
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(counters.to_dict(), f, indent=2)
+    if args.csv:
+        os.makedirs(os.path.dirname(args.csv) or ".", exist_ok=True)
+        counters.write_csv(args.csv)
+
+    for path, message in counters.errors[:20]:
+        print(f"  {path}: {message}")
+    if len(counters.errors) > 20:
+        print(f"  ... and {len(counters.errors) - 20} more unreadable file(s)")
+    rate = counters.reports / elapsed if elapsed else 0
+    print(f"Aggregated {counters.reports} report(s) in {elapsed:.2f}s ({rate:,.0f} reports/s): "
+          f"{len(counters.rule_index)} rules, {len(counters.os_index)} OS(es), "
+          f"{len(counters.tag_index)} compliance tags")
+    print(f"Fleet matrix saved to: {args.output}")
+    if args.csv:
+        print(f"CSV matrix saved to: {args.csv}")
+    return 1 if counters.errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
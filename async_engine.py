@@ -0,0 +1,166 @@
+# File: async_engine.py
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from commands import DEFAULT_COMMAND_TIMEOUT, run_command_async
+from evaluator import RuleResult, evaluate_rule, evaluate_subrule_cached, condition_decided
+from executor import ExecResult
+from rule_compiler import rule_compiled
+from sca_structs import CompiledSubRule, Rule
+
+class AsyncScanner:
+    """
+    asyncio execution engine. Every check runs as its own task on an event
+    loop in a background thread, so checks waiting on commands overlap
+    instead of queueing behind each other.
+    Every sub-rule goes through the scan's 'execute' (with its dedup and
+    incremental wrappers), called on a thread pool so it never blocks the
+    loop. Commands plug in beneath it: a CommandCache whose run is
+    run_command() starts them with asyncio.create_subprocess_shell on the
+    loop, at most 'concurrency' at a time, each limited to 'timeout' seconds
+    and all of them to the 'scan_timeout' budget; a command that runs out of
+    time is killed and its sub-rule gets a 'Timeout: ...' error, which fails
+    it like any other error.
+    The loop starts on first use (run() or run_command()); close() it at the
+    end of the scan.
+    """
+    def __init__(
+        self,
+        concurrency: int = 16,
+        timeout: Optional[float] = DEFAULT_COMMAND_TIMEOUT,
+        scan_timeout: Optional[float] = None,
+        profiler=None,
+        verdicts=None
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.scan_timeout = scan_timeout
+        self.verdicts = verdicts   # passed on to evaluate_rule
+        self.profiler = profiler if profiler is not None and profiler.detailed else None
+        self.spawns = 0
+        self.timeouts = 0
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._start_lock = threading.Lock()
+        self._semaphore = None   # created on the loop
+        self._deadline = None    # loop time the scan budget runs out, set by run()
+
+    def _started_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                # Threads blocked on a command (up to 'concurrency' running, more waiting
+                # for their turn) leave as many again for registry and file sub-rules
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency * 2)
+                self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, rules: List[Rule], execute: Callable[[CompiledSubRule], ExecResult],
+            exhaustive: bool = False) -> Iterator[RuleResult]:
+        """
+        Execute and evaluate 'rules', yielding each RuleResult in rule order
+        as soon as it (and every rule before it) is ready.
+        """
+        loop = self._started_loop()
+        if self.scan_timeout:
+            self._deadline = loop.time() + self.scan_timeout
+        futures = [asyncio.run_coroutine_threadsafe(self._run_rule(rule, execute, exhaustive), loop)
+                   for rule in rules]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # The consumer stopped early (or a rule raised): don't leave checks running
+            for future in futures:
+                future.cancel()
+
+    def run_command(self, command: str) -> Tuple[str, str]:
+        """
+        Blocking (output, error) for 'command', run on the loop; the 'run' of
+        a CommandCache. Call it from any thread but the loop's own.
+        """
+        loop = self._started_loop()
+        return asyncio.run_coroutine_threadsafe(self._run_command(command), loop).result()
+
+    def stats(self) -> str:
+        return f"commands run {self.spawns}, timed out {self.timeouts}"
+
+    def close(self):
+        with self._start_lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._executor.shutdown()
+            self._loop = None
+
+    async def _run_rule(self, rule: Rule, execute: Callable[[CompiledSubRule], ExecResult],
+                        exhaustive: bool) -> RuleResult:
+        start = time.monotonic()
+        exec_results = []
+        passed = failed = 0
+        for sub_rule in rule_compiled(rule):
+            r_exec = await self._execute(sub_rule, execute)
+            exec_results.append(r_exec)
+            if exhaustive:
+                continue
+            # Same early stop as evaluate_rule, so later sub-rules aren't started
+            if evaluate_subrule_cached(r_exec, sub_rule, self.verdicts)[0]:
+                passed += 1
+            else:
+                failed += 1
+            if condition_decided(rule.condition, passed, failed):
+                break
+        r_result = evaluate_rule(rule, exec_results, exhaustive=exhaustive, verdicts=self.verdicts)
+        if self.profiler is not None:
+            self.profiler.record_rule(rule.id, rule.title, time.monotonic() - start)
+        return r_result
+
+    async def _execute(self, sub_rule: CompiledSubRule, execute: Callable[[CompiledSubRule], ExecResult]) -> ExecResult:
+        start = time.monotonic()
+        r_exec = await asyncio.get_running_loop().run_in_executor(self._executor, execute, sub_rule)
+        if self.profiler is not None:
+            self.profiler.record_subrule(sub_rule.kind, time.monotonic() - start)
+        return r_exec
+
+    def _remaining(self) -> Optional[float]:
+        """Seconds left in the scan budget, or None without one."""
+        if self._deadline is None:
+            return None
+        return self._deadline - asyncio.get_running_loop().time()
+
+    async def _run_command(self, command: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        budget_error = f"Timeout: scan time budget of {self.scan_timeout}s exhausted"
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            self.timeouts += 1
+            return "", budget_error
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), remaining)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return "", budget_error
+        try:
+            timeout = self.timeout
+            remaining = self._remaining()
+            limited_by_budget = remaining is not None and (timeout is None or remaining < timeout)
+            if limited_by_budget:
+                timeout = max(remaining, 0)
+            self.spawns += 1
+            output, error = await run_command_async(command, timeout)
+        finally:
+            self._semaphore.release()
+        if error.startswith("Timeout:"):
+            self.timeouts += 1
+            if limited_by_budget:
+                error = budget_error
+        return output, error
@@ -0,0 +1,73 @@
+# File: benchmarks/bench_html_report.py
+#
+# Renders the HTML report for N synthetic RuleResults (default 100k) and
+# reports wall time, output size and peak Python memory (tracemalloc).
+# Results are produced by a generator, so peak memory should stay flat as N grows.
+# Usage: python benchmarks/bench_html_report.py [--checks N] [--out PATH]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from evaluator import RuleResult
+from reporter import write_enhanced_html_report
+
+LONG_TEXT = ("This policy setting determines whether local accounts that are not password "
+             "protected can be used to log on from locations other than the physical console. ") * 4
+
+def synthetic_results(count: int):
+    """Yield 'count' RuleResults with realistic text lengths; every 4th one fails."""
+    for i in range(count):
+        yield RuleResult(
+            rule_id=15000 + i,
+            title=f"Ensure synthetic setting {i} is set to 'Enabled'",
+            status="FAIL" if i % 4 == 0 else "PASS",
+            details="1/1 sub-rules passed",
+            description=LONG_TEXT,
+            rationale=LONG_TEXT,
+            remediation=LONG_TEXT,
+            compliance=[{"cis": ["2.3.1.4"]}, {"pci_dss": ["8.2"]}],
+            condition="all"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML report rendering benchmark")
+    parser.add_argument("--checks", type=int, default=100_000, help="Number of synthetic results")
+    parser.add_argument("--out", default="", help="Output file (default: a temp file, removed afterwards)")
+    args = parser.parse_args()
+
+    out_path = args.out or os.path.join(tempfile.mkdtemp(), "report.html")
+    failed = (args.checks + 3) // 4
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    write_enhanced_html_report(
+        results=synthetic_results(args.checks),
+        host="bench-host",
+        os_name="Windows 10",
+        passed_count=args.checks - failed,
+        failed_count=failed,
+        html_path=out_path,
+        benchmark_name="Synthetic benchmark"
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = os.path.getsize(out_path)
+    print(f"Checks:      {args.checks}")
+    print(f"Wall time:   {elapsed:.2f}s ({args.checks / elapsed:,.0f} rows/s)")
+    print(f"Output size: {size / 1e6:.1f} MB")
+    print(f"Peak memory: {peak / 1e6:.2f} MB (tracemalloc)")
+
+    if not args.out:
+        os.remove(out_path)
+        os.rmdir(os.path.dirname(out_path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# File: benchmarks/bench_incremental.py
+#
+# Incremental rescans (--incremental) of the shipped checks against a
+# FakeRegistryBackend, whose keys carry last write timestamps. Scans run like
+# main.py's: policy requirements first (the fake host is Windows 10), then
+# the applicable checks. A first scan writes the state; then a few keys are
+# rewritten (new timestamp, sometimes a new value) and the host is scanned
+# again incrementally and in full.
+# Prints, per scan, the registry calls a live registry would get (the fake
+# counts an enumeration as one call; winreg pays a QueryInfoKey plus one
+# EnumValue per value, counted here as such), the values read, and the best
+# time of --repeat runs, and checks that the incremental results equal the
+# full rescan. Against the in-memory fake, time is the scanner's own CPU
+# cost: loading, comparing and saving the state can outweigh the registry
+# work it saves, which a live registry charges much more for.
+# Usage: python benchmarks/bench_incremental.py [--rules DIR] [--changed-keys N] [--repeat N]
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parser import load_all_policies
+from executor import execute_subrule, group_registry_subrules, prefetch_registry
+from registry import RegistryReader, FakeRegistryBackend
+from rule_compiler import rule_compiled
+from evaluator import applicable_policies, run_checks
+from subrule_index import SubRuleIndex
+from incremental import IncrementalState, merge_results
+
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rules", "windows")
+VALUES = [0, 1, 2, "1"]
+HOST_KEYS = {
+    r"HKLM\SOFTWARE\Microsoft\Windows NT\CurrentVersion": {"ProductName": "Windows 10 Enterprise"},
+    r"HKLM\SAM\SAM": {},
+}
+
+def fake_registry(groups, rng: random.Random) -> dict:
+    """Registry data holding about 90% of the referenced values."""
+    data = {f"{hive}\\{path}": {name: rng.choice(VALUES) for name in names if rng.random() < 0.9}
+            for (hive, path), names in groups.items()}
+    for key_path, values in HOST_KEYS.items():
+        data.setdefault(key_path, {}).update(values)
+    return data
+
+def scan(policies, backend: FakeRegistryBackend, state_path: str = ""):
+    """One scan of the applicable checks, incremental when 'state_path' is given."""
+    backend.calls.clear()
+    start = time.perf_counter()
+    registry = RegistryReader(backend)
+    index = SubRuleIndex(policies)
+
+    def execute(sub_rule):
+        return execute_subrule(sub_rule, registry)
+
+    state = None
+    if state_path:
+        state = IncrementalState(state_path, "bench-host", exhaustive=False)
+        execute = state.wrap(execute)
+    execute = index.wrap(execute)
+    rules, _ = applicable_policies(policies, execute)
+    scan_rules = rules
+    if state is not None:
+        state.refresh(registry, (s for rule in rules for s in rule_compiled(rule)))
+        state.seed_verdicts(index.verdicts)
+        stored = state.stored_results(rules)
+        scan_rules = [rule for rule, r_result in zip(rules, stored) if r_result is None]
+    to_read = (s for rule in scan_rules for s in rule_compiled(rule))
+    prefetch_registry(registry, filter(state.needs_read, to_read) if state else to_read)
+    results = run_checks(scan_rules, execute, verdicts=index.verdicts)
+    if state is not None:
+        results = list(merge_results(stored, results))
+        state.update(rules, results, index.verdicts)
+        state.save()
+    results = [(r.rule_id, r.status, r.details) for r in results]
+    seconds = time.perf_counter() - start
+    calls = dict(backend.calls, values_enumerated=registry.values_enumerated,
+                 values_read=registry.value_misses + registry.values_enumerated)
+    registry.close()
+    return results, seconds, calls, state
+
+def best_of(repeat: int, policies, backend: FakeRegistryBackend, state_path: str = ""):
+    """scan() 'repeat' times from the same starting state; the last run's outcome with the best time."""
+    saved = None
+    if state_path and os.path.exists(state_path):
+        with open(state_path, "rb") as f:
+            saved = f.read()
+    best = None
+    for _ in range(repeat):
+        if saved is not None:
+            with open(state_path, "wb") as f:
+                f.write(saved)
+        results, seconds, calls, state = scan(policies, backend, state_path)
+        best = seconds if best is None else min(best, seconds)
+    return results, best, calls, state
+
+def print_scan(label: str, seconds: float, calls: dict, state=None):
+    # Live cost: each enumeration is a QueryInfoKey plus an EnumValue per value
+    total = sum(n for name, n in calls.items()
+                if name not in ("close_key", "values_read", "values_enumerated")) + calls["values_enumerated"]
+    line = f"  {label:<22} {total:6} registry calls  {calls['values_read']:6} values read  {seconds * 1000:7.1f} ms"
+    if state is not None:
+        line += f"  ({state.stats()})"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental rescan benchmark")
+    parser.add_argument("--rules", default=DEFAULT_RULES, help="Directory containing .yml rule files")
+    parser.add_argument("--changed-keys", type=int, default=5, help="Keys rewritten between the scans")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scan; the best time is shown")
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    policies = load_all_policies(args.rules)
+    groups = group_registry_subrules(s for sca_file in policies for rule in sca_file.checks
+                                     for s in rule_compiled(rule))
+    backend = FakeRegistryBackend(fake_registry(groups, rng))
+    applicable, _ = applicable_policies(policies, lambda s: execute_subrule(s, RegistryReader(backend)))
+    applicable_groups = group_registry_subrules(s for rule in applicable for s in rule_compiled(rule))
+    print(f"{sum(len(p.checks) for p in policies)} checks over {len(groups)} registry keys; "
+          f"{len(applicable)} checks over {len(applicable_groups)} keys apply to the host, "
+          f"{args.changed_keys} of them rewritten between scans")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_incremental_")
+    state_path = os.path.join(work_dir, "state.json")
+    try:
+        _, seconds, calls, state = scan(policies, backend, state_path)
+        print_scan("first scan", seconds, calls, state)
+        _, seconds, calls, state = best_of(args.repeat, policies, backend, state_path)
+        print_scan("nothing changed", seconds, calls, state)
+
+        for hive, path in rng.sample(sorted(applicable_groups), args.changed_keys):
+            names = sorted(applicable_groups[(hive, path)])
+            backend.set_key(f"{hive}\\{path}", {rng.choice(names): rng.choice(VALUES)} if names else {})
+        incremental, seconds, calls, state = best_of(args.repeat, policies, backend, state_path)
+        print_scan("incremental rescan", seconds, calls, state)
+        full, seconds, calls, _ = best_of(args.repeat, policies, backend)
+        print_scan("full rescan", seconds, calls)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if incremental != full:
+        raise SystemExit("Incremental results differ from the full rescan")
+
+if __name__ == "__main__":
+    main()
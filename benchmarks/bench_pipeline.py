@@ -0,0 +1,249 @@
+# File: benchmarks/bench_pipeline.py
+#
+# End-to-end scan benchmark on synthetic Wazuh-style policies (1k/10k/100k
+# checks by default) against an in-memory FakeRegistryBackend: parse + compile,
+# requirements, execute + evaluate, HTML and JSON reports.
+# Synthetic checks are cloned from the shipped rules, so the sub-rule count per
+# check, the conditions, the content patterns and the key reuse follow them;
+# about half of the sub-rules get a new value name under the same key.
+# Each size runs in a fresh subprocess so peak RSS is per size.
+# Results (checks/s, peak RSS, per-stage seconds) are written as JSON with the
+# git commit, for comparing runs across commits with --compare.
+# Usage: python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000] [--output PATH]
+#                                            [--compare OLD.json] [--workers N]
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_DIR)
+
+import yaml
+
+from parser import load_all_policies
+from executor import execute_subrule, prefetch_registry
+from registry import RegistryReader, FakeRegistryBackend
+from rule_compiler import rule_compiled, compile_subrule
+from profiling import Profiler
+from evaluator import run_checks, applicable_policies
+from reporter import write_enhanced_json_report, write_enhanced_html_report
+
+SHIPPED_RULES = os.path.join(REPO_DIR, "rules", "windows")
+DEFAULT_SIZES = "1000,10000,100000"
+CHECKS_PER_FILE = 5000
+SEED = 1234
+
+# Values the fake registry hands out; a mix of DWORDs and strings so that
+# literal, regex and numeric matchers all see passes and failures.
+VALUE_POOL = [0, 1, 1, 2, 3, 4, 5, 15, 30, 60, 900, 32768, "0", "1", "Enabled",
+              "Administrators", "*S-1-5-32-544", ["line one", "line two"]]
+MISSING_VALUE_RATE = 0.1
+NEW_VALUE_RATE = 0.5
+
+###################################################
+# Synthetic rule sets
+###################################################
+
+def shipped_templates():
+    """(condition, [compiled registry sub-rules]) for every shipped check that only reads the registry."""
+    templates = []
+    for sca_file in load_all_policies(SHIPPED_RULES):
+        for rule in sca_file.checks:
+            compiled = rule_compiled(rule)
+            if compiled and all(c.kind == "r" and not c.error for c in compiled):
+                templates.append((rule.condition, compiled))
+    return templates
+
+def synthetic_subrule(compiled, check_no: int, rng: random.Random) -> str:
+    """Re-emit a shipped sub-rule, sometimes under a new value name on the same key."""
+    parts = compiled.raw.split("->")
+    if len(parts) > 2 and rng.random() < NEW_VALUE_RATE:
+        parts[1] = f" {compiled.value_name}{check_no % 97} "
+    return "->".join(parts).strip()
+
+def generate_rules(rules_dir: str, checks: int, seed: int = SEED) -> dict:
+    """
+    Write 'checks' synthetic checks into policy files of CHECKS_PER_FILE
+    checks each; returns the fake registry data matching them.
+    """
+    rng = random.Random(seed)
+    templates = shipped_templates()
+    registry_data = {}
+    lorem = "This policy setting determines how the system behaves. " * 3
+    check_no = 0
+    file_no = 0
+    while check_no < checks:
+        file_checks = []
+        for _ in range(min(CHECKS_PER_FILE, checks - check_no)):
+            condition, compiled = rng.choice(templates)
+            sub_rules = [synthetic_subrule(c, check_no, rng) for c in compiled]
+            for sub_rule in sub_rules:
+                add_registry_value(registry_data, compile_subrule(sub_rule), rng)
+            file_checks.append({
+                "id": 100000 + check_no,
+                "title": f"Ensure synthetic setting {check_no} is configured",
+                "description": lorem,
+                "rationale": lorem,
+                "remediation": lorem,
+                "compliance": [{"cis": [f"{check_no % 19}.{check_no % 7}.{check_no % 5}"]},
+                               {"pci_dss": ["8.1"]}],
+                "condition": condition,
+                "rules": sub_rules
+            })
+            check_no += 1
+        policy = {
+            "policy": {"id": f"synthetic_{file_no}", "file": f"synthetic_{file_no}.yml",
+                       "name": f"Synthetic benchmark {file_no}", "description": "Generated by bench_pipeline.py"},
+            "requirements": {"title": "Synthetic host", "description": "Always matches", "condition": "all",
+                             "rules": ["r:HKLM\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion -> ProductName -> r:^Windows"]},
+            "checks": file_checks
+        }
+        with open(os.path.join(rules_dir, f"synthetic_{file_no}.yml"), "w", encoding="utf-8") as f:
+            yaml.dump(policy, f, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper), sort_keys=False)
+        file_no += 1
+
+    registry_data["HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion"] = {
+        "ProductName": "Windows 10 Enterprise"}
+    return registry_data
+
+def add_registry_value(registry_data: dict, compiled, rng: random.Random):
+    """Create the sub-rule's key; most referenced values exist, with a value drawn from VALUE_POOL."""
+    values = registry_data.setdefault(f"{compiled.hive}\\{compiled.path}", {})
+    if compiled.value_name and compiled.value_name not in values and rng.random() >= MISSING_VALUE_RATE:
+        values[compiled.value_name] = rng.choice(VALUE_POOL)
+
+###################################################
+# One measured run
+###################################################
+
+def run_pipeline(checks: int, workers: int) -> dict:
+    """Generate, then scan 'checks' synthetic checks; returns the measurements for this size."""
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    rules_dir = os.path.join(work_dir, "rules")
+    os.makedirs(rules_dir)
+    try:
+        registry_data = generate_rules(rules_dir, checks)
+        # Peak RSS so far covers generation; the scan itself is reported on top of it
+        rss_before = peak_rss_mb()
+        backend = FakeRegistryBackend(registry_data)
+        del registry_data
+
+        profiler = Profiler()
+        start = time.perf_counter()
+        with profiler.stage("load_rules"):
+            policies = load_all_policies(rules_dir)
+        registry = RegistryReader(backend)
+
+        def execute(sub_rule):
+            return execute_subrule(sub_rule, registry)
+
+        with profiler.stage("requirements"):
+            all_rules, _ = applicable_policies(policies, execute)
+
+        with profiler.stage("execute_evaluate"):
+            prefetch_registry(registry, (s for rule in all_rules for s in rule_compiled(rule)))
+            results = list(run_checks(all_rules, execute, workers=workers))
+        passed = sum(1 for r in results if r.status == "PASS")
+        failed = len(results) - passed
+
+        report_args = dict(results=results, host="bench-host", os_name="Windows 10",
+                           passed_count=passed, failed_count=failed, benchmark_name="Synthetic benchmark")
+        with profiler.stage("report_html"):
+            write_enhanced_html_report(html_path=os.path.join(work_dir, "report.html"), **report_args)
+        with profiler.stage("report_json"):
+            write_enhanced_json_report(json_path=os.path.join(work_dir, "scan.json"), **report_args)
+        total = time.perf_counter() - start
+
+        return {
+            "checks": len(all_rules),
+            "subrules": sum(len(rule.rules) for rule in all_rules),
+            "registry_keys": len(backend.keys),
+            "passed": passed,
+            "failed": failed,
+            "seconds": round(total, 4),
+            "checks_per_second": round(len(all_rules) / total, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "peak_rss_before_scan_mb": round(rss_before, 1),
+            "stages": {name: round(seconds, 4) for name, seconds in profiler.stages.items()},
+            "registry_calls": dict(backend.calls)
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+###################################################
+# Driver
+###################################################
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def print_run(run: dict, baseline: dict = None):
+    line = (f"{run['checks']:>8} checks  {run['seconds']:8.2f}s  {run['checks_per_second']:>10,.0f} checks/s  "
+            f"peak RSS {run['peak_rss_mb']:7.1f} MB")
+    if baseline:
+        change = (run["checks_per_second"] / baseline["checks_per_second"] - 1) * 100
+        line += f"  ({change:+.1f}% checks/s vs {baseline['checks_per_second']:,.0f})"
+    print(line)
+    print("          " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in run["stages"].items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end scan benchmark on synthetic rule sets")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated check counts")
+    parser.add_argument("--workers", type=int, default=1, help="Worker threads for execute+evaluate")
+    parser.add_argument("--output", default="./output/bench_pipeline.json", help="Where to write the results")
+    parser.add_argument("--compare", default="", help="Earlier results file to compare against")
+    parser.add_argument("--single", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        # Child process: one size, result as JSON on stdout
+        print(json.dumps(run_pipeline(args.single, args.workers)))
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {run["checks"]: run for run in json.load(f)["runs"]}
+
+    runs = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                          "--single", str(size), "--workers", str(args.workers)], text=True)
+        run = json.loads(output.splitlines()[-1])
+        runs.append(run)
+        print_run(run, baseline.get(run["checks"]))
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workers": args.workers,
+        "runs": runs
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
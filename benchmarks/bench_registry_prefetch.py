@@ -0,0 +1,68 @@
+# File: benchmarks/bench_registry_prefetch.py
+#
+# Counts registry backend calls for every r: sub-rule of the shipped rules
+# against a FakeRegistryBackend, with per-value reads (read_batch) and with
+# the prefetch planner (one enumeration per referenced key).
+# Each key also gets a few values no rule references, as real keys do.
+# The fake counts an enumeration as one call; on a live registry each
+# value of an enumerated key costs a winreg.EnumValue call.
+# Usage: python benchmarks/bench_registry_prefetch.py [--rules DIR] [--extra-values N]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parser import load_all_policies
+from executor import execute_subrule, group_registry_subrules, plan_registry_prefetch, prefetch_registry
+from registry import RegistryReader, FakeRegistryBackend
+
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rules", "windows")
+
+def fake_registry(groups, extra_values: int, rng: random.Random) -> dict:
+    """Registry data holding about 90% of the referenced values plus 'extra_values' others per key."""
+    data = {}
+    for (hive, path), names in groups.items():
+        values = {name: rng.choice([0, 1, 2, "1"]) for name in names if rng.random() < 0.9}
+        values.update({f"Unreferenced{i}": i for i in range(extra_values)})
+        data[f"{hive}\\{path}"] = values
+    return data
+
+def scan(sub_rules, data: dict, warm_up: str):
+    backend = FakeRegistryBackend(data)
+    registry = RegistryReader(backend)
+    start = time.perf_counter()
+    if warm_up == "read_batch":
+        registry.read_batch(group_registry_subrules(sub_rules))
+    else:
+        prefetch_registry(registry, sub_rules)
+    results = [execute_subrule(s, registry) for s in sub_rules]
+    return backend.calls, time.perf_counter() - start, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Registry prefetch call-count benchmark")
+    parser.add_argument("--rules", default=DEFAULT_RULES, help="Directory containing .yml rule files")
+    parser.add_argument("--extra-values", type=int, default=5, help="Unreferenced values per key")
+    args = parser.parse_args()
+
+    sub_rules = [s for sca_file in load_all_policies(args.rules)
+                 for rule in [sca_file.requirements] + sca_file.checks
+                 for s in rule.compiled if s.kind == "r"]
+    groups = group_registry_subrules(sub_rules)
+    data = fake_registry(groups, args.extra_values, random.Random(1234))
+    print(f"{len(sub_rules)} r: sub-rules over {len(groups)} keys "
+          f"({len(plan_registry_prefetch(sub_rules))} planned for enumeration)")
+
+    outcomes = {}
+    for warm_up in ("read_batch", "prefetch"):
+        calls, seconds, outcomes[warm_up] = scan(sub_rules, data, warm_up)
+        total = sum(n for name, n in calls.items() if name != "close_key")
+        print(f"  {warm_up:<10} {total:6} backend calls  {seconds * 1000:7.1f} ms  {dict(calls)}")
+    if outcomes["read_batch"] != outcomes["prefetch"]:
+        raise SystemExit("Prefetched results differ from per-value reads")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# File: benchmarks/bench_shell_worker.py
+#
+# Per-command latency of spawn_command (a new shell per command) against a
+# persistent ShellWorkerPool, on the same list of distinct commands so the
+# per-scan command cache never kicks in. POSIX only, like the workers.
+# Usage: python benchmarks/bench_shell_worker.py [--commands N] [--command TEMPLATE]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from commands import spawn_command, ShellWorkerPool, SHELL_WORKERS_SUPPORTED
+
+def latencies(run, commands):
+    """Seconds per command, checking that each one succeeded."""
+    timings = []
+    for command in commands:
+        start = time.perf_counter()
+        output, error = run(command)
+        timings.append(time.perf_counter() - start)
+        if error:
+            raise SystemExit(f"'{command}' failed: {error}")
+    return timings
+
+def report(name: str, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {name:<7} mean {statistics.mean(timings) * 1000:8.2f} ms  "
+          f"p50 {statistics.median(timings) * 1000:8.2f} ms  p95 {p95 * 1000:8.2f} ms  "
+          f"total {sum(timings):6.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Shell worker vs spawn-per-command latency")
+    parser.add_argument("--commands", type=int, default=200, help="Number of distinct commands")
+    parser.add_argument("--command", default="echo check {i}",
+                        help="Command template; {i} is replaced by the command number")
+    args = parser.parse_args()
+    if not SHELL_WORKERS_SUPPORTED:
+        raise SystemExit("Shell workers aren't available on this platform")
+
+    commands = [args.command.format(i=i) for i in range(args.commands)]
+    print(f"{args.commands} commands like '{commands[0]}'")
+    spawn = latencies(spawn_command, commands)
+    report("spawn", spawn)
+
+    pool = ShellWorkerPool(size=1)
+    pool.run("echo warm-up")
+    try:
+        worker = latencies(pool.run, commands)
+    finally:
+        pool.close()
+    report("worker", worker)
+    print(f"Speedup (spawn / worker): {statistics.mean(spawn) / statistics.mean(worker):.1f}x")
+
+if __name__ == "__main__":
+    main()
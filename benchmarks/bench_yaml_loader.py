@@ -0,0 +1,45 @@
+# File: benchmarks/bench_yaml_loader.py
+#
+# Compares the pure-Python and libyaml-backed loaders on a shipped rule file.
+# Usage: python benchmarks/bench_yaml_loader.py [--file PATH] [--repeat N]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parser import YAML_LOADERS, load_sca_file
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "..", "rules", "windows", "cis_win10_enterprise.yml")
+
+def time_loader(file_path: str, loader, repeat: int) -> float:
+    """Best-of-N wall time for load_sca_file with the given loader."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load_sca_file(file_path, loader)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="YAML loader micro-benchmark")
+    parser.add_argument("--file", default=DEFAULT_FILE, help="Rule file to parse")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per loader (best is kept)")
+    args = parser.parse_args()
+
+    print(f"File: {os.path.normpath(args.file)} ({os.path.getsize(args.file)} bytes)")
+    timings = {}
+    for name, loader in YAML_LOADERS.items():
+        timings[name] = time_loader(args.file, loader, args.repeat)
+        print(f"  {name:<7} {timings[name] * 1000:9.1f} ms  ({loader.__name__})")
+
+    if "c" in timings:
+        print(f"Speedup (python / c): {timings['python'] / timings['c']:.1f}x")
+    else:
+        print("libyaml C loader not available in this PyYAML build")
+
+if __name__ == "__main__":
+    main()
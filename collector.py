@@ -0,0 +1,72 @@
+# File: collector.py
+
+import gzip
+import json
+import datetime
+from typing import Callable, Dict, Iterable, Tuple, Union
+from executor import ExecResult
+from rule_compiler import as_compiled
+from sca_structs import CompiledSubRule
+
+# Bump when the artifact layout changes; load_artifact refuses other versions.
+ARTIFACT_VERSION = 3
+
+def subrule_target(sub_rule: Union[str, CompiledSubRule]) -> str:
+    """
+    The part of a sub-rule that determines what gets read from the system,
+    without the content check, e.g.
+    'r:HKLM\\...\\Lsa -> LimitBlankPasswordUse -> 1' -> 'r:hkey_local_machine\\...\\lsa -> limitblankpassworduse'.
+    Sub-rules that only differ in their expected value share a target.
+    Only registry targets are case-folded (hives, keys and value names are
+    case-insensitive); commands and file paths are kept as written, since
+    e.g. 'cmd:echo A' and 'cmd:echo a' print different things. File checks
+    that only test existence ('f:PATH', '-> exists') read "exists"/"missing",
+    so content checks on the same file get their own 'f-content:PATH' target.
+    """
+    return as_compiled(sub_rule).target
+
+def collect(sub_rules: Iterable[Union[str, CompiledSubRule]], execute: Callable[[str], ExecResult]) -> Dict[str, Tuple[str, str]]:
+    """
+    Execute each distinct target once and return {target: (value, error)}.
+    """
+    values = {}
+    for sub_rule in sub_rules:
+        target = subrule_target(sub_rule)
+        if target not in values:
+            r = execute(sub_rule)
+            values[target] = (r.value, r.error)
+    return values
+
+def replay_subrule(sub_rule: Union[str, CompiledSubRule], values: Dict[str, Tuple[str, str]]) -> ExecResult:
+    """
+    Drop-in replacement for execute_subrule that answers from collected values
+    without touching the system.
+    """
+    sub_rule = as_compiled(sub_rule)
+    if sub_rule.error:
+        return ExecResult(sub_rule.raw, "", sub_rule.error)
+    collected = values.get(sub_rule.target)
+    if collected is None:
+        return ExecResult(sub_rule.raw, "", f"Not collected: {sub_rule.target}")
+    return ExecResult(sub_rule.raw, collected[0], collected[1])
+
+def write_artifact(path: str, values: Dict[str, Tuple[str, str]], host: str, os_name: str):
+    """Write collected values as gzip-compressed, compact JSON."""
+    artifact = {
+        "version": ARTIFACT_VERSION,
+        "host": host,
+        "os": os_name,
+        "collected_at": datetime.datetime.now().isoformat(),
+        "values": {target: [value, error] for target, (value, error) in values.items()}
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(artifact, f, separators=(",", ":"))
+
+def load_artifact(path: str) -> dict:
+    """Read an artifact written by write_artifact; 'values' maps target -> (value, error)."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        artifact = json.load(f)
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported artifact version {artifact.get('version')} in {path}")
+    artifact["values"] = {target: tuple(v) for target, v in artifact["values"].items()}
+    return artifact
@@ -0,0 +1,258 @@
+# File: commands.py
+
+import asyncio
+import locale
+import os
+import queue
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+# Seconds a command may run before it (and its shell) is killed
+DEFAULT_COMMAND_TIMEOUT = 60
+
+# Shells get their own process group, so a timeout can kill everything they started
+if sys.platform.startswith("win"):
+    NEW_PROCESS_GROUP = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    NEW_PROCESS_GROUP = {"start_new_session": True}
+
+# Persistent shell workers need a shell that can isolate each command in a
+# subshell, which cmd.exe can't (see ShellWorker)
+SHELL_WORKERS_SUPPORTED = not sys.platform.startswith("win")
+
+def spawn_command(command: str, timeout: Optional[float] = None) -> Tuple[str, str]:
+    """Run 'command' through a new shell; returns (stripped output, error message)."""
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE,
+                               universal_newlines=True, **NEW_PROCESS_GROUP)
+    try:
+        output, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_process_tree(process)
+        process.communicate()
+        return "", timeout_error(timeout)
+    if process.returncode != 0:
+        return "", exit_status_error(command, process.returncode)
+    return output.strip(), ""
+
+async def run_command_async(command: str, timeout: Optional[float] = None) -> Tuple[str, str]:
+    """
+    asyncio version of spawn_command. On timeout or cancellation the shell and
+    everything it started are killed before returning.
+    """
+    process = await asyncio.create_subprocess_shell(command, stdin=subprocess.DEVNULL,
+                                                    stdout=subprocess.PIPE, **NEW_PROCESS_GROUP)
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        kill_process_tree(process)
+        await process.wait()
+        return "", timeout_error(timeout)
+    except asyncio.CancelledError:
+        kill_process_tree(process)
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        return "", exit_status_error(command, process.returncode)
+    text = output.decode(locale.getpreferredencoding(False), errors="replace")
+    return text.replace("\r\n", "\n").strip(), ""
+
+def kill_process_tree(process):
+    """Kill a shell started with NEW_PROCESS_GROUP and whatever it launched."""
+    try:
+        if sys.platform.startswith("win"):
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+def exit_status_error(command: str, status: int) -> str:
+    """Same wording as subprocess.CalledProcessError for a non-zero exit."""
+    return f"Command error: Command '{command}' returned non-zero exit status {status}."
+
+def timeout_error(timeout: Optional[float]) -> str:
+    """Error for a command that was killed; the 'Timeout:' prefix sets it apart from command failures."""
+    return f"Timeout: command did not finish within {timeout}s"
+
+_WHITESPACE_OR_QUOTED = re.compile(r"(\"[^\"]*\"|'[^']*')|\s+")
+
+def normalize_command(command: str) -> str:
+    """
+    Cache key for a command: surrounding whitespace dropped and runs of
+    whitespace outside quotes collapsed, so 'net  accounts' and 'net accounts'
+    share one run. Case is kept, since arguments may be case-sensitive.
+    """
+    return _WHITESPACE_OR_QUOTED.sub(lambda m: m.group(1) or " ", command.strip())
+
+class CommandCache:
+    """
+    Per-scan cache of command results. Each distinct (normalized) command
+    runs once; every other sub-rule using it gets the same output. Under
+    concurrency the first caller runs the command and the others wait for
+    its result instead of spawning their own (single-flight).
+    Safe to share between threads.
+    """
+    def __init__(self, run: Callable[[str], Tuple[str, str]] = spawn_command):
+        self.run = run
+        self._lock = threading.Lock()
+        self._results: Dict[str, Future] = {}
+        self.spawns = 0
+        self.saved = 0
+
+    def get(self, command: str) -> Tuple[str, str]:
+        """(output, error) for 'command', running it only if no one has yet."""
+        key = normalize_command(command)
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+                self.spawns += 1
+            else:
+                self.saved += 1
+        if owner:
+            try:
+                future.set_result(self.run(command))
+            except Exception as e:
+                future.set_result(("", f"Command error: {e}"))
+        return future.result()
+
+    def stats(self) -> str:
+        return f"commands run {self.spawns}, spawns saved {self.saved}"
+
+###################################################
+# Persistent shell workers
+###################################################
+
+class ShellWorker:
+    """
+    One long-lived /bin/sh fed commands over stdin. After each command the
+    shell prints a per-worker sentinel line with the exit status, which marks
+    where that command's output ends. Commands run in a subshell with stdin
+    from the null device, so they can't change the worker's state (cd,
+    variables) or eat the command stream.
+    POSIX only (SHELL_WORKERS_SUPPORTED): an interactive cmd.exe runs every
+    command in its own state, where cd/set leak into the next check, and
+    isolating each in a 'cmd /c' child costs the same process start as
+    spawning it.
+    A worker that times out or dies is marked dead; the pool replaces it.
+    """
+    def __init__(self):
+        if not SHELL_WORKERS_SUPPORTED:
+            raise OSError("Shell workers aren't supported on Windows; spawn each command instead")
+        self.sentinel = f"__SCA_DONE_{uuid.uuid4().hex}__"
+        self.process = subprocess.Popen(
+            ["/bin/sh"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            universal_newlines=True, errors="replace", bufsize=1, **NEW_PROCESS_GROUP
+        )
+        self.alive = True
+        # stdout is read on a thread so a hung command can be timed out
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        for line in self.process.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def _script(self, command: str) -> str:
+        return f"( {command}\n) </dev/null\nprintf '\\n%s %d\\n' {self.sentinel} $?\n"
+
+    def run(self, command: str, timeout: Optional[float] = DEFAULT_COMMAND_TIMEOUT) -> Tuple[str, str]:
+        """(stripped output, error message) for one command."""
+        try:
+            self.process.stdin.write(self._script(command))
+            self.process.stdin.flush()
+        except OSError as e:
+            self.kill()
+            return "", f"Command error: shell worker unavailable ({e})"
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        output = []
+        while True:
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                self.kill()
+                return "", timeout_error(timeout)
+            if line is None:
+                self.kill()
+                return "", "Command error: shell worker exited"
+            if line.startswith(self.sentinel):
+                status = int(line.split()[-1])
+                if status != 0:
+                    return "", exit_status_error(command, status)
+                # strip() also drops the line break the framing adds before the sentinel
+                return "".join(output).strip(), ""
+            output.append(line)
+
+    def kill(self):
+        """Stop the shell and whatever it is running."""
+        self.alive = False
+        kill_process_tree(self.process)
+        self.process.wait()
+
+    def close(self):
+        if not self.alive:
+            return
+        self.alive = False
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+class ShellWorkerPool:
+    """
+    Up to 'size' ShellWorkers started on demand and reused across commands.
+    run() has the same (output, error) contract as spawn_command, so it can
+    back a CommandCache. Safe to share between threads; close() at the end
+    of the scan.
+    """
+    def __init__(self, size: int = 1, timeout: Optional[float] = DEFAULT_COMMAND_TIMEOUT):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self.recycled = 0
+
+    def _acquire(self) -> ShellWorker:
+        with self._lock:
+            if self._idle.empty() and self._started < self.size:
+                self._started += 1
+                return ShellWorker()
+        return self._idle.get()
+
+    def _release(self, worker: ShellWorker):
+        if worker.alive:
+            self._idle.put(worker)
+            return
+        # Replace a worker that timed out or crashed; this also wakes a waiting caller
+        with self._lock:
+            self.recycled += 1
+        self._idle.put(ShellWorker())
+
+    def run(self, command: str) -> Tuple[str, str]:
+        worker = self._acquire()
+        try:
+            return worker.run(command, self.timeout)
+        finally:
+            self._release(worker)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
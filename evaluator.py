@@ -1,9 +1,11 @@
 # File: evaluator.py
 
-import re
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from executor import ExecResult
-from sca_structs import Rule
+from rule_compiler import as_compiled, rule_compiled
+from sca_structs import Rule, RequirementsBlock, CompiledSubRule, SCAFile
 
 class RuleResult:
     """
@@ -20,7 +22,8 @@ class RuleResult:
         rationale: str,
         remediation: str,
         compliance,
-        condition: str
+        condition: str,
+        skipped_subrules: int = 0
     ):
         self.rule_id = rule_id
         self.title = title
@@ -31,40 +34,45 @@ class RuleResult:
         self.remediation = remediation
         self.compliance = compliance
         self.condition = condition
+        self.skipped_subrules = skipped_subrules   # not executed: outcome already decided
 
-def evaluate_rule(rule: Rule, exec_results: List[ExecResult]) -> RuleResult:
+def evaluate_rule(rule: Rule, exec_results: Iterable[ExecResult], exhaustive: bool = True,
+                  verdicts: Optional[Dict[str, Tuple[bool, str]]] = None) -> RuleResult:
     """
     Evaluate pass/fail for the given 'rule' based on the sub-rule results in exec_results.
     Then create a RuleResult that includes all relevant fields from the original Rule.
+    exec_results may be a lazy iterator (e.g. a generator calling execute_subrule);
+    unless exhaustive is set, it is only consumed until the all/any/none outcome
+    is decided, and the remaining sub-rules are counted as skipped.
+    'verdicts' (see SubRuleIndex) caches sub-rule outcomes by CompiledSubRule.key
+    across rules, for scans where equal sub-rules get the same exec result.
     """
     passed_subrules = 0
+    failed_subrules = 0
     fail_reasons = []
-    total = len(exec_results)
+    total = len(rule.rules)
 
-    # Evaluate each sub-rule
-    for r in exec_results:
-        sub_pass, reason = evaluate_subrule(r)
+    # Evaluate each sub-rule (exec_results follow rule.rules order)
+    for compiled, r in zip(rule_compiled(rule), exec_results):
+        sub_pass, reason = evaluate_subrule_cached(r, compiled, verdicts)
         if sub_pass:
             passed_subrules += 1
         else:
+            failed_subrules += 1
             fail_reasons.append(f"[{r.sub_rule}] {reason}")
+        if not exhaustive and condition_decided(rule.condition, passed_subrules, failed_subrules):
+            break
 
-    # Condition logic
-    cond = rule.condition.lower() if rule.condition else "all"
-    if cond == "all":
-        passed = (passed_subrules == total)
-    elif cond == "any":
-        passed = (passed_subrules > 0)
-    elif cond == "none":
-        passed = (passed_subrules == 0)
-    else:
-        passed = (passed_subrules == total)
+    skipped = max(total - passed_subrules - failed_subrules, 0)
+    passed = condition_passed(rule.condition, passed_subrules, total)
 
     status = "PASS" if passed else "FAIL"
     if not passed and fail_reasons:
         details = "; ".join(fail_reasons)
     else:
         details = f"{passed_subrules}/{total} sub-rules passed"
+    if skipped:
+        details += f" ({skipped} skipped)"
 
     # Build a RuleResult with original fields from 'rule'
     return RuleResult(
@@ -76,40 +84,145 @@ def evaluate_rule(rule: Rule, exec_results: List[ExecResult]) -> RuleResult:
         rationale=rule.rationale,
         remediation=rule.remediation,
         compliance=rule.compliance,
-        condition=rule.condition
+        condition=rule.condition,
+        skipped_subrules=skipped
     )
 
-def evaluate_subrule(exec_result: ExecResult) -> (bool, str):
+def run_checks(
+    rules: List[Rule],
+    execute: Callable[[CompiledSubRule], ExecResult],
+    exhaustive: bool = False,
+    workers: int = 1,
+    profiler=None,
+    verdicts: Optional[Dict[str, Tuple[bool, str]]] = None
+) -> Iterator[RuleResult]:
+    """
+    Execute and evaluate 'rules', yielding one RuleResult per rule in rule order
+    as soon as it is ready. Sub-rules go through execute() lazily, so
+    evaluate_rule can stop early unless 'exhaustive' is set. With workers > 1
+    rules run on a thread pool. A Profiler with 'detailed' set gets per-rule
+    and per-sub-rule timings. 'verdicts' is passed on to evaluate_rule.
+    """
+    detailed = profiler is not None and profiler.detailed
+
+    def timed_execute(sub_rule):
+        start = time.monotonic()
+        r_exec = execute(sub_rule)
+        profiler.record_subrule(sub_rule.kind, time.monotonic() - start)
+        return r_exec
+
+    def run_rule(rule):
+        if detailed:
+            start = time.monotonic()
+            exec_results = (timed_execute(sub_rule) for sub_rule in rule_compiled(rule))
+            r_result = evaluate_rule(rule, exec_results, exhaustive=exhaustive, verdicts=verdicts)
+            profiler.record_rule(rule.id, rule.title, time.monotonic() - start)
+            return r_result
+        # Sub-rules are executed lazily, so evaluate_rule can stop early
+        exec_results = (execute(sub_rule) for sub_rule in rule_compiled(rule))
+        # evaluate_rule() returns a RuleResult with original fields from the rule
+        return evaluate_rule(rule, exec_results, exhaustive=exhaustive, verdicts=verdicts)
+
+    if workers > 1:
+        # map() yields in submission order, so reports stay in rule order
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(run_rule, rules)
+    else:
+        for rule in rules:
+            yield run_rule(rule)
+
+def applicable_policies(
+    policies: List[SCAFile],
+    execute: Callable[[CompiledSubRule], ExecResult]
+) -> Tuple[List[Rule], List[Tuple[SCAFile, str]]]:
+    """
+    Run each policy's requirements and split the policies into the checks to
+    schedule and the (policy, reason) pairs that don't apply to this host.
+    """
+    rules = []
+    skipped = []
+    for sca_file in policies:
+        req_results = [execute(s) for s in rule_compiled(sca_file.requirements)]
+        applies, reason = evaluate_requirements(sca_file.requirements, req_results)
+        if applies:
+            rules.extend(sca_file.checks)
+        else:
+            skipped.append((sca_file, reason))
+    return rules, skipped
+
+def evaluate_requirements(requirements: RequirementsBlock, exec_results: List[ExecResult]) -> (bool, str):
+    """
+    Decide whether a policy applies to this host from its 'requirements:' block.
+    A block without rules always applies. Returns (applies, reason).
+    """
+    total = len(exec_results)
+    if total == 0:
+        return True, "no requirements"
+
+    passed_subrules = 0
+    fail_reasons = []
+    for compiled, r in zip(rule_compiled(requirements), exec_results):
+        sub_pass, reason = evaluate_subrule(r, compiled)
+        if sub_pass:
+            passed_subrules += 1
+        else:
+            fail_reasons.append(f"[{r.sub_rule}] {reason}")
+
+    if condition_passed(requirements.condition, passed_subrules, total):
+        return True, f"{passed_subrules}/{total} requirements met"
+    return False, "; ".join(fail_reasons) or f"{passed_subrules}/{total} requirements met"
+
+def condition_passed(condition: str, passed_subrules: int, total: int) -> bool:
+    """Apply an SCA 'condition' (all/any/none) to a count of passed sub-rules."""
+    cond = condition.lower() if condition else "all"
+    if cond == "all":
+        return passed_subrules == total
+    elif cond == "any":
+        return passed_subrules > 0
+    elif cond == "none":
+        return passed_subrules == 0
+    else:
+        return passed_subrules == total
+
+def condition_decided(condition: str, passed_subrules: int, failed_subrules: int) -> bool:
+    """
+    True once more sub-rule results can no longer change the outcome:
+    'all' after the first failure, 'any' and 'none' after the first pass.
+    """
+    cond = condition.lower() if condition else "all"
+    if cond in ("any", "none"):
+        return passed_subrules > 0
+    return failed_subrules > 0
+
+def evaluate_subrule(exec_result: ExecResult, compiled: CompiledSubRule = None) -> (bool, str):
     """
-    Compare the ExecResult value with any expected pattern in the sub_rule
-    (like -> exists, -> missing, -> regex:^...).
+    Compare the ExecResult value with the sub-rule's precompiled matcher
+    (-> 1, -> r:^3$, -> n:^(\\d+) compare <= 60, ... see matchers.py),
+    then apply a leading 'not'.
+    'compiled' is compiled from exec_result.sub_rule when not given.
     Return (passOrFail, reason).
     """
+    if compiled is None:
+        compiled = as_compiled(exec_result.sub_rule)
+
     if exec_result.error:
-        return False, exec_result.error  # e.g. registry or command error
-
-    sub_rule = exec_result.sub_rule.lower()
-    val = exec_result.value
-
-    # Example checks
-    if "-> exists" in sub_rule:
-        if val == "exists":
-            return True, "file found"
-        return False, f"file not found ({val})"
-
-    if "-> missing" in sub_rule:
-        if val == "missing":
-            return True, "file is missing"
-        return False, f"file is present ({val})"
-
-    # Regex check: e.g. -> regex:^Windows 10
-    match = re.search(r"->\s*regex:(.+)$", sub_rule)
-    if match:
-        pattern = match.group(1).strip()
-        if re.match(pattern, val):
-            return True, "regex matched"
-        else:
-            return False, f"regex '{pattern}' did not match '{val}'"
+        passed, reason = False, exec_result.error  # e.g. registry or command error
+    elif compiled.matcher is not None:
+        passed, reason = compiled.matcher.match(exec_result.value)
+    else:
+        # Default: pass if no specific logic recognized
+        passed, reason = True, "no condition recognized"
+
+    if compiled.negated:
+        return not passed, f"negated: {reason}"
+    return passed, reason
 
-    # Default: pass if no specific logic recognized
-    return True, "no condition recognized"
+def evaluate_subrule_cached(exec_result: ExecResult, compiled: CompiledSubRule,
+                            verdicts: Optional[Dict[str, Tuple[bool, str]]]) -> (bool, str):
+    """evaluate_subrule, memoized in 'verdicts' by compiled.key when a cache is given."""
+    if verdicts is None or not compiled.key:
+        return evaluate_subrule(exec_result, compiled)
+    verdict = verdicts.get(compiled.key)
+    if verdict is None:
+        verdict = verdicts[compiled.key] = evaluate_subrule(exec_result, compiled)
+    return verdict
@@ -1,122 +1,147 @@
 # File: executor.py
 
 import os
-import subprocess
 import sys
-from typing import NamedTuple
+from typing import List, NamedTuple, Tuple, Union
 
-# If you're on Windows, you can import winreg. For non-Windows, handle differently.
-if sys.platform.startswith("win"):
-    import winreg
+from commands import CommandCache, spawn_command
+from registry import RegistryReader, WinRegBackend
+from rule_compiler import as_compiled, is_existence_matcher
+from sca_structs import CompiledSubRule
 
 class ExecResult(NamedTuple):
     sub_rule: str
     value: str
     error: str
 
-def execute_subrule(sub_rule: str) -> ExecResult:
+_default_registry = None
+
+def default_registry():
+    """
+    The shared RegistryReader over the live registry, or None off Windows.
+    """
+    global _default_registry
+    if _default_registry is None and sys.platform.startswith("win"):
+        _default_registry = RegistryReader(WinRegBackend())
+    return _default_registry
+
+def execute_subrule(sub_rule: Union[str, CompiledSubRule], registry: RegistryReader = None,
+                    commands: CommandCache = None) -> ExecResult:
     """
-    Decide how to handle the sub_rule based on prefix:
-    - r: -> registry check (Windows)
+    Decide how to handle the sub_rule based on its kind:
+    - r: -> registry check (through 'registry', or the live registry on Windows)
     - f: -> file check
-    - cmd: -> run command
+    - cmd: -> run command (once per scan when a 'commands' cache is given)
+    Accepts a sub-rule string or a CompiledSubRule from rule_compiler.
     """
-    sub_rule = sub_rule.strip().lower()
+    sub_rule = as_compiled(sub_rule)
 
-    if sub_rule.startswith("r:"):
-        if sys.platform.startswith("win"):
-            return read_registry(sub_rule)
+    if sub_rule.error:
+        return ExecResult(sub_rule.raw, "", sub_rule.error)
+    elif sub_rule.kind == "r":
+        if registry is None:
+            registry = default_registry()
+        if registry is not None:
+            return read_registry(sub_rule, registry)
         else:
-            return ExecResult(sub_rule, "", "Registry check not supported on non-Windows")
-    elif sub_rule.startswith("f:"):
+            return ExecResult(sub_rule.raw, "", "Registry check not supported on non-Windows")
+    elif sub_rule.kind == "f":
         return check_file(sub_rule)
-    elif sub_rule.startswith("cmd:"):
-        return run_command(sub_rule)
     else:
-        return ExecResult(sub_rule, "", f"Unknown prefix in {sub_rule}")
+        return run_command(sub_rule, commands)
 
-def read_registry(sub_rule: str) -> ExecResult:
+def read_registry(sub_rule: CompiledSubRule, registry: RegistryReader) -> ExecResult:
     """
-    Example sub_rule: r:HKLM\Software\Microsoft -> SomeKey -> regex:^....
-    We'll parse out the hive (HKLM/HKCU/HKU/HKCR/HKEY_LOCAL_MACHINE, etc.)
+    Read the key/value a registry sub_rule refers to through the cached reader.
+    A bare key (no value name) only checks that the key exists.
     """
-    # remove "r:"
-    rule_body = sub_rule[2:].strip()  # e.g. HKLM\Software\...
-    parts = rule_body.split("->")
-    if len(parts) < 2:
-        return ExecResult(sub_rule, "", "Invalid registry rule format: missing '->'")
-
-    reg_path = parts[0].strip()  # e.g. HKLM\Software\Microsoft
-    # We won't parse further logic (regex) here; we'll just read the value name from next chunk
-    value_name = parts[1].strip()
+    if sub_rule.value_name is None:
+        if registry.key_exists(sub_rule.hive, sub_rule.path):
+            return ExecResult(sub_rule.raw, "exists", "")
+        return ExecResult(sub_rule.raw, "", "Registry error: key not found")
 
-    # If there's more -> splitted, you might parse them. For now, let's assume it's a direct read.
-    hive_str, path_str = split_hive(reg_path)
     try:
-        hive = get_hive(hive_str)
-    except ValueError as e:
-        return ExecResult(sub_rule, "", str(e))
+        val, regtype = registry.read_value(sub_rule.hive, sub_rule.path, sub_rule.value_name)
+        return ExecResult(sub_rule.raw, format_reg_value(val), "")
+    except Exception as e:
+        return ExecResult(sub_rule.raw, "", f"Registry error: {e}")
 
-    # If value_name is missing, we might read the default key
-    if not value_name:
-        value_name = None  # default
+def format_reg_value(val) -> str:
+    """Registry data as text for matching; REG_MULTI_SZ entries become one line each."""
+    if isinstance(val, (list, tuple)):
+        return "\n".join(str(v) for v in val)
+    return str(val)
 
-    try:
-        with winreg.OpenKey(hive, path_str) as key:
-            val, regtype = winreg.QueryValueEx(key, value_name)
-        return ExecResult(sub_rule, str(val), "")
-    except Exception as e:
-        return ExecResult(sub_rule, "", f"Registry error: {e}")
+def group_registry_subrules(sub_rules) -> dict:
+    """
+    Group registry sub-rules by key: {(hive, path): set of value names},
+    so each key can be opened once and all its values read together.
+    Non-registry and malformed sub-rules are ignored.
+    """
+    groups = {}
+    for sub_rule in sub_rules:
+        sub_rule = as_compiled(sub_rule)
+        if sub_rule.kind != "r":
+            continue
+        names = groups.setdefault((sub_rule.hive, sub_rule.path.lower()), set())
+        if sub_rule.value_name is not None:
+            names.add(sub_rule.value_name.lower())
+    return groups
+
+# Keys with fewer referenced values than this are cheaper to query value by value
+PREFETCH_MIN_VALUES = 2
 
-def split_hive(reg_path: str):
+def plan_registry_prefetch(sub_rules) -> List[Tuple[str, str]]:
     """
-    Splits "HKLM\Software\MyKey" into ("HKLM", "Software\MyKey").
-    If no backslash found, path_str might be empty.
+    The minimal set of registry keys worth enumerating for these sub-rules:
+    each (hive, path) that sub-rules read at least PREFETCH_MIN_VALUES
+    distinct values from, once. Keys that are only checked for existence
+    just need to be opened.
     """
-    parts = reg_path.split("\\", 1)
-    if len(parts) == 1:
-        return parts[0], ""
-    else:
-        return parts[0], parts[1]
-
-def get_hive(hive_str: str):
-    """
-    Maps short/long hive names to winreg constants.
-    Accepts: HKLM or HKEY_LOCAL_MACHINE, HKCU or HKEY_CURRENT_USER, etc.
-    """
-    hive_str_up = hive_str.upper()
-    if hive_str_up in ["HKLM", "HKEY_LOCAL_MACHINE"]:
-        return winreg.HKEY_LOCAL_MACHINE
-    elif hive_str_up in ["HKCU", "HKEY_CURRENT_USER"]:
-        return winreg.HKEY_CURRENT_USER
-    elif hive_str_up in ["HKU", "HKEY_USERS"]:
-        return winreg.HKEY_USERS
-    elif hive_str_up in ["HKCR", "HKEY_CLASSES_ROOT"]:
-        return winreg.HKEY_CLASSES_ROOT
-    else:
-        raise ValueError(f"Unsupported hive: {hive_str}")
+    groups = group_registry_subrules(sub_rules)
+    return sorted(key for key, names in groups.items() if len(names) >= PREFETCH_MIN_VALUES)
+
+def prefetch_registry(registry: RegistryReader, sub_rules):
+    """
+    Load every value the sub-rules can read before execution, so r: lookups
+    are dictionary hits: one enumeration per planned key, one query per value
+    for the rest (or everywhere, if the backend can't enumerate).
+    """
+    sub_rules = list(sub_rules)
+    groups = group_registry_subrules(sub_rules)
+    planned = plan_registry_prefetch(sub_rules)
+    if registry.prefetch(planned):
+        planned = set(planned)
+        groups = {key: names for key, names in groups.items() if key not in planned}
+    registry.read_batch(groups)
 
-def check_file(sub_rule: str) -> ExecResult:
+def check_file(sub_rule: CompiledSubRule) -> ExecResult:
     """
     e.g. f:C:\Windows\System32\notepad.exe -> exists
-    We'll just see if the file is present. 
+    We'll just see if the file is present, unless the sub-rule matches on
+    the file's contents (e.g. -> r:^PermitRootLogin), in which case we read it.
+    Environment variables such as %WINDIR% are expanded.
     """
-    rule_body = sub_rule[2:].strip()
-    parts = rule_body.split("->")
-    file_path = parts[0].strip()
+    file_path = os.path.expandvars(sub_rule.path)
+    if is_existence_matcher(sub_rule.matcher):
+        if os.path.exists(file_path):
+            return ExecResult(sub_rule.raw, "exists", "")
+        else:
+            return ExecResult(sub_rule.raw, "missing", "")
 
-    if os.path.exists(file_path):
-        return ExecResult(sub_rule, "exists", "")
-    else:
-        return ExecResult(sub_rule, "missing", "")
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            return ExecResult(sub_rule.raw, f.read(), "")
+    except OSError as e:
+        return ExecResult(sub_rule.raw, "", f"File error: {e}")
 
-def run_command(sub_rule: str) -> ExecResult:
+def run_command(sub_rule: CompiledSubRule, commands: CommandCache = None) -> ExecResult:
     """
     e.g. cmd:whoami
+    With a CommandCache, sub-rules running the same command share one run.
     """
-    cmd_str = sub_rule[4:].strip()
-    try:
-        output = subprocess.check_output(cmd_str, shell=True, universal_newlines=True)
-        return ExecResult(sub_rule, output.strip(), "")
-    except subprocess.CalledProcessError as e:
-        return ExecResult(sub_rule, "", f"Command error: {e}")
+    if commands is not None:
+        output, error = commands.get(sub_rule.path)
+    else:
+        output, error = spawn_command(sub_rule.path)
+    return ExecResult(sub_rule.raw, output, error)
@@ -0,0 +1,338 @@
+# File: fleet.py
+#
+# 'python main.py fleet SOURCES' scans many hosts from collected data:
+# registry snapshots (.reg/.json/.jsonl, see registry_snapshot.py) or
+# artifacts written by --collect (.json.gz). SOURCES is a directory holding
+# one file per host, or a manifest (JSON array or JSON Lines) of
+# {"host": ..., "snapshot"|"artifact": path, "os": ...} entries.
+# Rules are parsed and compiled once in the parent; forked workers share
+# them copy-on-write.
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from parser import load_all_policies
+from rule_cache import RuleCache, DEFAULT_CACHE_DIR
+from executor import ExecResult, execute_subrule, group_registry_subrules, prefetch_registry
+from registry import RegistryReader
+from registry_snapshot import SnapshotBackend
+from rule_compiler import rule_compiled
+from collector import replay_subrule, load_artifact
+from evaluator import run_checks, applicable_policies
+from subrule_index import SubRuleIndex
+from reporter import write_enhanced_json_report
+
+SNAPSHOT_SUFFIXES = (".reg", ".json", ".jsonl")
+ARTIFACT_SUFFIX = ".json.gz"
+PRODUCT_KEY = ("HKEY_LOCAL_MACHINE", "SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion")
+_UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+# Set in the parent before the pool starts; forked workers inherit it copy-on-write
+_fleet = {}
+
+###################################################
+# Host sources
+###################################################
+
+def host_sources(path: str) -> List[Dict[str, str]]:
+    """[{"host", "snapshot" or "artifact", optional "os"}] from a directory or a manifest."""
+    if os.path.isdir(path):
+        sources = []
+        for name in sorted(os.listdir(path)):
+            file_path = os.path.join(path, name)
+            lower = name.lower()
+            if lower.endswith(ARTIFACT_SUFFIX):
+                sources.append({"host": name[:-len(ARTIFACT_SUFFIX)], "artifact": file_path})
+            elif lower.endswith(SNAPSHOT_SUFFIXES):
+                sources.append({"host": os.path.splitext(name)[0], "snapshot": file_path})
+        _check_unique_hosts(sources, path)
+        return sources
+
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    base = os.path.dirname(os.path.abspath(path))
+    for entry in entries:
+        for field in ("snapshot", "artifact"):
+            if field in entry:
+                entry[field] = os.path.join(base, entry[field])
+        if "snapshot" not in entry and "artifact" not in entry:
+            raise ValueError(f"Manifest entry without 'snapshot' or 'artifact': {entry}")
+        entry["host"] = str(entry.get("host") or os.path.basename(entry.get("snapshot") or entry["artifact"]))
+    _check_unique_hosts(entries, path)
+    return entries
+
+def report_name(host: str) -> str:
+    """File name of a host's report under hosts/: the host name with anything path-like replaced."""
+    return _UNSAFE_NAME_CHARS.sub("_", host).lstrip(".") or "_"
+
+def _check_unique_hosts(sources: List[Dict[str, str]], path: str):
+    """Two sources for one host (or names that map to one report file) would overwrite each other's report."""
+    seen = {}
+    for source in sources:
+        name = report_name(source["host"]).lower()
+        if name in seen:
+            raise ValueError(f"Duplicate host '{source['host']}' in {path} "
+                             f"(also given as '{seen[name]}')")
+        seen[name] = source["host"]
+
+def snapshot_execute(registry: RegistryReader):
+    """Only r: sub-rules can be answered from a registry snapshot; files and commands are not collected."""
+    def execute(sub_rule):
+        if sub_rule.kind == "r" or sub_rule.error:
+            return execute_subrule(sub_rule, registry)
+        return ExecResult(sub_rule.raw, "", f"Not in registry snapshot: {sub_rule.target}")
+    return execute
+
+###################################################
+# One host (runs in a worker)
+###################################################
+
+def scan_host(source: Dict[str, str]) -> dict:
+    """
+    Scan one host against the shared policies and write its JSON report;
+    returns its summary. Any failure is reported in the summary's "error"
+    instead of raising, so one bad host doesn't stop the fleet.
+    """
+    started = time.monotonic()
+    cpu_started = time.process_time()
+    try:
+        summary = _scan_host(source)
+    except Exception as e:
+        summary = {"host": source["host"], "error": f"{type(e).__name__}: {e}"}
+    summary.update(pid=os.getpid(), seconds=time.monotonic() - started,
+                   cpu_seconds=time.process_time() - cpu_started)
+    return summary
+
+def _scan_host(source: Dict[str, str]) -> dict:
+    policies = _fleet["policies"]
+    options = _fleet["options"]
+    host = source["host"]
+    os_name = source.get("os", "")
+    registry = None
+    if "artifact" in source:
+        artifact = load_artifact(source["artifact"])
+        os_name = os_name or artifact["os"]
+        values = artifact["values"]
+
+        def execute(sub_rule):
+            return replay_subrule(sub_rule, values)
+    else:
+        snapshot = SnapshotBackend.load(source["snapshot"], keep=_fleet["registry_keys"])
+        registry = RegistryReader(snapshot)
+        execute = snapshot_execute(registry)
+        if not os_name:
+            try:
+                os_name = str(registry.read_value(*PRODUCT_KEY, "ProductName")[0])
+            except OSError:
+                os_name = "Unknown"
+
+    try:
+        index = SubRuleIndex(policies)
+        execute = index.wrap(execute)
+        if options["ignore_requirements"]:
+            all_rules = [rule for sca_file in policies for rule in sca_file.checks]
+            skipped = []
+        else:
+            all_rules, skipped = applicable_policies(policies, execute)
+        if registry is not None:
+            prefetch_registry(registry, (s for rule in all_rules for s in rule_compiled(rule)))
+        results = list(run_checks(all_rules, execute, exhaustive=options["exhaustive"], verdicts=index.verdicts))
+    finally:
+        if registry is not None:
+            registry.close()
+
+    passed_count = sum(1 for r in results if r.status == "PASS")
+    failed_count = len(results) - passed_count
+    write_enhanced_json_report(
+        results=results,
+        host=host,
+        os_name=os_name,
+        passed_count=passed_count,
+        failed_count=failed_count,
+        json_path=os.path.join(options["hosts_dir"], f"{report_name(host)}.json"),
+        benchmark_name=options["benchmark"]
+    )
+    return {
+        "host": host,
+        "os": os_name,
+        "passed": passed_count,
+        "failed": failed_count,
+        "skipped_policies": [sca_file.policy.id or sca_file.policy.file for sca_file, _ in skipped],
+        # Compact per-rule outcome for the roll-up: rule ids that passed / failed
+        "passed_ids": [r.rule_id for r in results if r.status == "PASS"],
+        "failed_ids": [r.rule_id for r in results if r.status != "PASS"]
+    }
+
+###################################################
+# Roll-up
+###################################################
+
+def roll_up(policies, summaries: List[dict], wall_seconds: float, processes: int) -> dict:
+    """Fleet-wide report: per-host scores, per-rule pass/fail counts, throughput and worker utilisation."""
+    rule_counts = {}   # rule id -> [passed, failed]
+    hosts = []
+    workers = {}       # pid -> [hosts, busy seconds, cpu seconds]
+    for summary in summaries:
+        worker = workers.setdefault(summary["pid"], [0, 0.0, 0.0])
+        worker[0] += 1
+        worker[1] += summary["seconds"]
+        worker[2] += summary["cpu_seconds"]
+        if "error" in summary:
+            hosts.append({"host": summary["host"], "error": summary["error"]})
+            continue
+        for rule_id in summary["passed_ids"]:
+            rule_counts.setdefault(rule_id, [0, 0])[0] += 1
+        for rule_id in summary["failed_ids"]:
+            rule_counts.setdefault(rule_id, [0, 0])[1] += 1
+        total = summary["passed"] + summary["failed"]
+        hosts.append({
+            "host": summary["host"],
+            "os": summary["os"],
+            "passed": summary["passed"],
+            "failed": summary["failed"],
+            "score_percent": round(summary["passed"] / total * 100) if total else 0,
+            "skipped_policies": summary["skipped_policies"],
+            "seconds": round(summary["seconds"], 4)
+        })
+
+    rules = []
+    for sca_file in policies:
+        for rule in sca_file.checks:
+            counts = rule_counts.get(rule.id)
+            if counts is None:
+                continue
+            rules.append({"id": rule.id, "title": rule.title, "policy": sca_file.policy.id,
+                          "passed": counts[0], "failed": counts[1]})
+
+    return {
+        "generated": datetime.datetime.now().isoformat(),
+        "hosts_scanned": len(summaries),
+        "hosts_failed_to_load": sum(1 for h in hosts if "error" in h),
+        "throughput": {
+            "wall_seconds": round(wall_seconds, 3),
+            "hosts_per_minute": round(len(summaries) / wall_seconds * 60, 1) if wall_seconds else 0,
+            "processes": processes
+        },
+        "workers": [
+            {"pid": pid, "hosts": n, "busy_seconds": round(busy, 3), "cpu_seconds": round(cpu, 3),
+             "utilisation": round(busy / wall_seconds, 3) if wall_seconds else 0}
+            for pid, (n, busy, cpu) in sorted(workers.items())
+        ],
+        "hosts": hosts,
+        "rules": rules
+    }
+
+###################################################
+# Command line
+###################################################
+
+def _init_worker(options: dict):
+    """Pool initializer where processes can't be forked: each worker loads (cached) rules itself."""
+    if "policies" not in _fleet:
+        _fleet.update(_load_fleet(options))
+
+def _load_fleet(options: dict) -> dict:
+    cache = None if options["no_rule_cache"] else RuleCache(options["rule_cache_dir"])
+    policies = load_all_policies(options["rules"], cache=cache)
+    subrules = (s for sca_file in policies
+                for rule in [sca_file.requirements] + sca_file.checks
+                for s in rule_compiled(rule))
+    return {"policies": policies, "registry_keys": set(group_registry_subrules(subrules)), "options": options}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="main.py fleet",
+                                     description="Scan many hosts from registry snapshots or collected artifacts")
+    parser.add_argument("sources", help="Directory of per-host snapshots/artifacts, or a manifest file")
+    parser.add_argument("--rules", default="./rules/windows", help="Directory containing .yml rule files")
+    parser.add_argument("--output", default="./output/fleet",
+                        help="Output directory: hosts/<host>.json plus fleet.json (roll-up)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--benchmark", default="", help="Benchmark name for the per-host reports")
+    parser.add_argument("--ignore-requirements", action="store_true",
+                        help="Run every policy's checks regardless of its requirements block")
+    parser.add_argument("--exhaustive", action="store_true",
+                        help="Execute every sub-rule even once a check's outcome is decided")
+    parser.add_argument("--rule-cache-dir", default=DEFAULT_CACHE_DIR, help="Where compiled rules are cached")
+    parser.add_argument("--no-rule-cache", action="store_true", help="Always parse the YAML rule files")
+    args = parser.parse_args(argv)
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+
+    try:
+        sources = host_sources(args.sources)
+    except (OSError, ValueError) as e:
+        print(f"Error reading host sources: {e}")
+        return 1
+    if not sources:
+        print(f"No host snapshots or artifacts found in {args.sources}")
+        return 1
+
+    hosts_dir = os.path.join(args.output, "hosts")
+    os.makedirs(hosts_dir, exist_ok=True)
+    options = {
+        "rules": args.rules,
+        "rule_cache_dir": args.rule_cache_dir,
+        "no_rule_cache": args.no_rule_cache,
+        "ignore_requirements": args.ignore_requirements,
+        "exhaustive": args.exhaustive,
+        "benchmark": args.benchmark,
+        "hosts_dir": hosts_dir
+    }
+
+    start = time.monotonic()
+    try:
+        _fleet.update(_load_fleet(options))
+    except Exception as e:
+        print(f"Error loading rules: {e}")
+        return 1
+    policies = _fleet["policies"]
+    print(f"Loaded {sum(len(p.checks) for p in policies)} rules from {args.rules} "
+          f"in {time.monotonic() - start:.2f}s; scanning {len(sources)} host(s) on {args.processes} process(es)")
+
+    start = time.monotonic()
+    if args.processes == 1:
+        summaries = [scan_host(source) for source in sources]
+    else:
+        if "fork" in multiprocessing.get_all_start_methods():
+            # Forked workers see the parent's compiled rules without pickling them
+            pool = ProcessPoolExecutor(args.processes, mp_context=multiprocessing.get_context("fork"))
+        else:
+            pool = ProcessPoolExecutor(args.processes, initializer=_init_worker, initargs=(options,))
+        with pool:
+            chunksize = max(1, len(sources) // (args.processes * 8))
+            summaries = list(pool.map(scan_host, sources, chunksize=chunksize))
+    wall_seconds = time.monotonic() - start
+
+    rollup = roll_up(policies, summaries, wall_seconds, args.processes)
+    rollup_path = os.path.join(args.output, "fleet.json")
+    with open(rollup_path, "w", encoding="utf-8") as f:
+        json.dump(rollup, f, indent=2)
+
+    for host in rollup["hosts"]:
+        if "error" in host:
+            print(f"  {host['host']}: {host['error']}")
+    throughput = rollup["throughput"]
+    print(f"Scanned {len(summaries)} host(s) in {throughput['wall_seconds']:.2f}s "
+          f"({throughput['hosts_per_minute']:,.1f} hosts/minute)")
+    for worker in rollup["workers"]:
+        print(f"  worker {worker['pid']}: {worker['hosts']} host(s), "
+              f"busy {worker['busy_seconds']:.2f}s ({worker['utilisation'] * 100:.0f}%)")
+    print(f"Host reports saved to: {hosts_dir}")
+    print(f"Fleet roll-up saved to: {rollup_path}")
+    return 1 if rollup["hosts_failed_to_load"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# File: history.py
+#
+# Optional SQLite sink for scan results (--history DB) and the
+# 'python main.py query DB ...' subcommand answering trend and regression
+# questions over it. Schema:
+#   hosts(id, name, os)       rules(id, title)
+#   scans(id, host_id, scan_time, benchmark, passed, failed)
+#   results(scan_id, rule_id, host_id, scan_time, passed, details)
+# results repeats host_id and scan_time so (rule_id, host_id, scan_time)
+# lookups are answered from one index.
+
+import argparse
+import datetime
+import sqlite3
+import sys
+from typing import Iterable, List, Optional
+from urllib.request import pathname2url
+
+from evaluator import RuleResult
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    os TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    host_id INTEGER NOT NULL REFERENCES hosts(id),
+    scan_time TEXT NOT NULL,
+    benchmark TEXT NOT NULL DEFAULT '',
+    passed INTEGER NOT NULL,
+    failed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    scan_id INTEGER NOT NULL REFERENCES scans(id),
+    rule_id INTEGER NOT NULL REFERENCES rules(id),
+    host_id INTEGER NOT NULL,
+    scan_time TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    details TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (scan_id, rule_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_rule_host_time ON results (rule_id, host_id, scan_time);
+CREATE INDEX IF NOT EXISTS scans_host_time ON scans (host_id, scan_time);
+"""
+
+def connect(db_path: str, existing: bool = False) -> sqlite3.Connection:
+    """
+    Open (creating if needed) a history database in WAL mode. With
+    'existing', for the commands that only read it, a missing database is a
+    LookupError instead of a new empty file.
+    """
+    if existing:
+        try:
+            conn = sqlite3.connect(f"file:{pathname2url(db_path)}?mode=rw", uri=True)
+        except sqlite3.OperationalError:
+            raise LookupError(f"No history database at {db_path}") from None
+        return conn
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def record_scan(
+    db_path: str,
+    results: Iterable[RuleResult],
+    host: str,
+    os_name: str,
+    benchmark_name: str = "",
+    scan_time: Optional[str] = None
+) -> int:
+    """
+    Append one scan's results in a single transaction (batched inserts).
+    Returns the new scan id.
+    """
+    results = list(results)
+    scan_time = scan_time or datetime.datetime.now().isoformat(timespec="seconds")
+    passed_count = sum(1 for r in results if r.status == "PASS")
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("INSERT INTO hosts (name, os) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET os = excluded.os", (host, os_name))
+            host_id = conn.execute("SELECT id FROM hosts WHERE name = ?", (host,)).fetchone()[0]
+            scan_id = conn.execute(
+                "INSERT INTO scans (host_id, scan_time, benchmark, passed, failed) VALUES (?, ?, ?, ?, ?)",
+                (host_id, scan_time, benchmark_name, passed_count, len(results) - passed_count)
+            ).lastrowid
+            conn.executemany("INSERT INTO rules (id, title) VALUES (?, ?) "
+                             "ON CONFLICT(id) DO UPDATE SET title = excluded.title",
+                             ((r.rule_id, r.title) for r in results))
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (scan_id, rule_id, host_id, scan_time, passed, details) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((scan_id, r.rule_id, host_id, scan_time, r.status == "PASS", r.details) for r in results)
+            )
+    finally:
+        conn.close()
+    return scan_id
+
+###################################################
+# Queries
+###################################################
+
+def _host_id(conn: sqlite3.Connection, host: str) -> int:
+    row = conn.execute("SELECT id FROM hosts WHERE name = ?", (host,)).fetchone()
+    if row is None:
+        raise LookupError(f"Unknown host '{host}'")
+    return row[0]
+
+def rule_history(conn: sqlite3.Connection, rule_id: int, host: str) -> List[tuple]:
+    """(scan_time, passed, details) of one rule on one host, newest first."""
+    return conn.execute(
+        "SELECT scan_time, passed, details FROM results "
+        "WHERE rule_id = ? AND host_id = ? ORDER BY scan_time DESC",
+        (rule_id, _host_id(conn, host))
+    ).fetchall()
+
+def failing_since(history: List[tuple]) -> Optional[str]:
+    """Scan time of the first failure in the current failing streak (None if passing)."""
+    since = None
+    for scan_time, passed, _ in history:
+        if passed:
+            break
+        since = scan_time
+    return since
+
+def host_trend(conn: sqlite3.Connection, host: str, limit: int) -> List[tuple]:
+    """(scan id, scan_time, passed, failed) of a host's latest scans, newest first."""
+    return conn.execute(
+        "SELECT id, scan_time, passed, failed FROM scans WHERE host_id = ? "
+        "ORDER BY scan_time DESC, id DESC LIMIT ?",
+        (_host_id(conn, host), limit)
+    ).fetchall()
+
+def rule_status_by_host(conn: sqlite3.Connection, rule_id: int) -> List[tuple]:
+    """(host, scan_time, passed) of one rule in each host's latest scan that ran it."""
+    return conn.execute(
+        "SELECT h.name, r.scan_time, r.passed FROM hosts h "
+        "JOIN results r ON r.rule_id = ? AND r.host_id = h.id AND r.scan_time = ("
+        "  SELECT MAX(scan_time) FROM results WHERE rule_id = ? AND host_id = h.id) "
+        "ORDER BY h.name",
+        (rule_id, rule_id)
+    ).fetchall()
+
+def latest_scans(conn: sqlite3.Connection, host_id: int, count: int = 2) -> List[int]:
+    return [row[0] for row in conn.execute(
+        "SELECT id FROM scans WHERE host_id = ? ORDER BY scan_time DESC, id DESC LIMIT ?", (host_id, count))]
+
+def regressions(conn: sqlite3.Connection, host: Optional[str] = None) -> List[tuple]:
+    """(host, rule id, title, details) for checks that passed in a host's previous scan and fail in its latest."""
+    if host is not None:
+        hosts = [(_host_id(conn, host), host)]
+    else:
+        hosts = conn.execute("SELECT id, name FROM hosts ORDER BY name").fetchall()
+    found = []
+    for host_id, name in hosts:
+        scans = latest_scans(conn, host_id)
+        if len(scans) < 2:
+            continue
+        for rule_id, title, details in conn.execute(
+                "SELECT cur.rule_id, ru.title, cur.details FROM results cur "
+                "JOIN results prev ON prev.scan_id = ? AND prev.rule_id = cur.rule_id "
+                "JOIN rules ru ON ru.id = cur.rule_id "
+                "WHERE cur.scan_id = ? AND cur.passed = 0 AND prev.passed = 1 ORDER BY cur.rule_id",
+                (scans[1], scans[0])):
+            found.append((name, rule_id, title, details))
+    return found
+
+def load_scan(conn: sqlite3.Connection, scan_id: int) -> dict:
+    """One stored scan in the shape of a JSON report: host, os, scan_time, checks (id/title/status/details)."""
+    row = conn.execute(
+        "SELECT h.name, h.os, s.scan_time, s.benchmark, s.passed, s.failed FROM scans s "
+        "JOIN hosts h ON h.id = s.host_id WHERE s.id = ?", (scan_id,)).fetchone()
+    if row is None:
+        raise LookupError(f"Unknown scan id {scan_id}")
+    host, os_name, scan_time, benchmark, passed, failed = row
+    checks = [
+        {"id": rule_id, "title": title, "status": "PASS" if ok else "FAIL", "details": details}
+        for rule_id, title, ok, details in conn.execute(
+            "SELECT r.rule_id, ru.title, r.passed, r.details FROM results r "
+            "JOIN rules ru ON ru.id = r.rule_id WHERE r.scan_id = ? ORDER BY r.rule_id", (scan_id,))
+    ]
+    return {"host": host, "os": os_name, "scan_time": scan_time, "benchmark_name": benchmark,
+            "passed": passed, "failed": failed, "checks": checks}
+
+###################################################
+# Command line
+###################################################
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="main.py query",
+        description="Query the scan history written with --history",
+        epilog="--host and --rule: that check's history on the host (and since when it fails); "
+               "--host: the host's score trend; --rule: its latest status on every host; "
+               "--regressions: checks that passed in the previous scan and fail in the latest")
+    parser.add_argument("db", help="History database (SQLite)")
+    parser.add_argument("--host", default=None, help="Host name")
+    parser.add_argument("--rule", type=int, default=None, help="Rule (check) id")
+    parser.add_argument("--regressions", action="store_true", help="List newly failing checks per host")
+    parser.add_argument("--limit", type=int, default=20, help="Rows of history to show (default 20)")
+    args = parser.parse_args(argv)
+    if not (args.host or args.rule is not None or args.regressions):
+        parser.error("give --host, --rule and/or --regressions")
+
+    try:
+        conn = connect(args.db, existing=True)
+    except LookupError as e:
+        print(e.args[0])
+        return 1
+    try:
+        if args.regressions:
+            rows = regressions(conn, args.host)
+            for host, rule_id, title, details in rows:
+                print(f"{host}  {rule_id}  {title[:70]}\n    {details[:160]}")
+            print(f"{len(rows)} regression(s)")
+        elif args.host and args.rule is not None:
+            history = rule_history(conn, args.rule, args.host)
+            for scan_time, passed, details in history[:args.limit]:
+                print(f"{scan_time}  {'PASS' if passed else 'FAIL'}  {'' if passed else details[:120]}")
+            if not history:
+                print(f"No results for rule {args.rule} on {args.host}")
+            elif history[0][1]:
+                print(f"Rule {args.rule} passes on {args.host}")
+            else:
+                print(f"Rule {args.rule} failing on {args.host} since {failing_since(history)}")
+        elif args.host:
+            for scan_id, scan_time, passed, failed in host_trend(conn, args.host, args.limit):
+                total = passed + failed
+                score = round(passed / total * 100) if total else 0
+                print(f"{scan_time}  scan {scan_id:>6}  passed {passed:>5}  failed {failed:>5}  score {score:>3}%")
+        else:
+            for host, scan_time, passed in rule_status_by_host(conn, args.rule):
+                print(f"{host:<30} {scan_time}  {'PASS' if passed else 'FAIL'}")
+    except LookupError as e:
+        print(e.args[0])
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
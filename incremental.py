@@ -0,0 +1,196 @@
+# File: incremental.py
+#
+# Incremental rescans (--incremental STATE). The state file keeps, from the
+# previous scan of this host, the last write time of every registry key the
+# rules reference, the exec result and verdict of every r: sub-rule, and the
+# result of every check. At the next scan only keys whose timestamp moved
+# (or that appeared or disappeared) are read again, and only checks that
+# touch such a key - or run file/command sub-rules, or changed in the rules -
+# are evaluated again; the others keep their stored result.
+# Timestamps come from RegistryBackend.key_timestamp(); a backend that has
+# none (e.g. a snapshot) makes every key count as changed.
+
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from evaluator import RuleResult
+from executor import ExecResult, group_registry_subrules
+from registry import RegistryReader
+from rule_compiler import rule_compiled
+from sca_structs import CompiledSubRule, Rule
+
+STATE_FORMAT_VERSION = 1
+_UNKNOWN = object()   # key exists but the backend has no timestamp for it
+
+def _key_name(hive: str, path: str) -> str:
+    return f"{hive}\\{path.lower()}"
+
+def rule_signature(rule: Rule) -> str:
+    """Changes whenever the check's condition or any of its sub-rules does."""
+    text = "\n".join([rule.condition] + [c.key for c in rule_compiled(rule)])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+class IncrementalState:
+    """
+    The state of one host's previous scan, loaded from 'path' (empty if the
+    file is missing, unreadable, or written for another host or mode).
+    Use: wrap() the execute function, refresh() with the sub-rules of the
+    checks that apply, seed_verdicts(), run the checks stored_results() can't
+    answer, then update() and save(). Only keys refresh() found unchanged
+    are answered from the state; before it (or without it), nothing is.
+    """
+    def __init__(self, path: str, host: str, exhaustive: bool):
+        self.path = path
+        self.host = host
+        self.exhaustive = exhaustive
+        self.keys: Dict[str, Optional[int]] = {}       # key name -> timestamp, None if the key is absent
+        self.subrules: Dict[str, list] = {}           # sub-rule key -> [value, error, passed, reason, key name]
+        self.checks: Dict[str, list] = {}             # str(rule id) -> [signature, status, details, skipped]
+        self._stamps: Dict[str, object] = {}          # this scan's timestamps
+        self._names: Dict[str, str] = {}              # sub-rule key -> key name, of the refreshed sub-rules
+        self._changed = set()                         # key names to read again
+        self._recorded: Dict[str, tuple] = {}         # sub-rule key -> (key name, result read this scan)
+        self._signatures: Dict[int, str] = {}         # id(rule) -> rule_signature(rule)
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.evaluated = 0
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (isinstance(state, dict) and state.get("version") == STATE_FORMAT_VERSION
+                and state.get("host") == host and state.get("exhaustive") == exhaustive):
+            self.keys = state["keys"]
+            self.subrules = state["subrules"]
+            self.checks = state["checks"]
+
+    def refresh(self, registry: RegistryReader, sub_rules: Iterable[CompiledSubRule]):
+        """
+        Read the timestamp of every registry key 'sub_rules' reference and work
+        out which changed. The keys stay open in 'registry' for prefetching.
+        """
+        for sub_rule in sub_rules:
+            if sub_rule.kind != "r" or sub_rule.error:
+                continue
+            hive, path = sub_rule.hive, sub_rule.path
+            name = self._names[sub_rule.key] = _key_name(hive, path)
+            if name in self._stamps:
+                continue
+            try:
+                stamp = registry.key_timestamp(hive, path)
+                if stamp is None:
+                    stamp = _UNKNOWN
+            except OSError:
+                stamp = None
+            self._stamps[name] = stamp
+            if stamp is _UNKNOWN or name not in self.keys or self.keys[name] != stamp:
+                self._changed.add(name)
+        # Results read from changed keys are stale
+        self.subrules = {key: entry for key, entry in self.subrules.items()
+                         if entry[4] not in self._changed}
+
+    @property
+    def changed_keys(self) -> int:
+        return len(self._changed)
+
+    @property
+    def total_keys(self) -> int:
+        return len(self._stamps)
+
+    def _unchanged(self, sub_rule: CompiledSubRule) -> bool:
+        if sub_rule.error:
+            return True
+        name = self._names.get(sub_rule.key)
+        return name is not None and name not in self._changed
+
+    def stored(self, sub_rule: CompiledSubRule) -> Optional[list]:
+        """The stored entry for an r: sub-rule on an unchanged key, if there is one."""
+        if sub_rule.error or not self._unchanged(sub_rule):
+            return None
+        return self.subrules.get(sub_rule.key)
+
+    def wrap(self, execute: Callable[[CompiledSubRule], ExecResult]) -> Callable[[CompiledSubRule], ExecResult]:
+        """'execute', answering r: sub-rules on unchanged keys from the state and recording the others."""
+        def execute_incremental(sub_rule: CompiledSubRule) -> ExecResult:
+            entry = self.stored(sub_rule)
+            if entry is not None:
+                return ExecResult(sub_rule.raw, entry[0], entry[1])
+            r_exec = execute(sub_rule)
+            if sub_rule.kind == "r" and not sub_rule.error:
+                with self._lock:
+                    self._recorded[sub_rule.key] = (_key_name(sub_rule.hive, sub_rule.path), r_exec)
+            return r_exec
+        return execute_incremental
+
+    def needs_read(self, sub_rule: CompiledSubRule) -> bool:
+        """False for sub-rules the state answers, so prefetching can skip them."""
+        return self.stored(sub_rule) is None
+
+    def seed_verdicts(self, verdicts: Dict[str, Tuple[bool, str]]):
+        """Put the stored verdicts of sub-rules on unchanged keys into an evaluate_rule verdict cache."""
+        stamps, changed = self._stamps, self._changed
+        for key, (_, _, passed, reason, name) in self.subrules.items():
+            if passed is not None and name in stamps and name not in changed:
+                verdicts.setdefault(key, (passed, reason))
+
+    def stored_results(self, rules: List[Rule]) -> List[Optional[RuleResult]]:
+        """
+        Per rule, its stored RuleResult if nothing it depends on changed,
+        else None (the rule has to be evaluated again).
+        """
+        results = []
+        for rule in rules:
+            stored = self.checks.get(str(rule.id))
+            r_result = None
+            signature = self._signatures[id(rule)] = rule_signature(rule)
+            if (stored is not None and stored[0] == signature
+                    and all(self._unchanged(c) for c in rule_compiled(rule))):
+                _, status, details, skipped = stored
+                r_result = RuleResult(rule.id, rule.title, status, details, rule.description, rule.rationale,
+                                      rule.remediation, rule.compliance, rule.condition, skipped)
+                self.reused += 1
+            else:
+                self.evaluated += 1
+            results.append(r_result)
+        return results
+
+    def update(self, rules: List[Rule], results: List[RuleResult], verdicts: Dict[str, Tuple[bool, str]]):
+        """Take this scan's timestamps, sub-rule results and check results as the new state."""
+        self.keys = {name: stamp for name, stamp in self._stamps.items() if stamp is not _UNKNOWN}
+        for key, (name, r_exec) in self._recorded.items():
+            passed, reason = verdicts.get(key, (None, None))
+            self.subrules[key] = [r_exec.value, r_exec.error, passed, reason, name]
+        # Entries of keys this scan didn't check would be dropped as changed next time
+        self.subrules = {key: entry for key, entry in self.subrules.items() if entry[4] in self.keys}
+        signatures = self._signatures
+        self.checks = {str(rule.id): [signatures.get(id(rule)) or rule_signature(rule),
+                                      r.status, r.details, r.skipped_subrules]
+                       for rule, r in zip(rules, results)}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        state = {"version": STATE_FORMAT_VERSION, "host": self.host, "exhaustive": self.exhaustive,
+                 "keys": self.keys, "subrules": self.subrules, "checks": self.checks}
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                # dumps() encodes in C; dump() to a file goes through the pure Python encoder
+                f.write(json.dumps(state, separators=(",", ":")))
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self) -> str:
+        return (f"{self.changed_keys} of {self.total_keys} keys changed, "
+                f"{self.evaluated} checks evaluated, {self.reused} reused")
+
+def merge_results(stored: List[Optional[RuleResult]], fresh: Iterable[RuleResult]) -> Iterator[RuleResult]:
+    """Results in rule order: the stored ones, with the gaps filled from 'fresh' as it yields."""
+    fresh = iter(fresh)
+    for r_result in stored:
+        yield r_result if r_result is not None else next(fresh)
@@ -0,0 +1,74 @@
+# File: json_stream.py
+#
+# Incremental JSON reading for files too large to json.load() comfortably:
+# the scan reports read by 'aggregate' and JSON registry snapshots.
+
+import json
+import re
+from typing import Iterator, Tuple
+
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+class JsonStream:
+    """Reads JSON values one at a time from a file, holding only a small window of it."""
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file), without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON document")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # A number at the very end of the window may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        """(key, value) pairs of the JSON object starting here, one member decoded at a time."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key, self.value()
+            if self.peek() != ",":
+                break
+            self.expect(",")
+        self.expect("}")
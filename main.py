@@ -3,84 +3,378 @@
 import argparse
 import sys
 import os
+import sqlite3
+from functools import partial
 
-from parser import load_all_rules
-from executor import execute_subrule
-from evaluator import evaluate_rule
+from parser import load_all_policies
+from rule_cache import RuleCache, DEFAULT_CACHE_DIR
+from executor import execute_subrule, default_registry, group_registry_subrules, prefetch_registry
+from commands import CommandCache, ShellWorkerPool, spawn_command, DEFAULT_COMMAND_TIMEOUT, SHELL_WORKERS_SUPPORTED
+from async_engine import AsyncScanner
+from registry import RegistryReader
+from registry_snapshot import SnapshotBackend
+from rule_compiler import rule_compiled
+from profiling import Profiler
+from collector import collect, replay_subrule, write_artifact, load_artifact
+from evaluator import run_checks, applicable_policies
+from subrule_index import SubRuleIndex
+from incremental import IncrementalState, merge_results
+import fleet
+import aggregator
+import history
+import scan_diff
+from history import record_scan
 from reporter import (
     write_enhanced_json_report,
-    write_enhanced_html_report
+    write_enhanced_html_report,
+    write_compact_html_report,
+    NdjsonReportWriter
 )
 
+SUBCOMMANDS = {
+    "fleet": fleet.main,
+    "aggregate": aggregator.main,
+    "query": history.main,
+    "diff": scan_diff.main,
+}
+
+def referenced_subrules(policies):
+    """Every compiled sub-rule the policies can run: requirements first, then checks."""
+    for sca_file in policies:
+        yield from rule_compiled(sca_file.requirements)
+        for rule in sca_file.checks:
+            yield from rule_compiled(rule)
+
 def main():
-    parser = argparse.ArgumentParser(description="Windows CIS Scanner Audit")
+    # Subcommands have their own arguments; anything else is a single-host scan
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        sys.exit(SUBCOMMANDS[sys.argv[1]](sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(description="Windows CIS Scanner Audit",
+                                     epilog="Subcommands: " + ", ".join(
+                                         f"'{name} ...'" for name in SUBCOMMANDS) + " (see main.py NAME --help)")
     parser.add_argument("--rules", default="./rules/windows",
                         help="Directory containing .yml rule files")
     parser.add_argument("--json", default="./output/scan.json",
                         help="Path to JSON output file")
     parser.add_argument("--html", default="./output/report.html",
                         help="Path to HTML output file")
-    parser.add_argument("--host", default="MyHost", help="Hostname override")
-    parser.add_argument("--os", default="Windows 11", help="OS name override")
+    parser.add_argument("--host", default=None, help="Hostname override (default: MyHost)")
+    parser.add_argument("--os", default=None, help="OS name override (default: Windows 11)")
     parser.add_argument("--benchmark", default="",
                         help="(Optional) Benchmark name to display in reports")
+    parser.add_argument("--rule-cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory for the parsed rule cache (default {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-rule-cache", action="store_true",
+                        help="Always parse the .yml files, bypassing the rule cache")
+    parser.add_argument("--rebuild-rule-cache", action="store_true",
+                        help="Re-parse every .yml file and overwrite the rule cache")
+    parser.add_argument("--yaml-loader", default="auto", choices=["auto", "c", "python"],
+                        help="YAML loader: libyaml C loader, pure Python, or auto-detect")
+    parser.add_argument("--ignore-requirements", action="store_true",
+                        help="Run every policy's checks even if its requirements don't match the host")
+    parser.add_argument("--registry-snapshot", default="",
+                        help="Evaluate registry checks against a .reg export or JSON/JSONL snapshot instead of the live registry")
+    parser.add_argument("--collect", default="", metavar="ARTIFACT",
+                        help="Only collect the raw values the rules reference into ARTIFACT (.json.gz) and exit")
+    parser.add_argument("--artifact", default="",
+                        help="Evaluate the rules against a collected ARTIFACT, without touching this system")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of threads executing sub-rules (default 1: sequential)")
+    parser.add_argument("--cmd-mode", default="spawn", choices=["spawn", "worker"],
+                        help="Run cmd: sub-rules in a new shell each (spawn) or in persistent /bin/sh workers "
+                             "(worker; POSIX hosts only, e.g. custom rules checked on Linux: not available on Windows)")
+    parser.add_argument("--engine", default="threads", choices=["threads", "async"],
+                        help="Execution engine: --workers threads, or asyncio (overlaps waiting commands)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Commands running at once with --engine async (default 16)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_COMMAND_TIMEOUT, metavar="SECONDS",
+                        help=f"Kill a cmd: sub-rule's command after SECONDS (default {DEFAULT_COMMAND_TIMEOUT}, 0: no limit)")
+    parser.add_argument("--scan-timeout", type=float, default=0, metavar="SECONDS",
+                        help="Time budget for all commands of the scan with --engine async (default: none)")
+    parser.add_argument("--exhaustive", action="store_true",
+                        help="Execute every sub-rule even once a check's outcome is decided (full audit evidence)")
+    parser.add_argument("--json-format", default="pretty", choices=["pretty", "ndjson"],
+                        help="JSON report format: one indented document, or NDJSON streamed while scanning")
+    parser.add_argument("--html-format", default="table", choices=["table", "compact"],
+                        help="HTML report: full table, or compact embedded data rendered in the browser (large result sets)")
+    parser.add_argument("--incremental", default="", metavar="STATE",
+                        help="Keep registry key timestamps and results in STATE; later scans only re-read changed keys "
+                             "and re-evaluate the checks depending on them")
+    parser.add_argument("--history", default="", metavar="DB",
+                        help="Also append the results to a SQLite history database (see 'main.py query')")
+    parser.add_argument("--profile", type=int, nargs="?", const=20, default=0, metavar="N",
+                        help="Time every check and sub-rule; print the N slowest checks (default 20)")
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.cmd_mode == "worker" and not SHELL_WORKERS_SUPPORTED:
+        parser.error("--cmd-mode worker isn't available on Windows (cmd.exe can't isolate each command)")
+    if args.engine == "async" and args.cmd_mode == "worker":
+        parser.error("--cmd-mode worker only works with --engine threads")
+    if args.scan_timeout and args.engine != "async":
+        parser.error("--scan-timeout needs --engine async")
+    if args.incremental and (args.artifact or args.collect):
+        parser.error("--incremental can't be combined with --artifact or --collect")
+    command_timeout = args.timeout or None
+
+    profiler = Profiler(detailed=args.profile > 0)
 
     # 1. Load rules from .yml files
+    cache = None
+    if not args.no_rule_cache:
+        cache = RuleCache(args.rule_cache_dir, rebuild=args.rebuild_rule_cache)
+
     try:
-        all_rules = load_all_rules(args.rules)
+        with profiler.stage("load_rules"):
+            policies = load_all_policies(args.rules, cache=cache, yaml_loader=args.yaml_loader)
     except Exception as e:
         print(f"Error loading rules: {e}")
         sys.exit(1)
 
-    print(f"Loaded {len(all_rules)} rules from {args.rules}")
+    print(f"Loaded {sum(len(p.checks) for p in policies)} rules from {args.rules}")
+    if cache is not None and cache.disabled:
+        print(f"Warning: rule cache not used, {cache.disabled}")
+    elif cache is not None:
+        print(f"Rule cache: {cache.hits} hit(s), {cache.misses} miss(es) ({cache.cache_dir})")
+    # Checks of different policies share sub-rules; each distinct one is executed and evaluated once
+    index = SubRuleIndex(policies)
+    print(f"Sub-rule index: {index.summary()}")
+    rule_errors = [err for p in policies for err in p.errors]
+    if rule_errors:
+        print(f"Warning: {len(rule_errors)} malformed sub-rule(s) will fail at scan time:")
+        for err in rule_errors:
+            print(f"  {err}")
+
+    registry = None
+    if args.artifact:
+        try:
+            artifact = load_artifact(args.artifact)
+        except Exception as e:
+            print(f"Error loading artifact: {e}")
+            sys.exit(1)
+        print(f"Artifact: {len(artifact['values'])} collected values from {args.artifact}")
+        args.host = args.host or artifact["host"]
+        args.os = args.os or artifact["os"]
+        collected = artifact["values"]
+
+        def execute(sub_rule):
+            return replay_subrule(sub_rule, collected)
+    elif args.registry_snapshot:
+        # Only keep the keys the loaded rules can look at
+        referenced = group_registry_subrules(referenced_subrules(policies))
+        try:
+            snapshot = SnapshotBackend.load(args.registry_snapshot, keep=set(referenced))
+        except Exception as e:
+            print(f"Error loading registry snapshot: {e}")
+            sys.exit(1)
+        print(f"Registry snapshot: {snapshot.key_count} keys, {snapshot.value_count} values "
+              f"from {args.registry_snapshot}")
+        if snapshot.bad_values:
+            print(f"Warning: skipped {snapshot.bad_values} malformed value(s) in the snapshot:")
+            for sample in snapshot.bad_samples:
+                print(f"  {sample}")
+        registry = RegistryReader(snapshot)
+    else:
+        registry = default_registry()
+
+    scanner = None
+    if args.engine == "async":
+        scanner = AsyncScanner(concurrency=args.concurrency, timeout=command_timeout,
+                               scan_timeout=args.scan_timeout or None, profiler=profiler,
+                               verdicts=index.verdicts)
+    commands = None
+    shell_pool = None
+    if not args.artifact:
+        # Each distinct command runs once per scan, however many checks match on its output
+        if args.cmd_mode == "worker":
+            shell_pool = ShellWorkerPool(size=args.workers, timeout=command_timeout)
+            commands = CommandCache(run=shell_pool.run)
+        elif scanner is not None:
+            # Commands (requirements included) run on the scanner's event loop
+            commands = CommandCache(run=scanner.run_command)
+        else:
+            commands = CommandCache(run=partial(spawn_command, timeout=command_timeout))
+
+        def execute(sub_rule):
+            return execute_subrule(sub_rule, registry, commands)
+
+    def close_command_runners():
+        if shell_pool is not None:
+            shell_pool.close()
+        if scanner is not None:
+            scanner.close()
+
+    args.host = args.host or "MyHost"
+    args.os = args.os or "Windows 11"
+
+    if args.collect:
+        if registry is not None:
+            prefetch_registry(registry, referenced_subrules(policies))
+        values = collect(referenced_subrules(policies), execute)
+        close_command_runners()
+        os.makedirs(os.path.dirname(args.collect) or ".", exist_ok=True)
+        write_artifact(args.collect, values, args.host, args.os)
+        print(f"Collected {len(values)} values into {args.collect}")
+        sys.exit(0)
+
+    state = None
+    if args.incremental:
+        # Sub-rules on keys whose last write time hasn't moved are answered from the previous scan
+        state = IncrementalState(args.incremental, args.host, args.exhaustive)
+        execute = state.wrap(execute)
+    execute = index.wrap(execute)
+
+    # 2. Drop policies whose requirements don't match this host
+    with profiler.stage("requirements"):
+        if args.ignore_requirements:
+            all_rules = [rule for sca_file in policies for rule in sca_file.checks]
+            skipped_policies = []
+        else:
+            all_rules, skipped_policies = applicable_policies(policies, execute)
+    if skipped_policies and not all_rules:
+        # Typically a non-Windows host without --registry-snapshot: an empty 0/0 report would look clean
+        for sca_file, reason in skipped_policies:
+            print(f"Skipped policy {sca_file.policy.id or sca_file.policy.file}: {reason}")
+        print("Error: no policy's requirements match this host, nothing was scanned "
+              "(use --ignore-requirements to run the checks anyway)")
+        close_command_runners()
+        sys.exit(1)
+
+    # 3. Execute & Evaluate
+    profiler.begin("execute_evaluate")
+    scan_rules = all_rules
+    stored = None
+    if state is not None:
+        # Only the keys of checks that apply; without a registry nothing is reused
+        if registry is not None:
+            state.refresh(registry, (s for rule in all_rules for s in rule_compiled(rule)))
+        state.seed_verdicts(index.verdicts)
+        stored = state.stored_results(all_rules)
+        scan_rules = [rule for rule, r_result in zip(all_rules, stored) if r_result is None]
+    if registry is not None:
+        # Enumerate each referenced key once; r: lookups then never reach the backend
+        to_read = (s for rule in scan_rules for s in rule_compiled(rule))
+        if state is not None:
+            to_read = filter(state.needs_read, to_read)
+        prefetch_registry(registry, to_read)
+
+    ndjson = None
+    if args.json_format == "ndjson":
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        ndjson = NdjsonReportWriter(args.json, args.host, args.os, args.benchmark)
+
+    if scanner is not None:
+        result_iter = scanner.run(scan_rules, execute, exhaustive=args.exhaustive)
+    else:
+        result_iter = run_checks(scan_rules, execute, exhaustive=args.exhaustive,
+                                 workers=args.workers, profiler=profiler, verdicts=index.verdicts)
+    if stored is not None:
+        result_iter = merge_results(stored, result_iter)
 
-    # 2. Execute & Evaluate
     all_results = []
-    for rule in all_rules:
-        exec_results = []
-        for sub_rule in rule.rules:
-            r_exec = execute_subrule(sub_rule)
-            exec_results.append(r_exec)
-
-        # evaluate_rule() returns a RuleResult with original fields from the rule
-        r_result = evaluate_rule(rule, exec_results)
+    for r_result in result_iter:
         all_results.append(r_result)
+        if ndjson is not None:
+            ndjson.write_result(r_result)
+    exec_seconds = profiler.end("execute_evaluate")
+    total_subrules = sum(len(rule.rules) for rule in scan_rules)
+    if stored is not None:
+        skipped_subrules = sum(r.skipped_subrules for r, old in zip(all_results, stored) if old is None)
+    else:
+        skipped_subrules = sum(r.skipped_subrules for r in all_results)
+    if registry is not None:
+        print(f"Registry: {registry.stats()}")
+        registry.close()
+    print(f"Sub-rule dedup: {index.stats()}")
+    if state is not None:
+        state.update(all_rules, all_results, index.verdicts)
+        try:
+            state.save()
+        except OSError as e:
+            print(f"Error writing incremental state: {e}")
+        print(f"Incremental: {state.stats()} ({args.incremental})")
+    if commands is not None and commands.spawns:
+        print(f"Commands: {commands.stats()}")
+    if scanner is not None and scanner.spawns:
+        print(f"Async engine: {scanner.stats()}")
+    if shell_pool is not None and shell_pool.recycled:
+        print(f"Shell workers: {shell_pool.recycled} recycled after a timeout or crash")
+    close_command_runners()
+
+    # 4. Summaries
+    for sca_file, reason in skipped_policies:
+        print(f"Skipped policy {sca_file.policy.id or sca_file.policy.file}: {reason}")
+    if skipped_policies:
+        skipped_checks = sum(len(p.checks) for p, _ in skipped_policies)
+        line = f"Skipped {len(skipped_policies)} policies ({skipped_checks} checks)"
+        if all_rules:
+            saved = exec_seconds / len(all_rules) * skipped_checks
+            line += f", est. {saved:.2f}s saved"
+        print(line)
+
+    if skipped_subrules:
+        print(f"Short-circuit: skipped {skipped_subrules} of {total_subrules} sub-rules "
+              f"(use --exhaustive to run them all)")
+    if scanner is not None:
+        engine_label = f"async, concurrency {args.concurrency}"
+    else:
+        engine_label = f"{args.workers} worker(s)"
+    print(f"Timing: load {profiler.stages['load_rules']:.2f}s, "
+          f"requirements {profiler.stages['requirements']:.2f}s, execute+evaluate {exec_seconds:.2f}s "
+          f"({total_subrules - skipped_subrules} sub-rules, {engine_label})")
 
-    # 3. Summaries
     passed_count = sum(1 for r in all_results if r.status == "PASS")
     failed_count = len(all_results) - passed_count
     print(f"Passed: {passed_count}, Failed: {failed_count}")
 
-    # 4. Ensure output folders exist
+    # 5. Ensure output folders exist
     os.makedirs(os.path.dirname(args.json), exist_ok=True)
     os.makedirs(os.path.dirname(args.html), exist_ok=True)
 
-    # 5. Generate Enhanced JSON & HTML
-    write_enhanced_json_report(
-        results=all_results,
-        host=args.host,
-        os_name=args.os,
-        passed_count=passed_count,
-        failed_count=failed_count,
-        json_path=args.json,
-        benchmark_name=args.benchmark
-    )
-
-    write_enhanced_html_report(
-        results=all_results,
-        host=args.host,
-        os_name=args.os,
-        passed_count=passed_count,
-        failed_count=failed_count,
-        html_path=args.html,
-        benchmark_name=args.benchmark
-    )
+    # 6. Generate Enhanced HTML & JSON (HTML first, so its timing lands in the JSON)
+    write_html_report = write_compact_html_report if args.html_format == "compact" else write_enhanced_html_report
+    with profiler.stage("report_html"):
+        write_html_report(
+            results=all_results,
+            host=args.host,
+            os_name=args.os,
+            passed_count=passed_count,
+            failed_count=failed_count,
+            html_path=args.html,
+            benchmark_name=args.benchmark
+        )
+
+    with profiler.stage("report_json"):
+        timings = profiler.to_dict(args.profile or 20)
+        if ndjson is not None:
+            ndjson.close(timings=timings)
+        else:
+            write_enhanced_json_report(
+                results=all_results,
+                host=args.host,
+                os_name=args.os,
+                passed_count=passed_count,
+                failed_count=failed_count,
+                json_path=args.json,
+                benchmark_name=args.benchmark,
+                timings=timings
+            )
 
     print(f"JSON report saved to: {args.json}")
     print(f"HTML report saved to: {args.html}")
+    if args.history:
+        with profiler.stage("history"):
+            try:
+                scan_id = record_scan(args.history, all_results, args.host, args.os, args.benchmark)
+                print(f"History: scan {scan_id} recorded in {args.history}")
+            except sqlite3.Error as e:
+                print(f"Error writing history: {e}")
+    if profiler.detailed:
+        print("Stages: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in profiler.stages.items()))
+        profiler.print_summary(args.profile)
 
-    # 6. Exit code 1 if any checks fail
+    # 7. Exit code 1 if any checks fail
     if failed_count > 0:
         sys.exit(1)
     sys.exit(0)
@@ -0,0 +1,192 @@
+# File: matchers.py
+#
+# Content-matching engine for the text after the last '->' of a sub-rule.
+# Supports the Wazuh SCA syntax used by the shipped rules:
+#   r:REGEX                      regex search (case-insensitive)
+#   !r:REGEX                     negated regex
+#   n:REGEX compare OP NUMBER    numeric compare on the regex's first group
+#                                (OP: <, <=, ==, !=, >=, >; '=>' and '=<' accepted)
+#   LITERAL                      whole-value comparison (case-insensitive)
+#   A && B && ...                every part must match
+# plus this scanner's own 'exists', 'missing' and 'regex:REGEX' (anchored).
+
+import re
+import operator
+from functools import lru_cache
+from typing import Tuple
+
+class MatcherSyntaxError(ValueError):
+    """Raised for content expressions that can't be compiled."""
+
+_regex_cache = {}
+
+def compile_regex(pattern: str):
+    """re.compile with IGNORECASE|MULTILINE, cached across every rule that uses the pattern."""
+    regex = _regex_cache.get(pattern)
+    if regex is None:
+        try:
+            regex = re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+        except re.error as e:
+            raise MatcherSyntaxError(f"Invalid regex '{pattern}': {e}")
+        _regex_cache[pattern] = regex
+    return regex
+
+class ExistsMatcher:
+    """'exists': the file check found the file."""
+    def match(self, value: str) -> Tuple[bool, str]:
+        if value == "exists":
+            return True, "file found"
+        return False, f"file not found ({value})"
+
+class MissingMatcher:
+    """'missing': the file check did not find the file."""
+    def match(self, value: str) -> Tuple[bool, str]:
+        if value == "missing":
+            return True, "file is missing"
+        return False, f"file is present ({value})"
+
+class RegexMatcher:
+    """'r:PATTERN' (searched anywhere) or 'regex:PATTERN' (anchored at the start)."""
+    def __init__(self, pattern: str, anchored: bool = False):
+        self.pattern = pattern
+        self.anchored = anchored
+        self.regex = compile_regex(pattern)
+
+    def __getstate__(self):
+        return {"pattern": self.pattern, "anchored": self.anchored}
+
+    def __setstate__(self, state):
+        self.__init__(state["pattern"], state["anchored"])
+
+    def match(self, value: str) -> Tuple[bool, str]:
+        found = self.regex.match(value) if self.anchored else self.regex.search(value)
+        if found:
+            return True, "regex matched"
+        return False, f"regex '{self.pattern}' did not match '{value}'"
+
+COMPARE_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    "=<": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "=>": operator.ge,
+    ">": operator.gt,
+}
+
+_COMPARE_RE = re.compile(r"^(.*?)\s+compare\s+(<=|=<|>=|=>|==|!=|<|>)\s*(-?\d+(?:\.\d+)?)\s*$",
+                         re.IGNORECASE)
+
+class NumericMatcher:
+    """'n:REGEX compare OP NUMBER': compare the number captured by REGEX's first group."""
+    def __init__(self, expression: str):
+        parsed = _COMPARE_RE.match(expression)
+        if not parsed:
+            raise MatcherSyntaxError(f"Invalid numeric compare 'n:{expression}'")
+        self.expression = expression
+        self.pattern, self.op, number = parsed.groups()
+        self.number = float(number) if "." in number else int(number)
+        self.regex = compile_regex(self.pattern)
+        if self.regex.groups < 1:
+            raise MatcherSyntaxError(f"Numeric compare needs a capture group: 'n:{expression}'")
+
+    def __getstate__(self):
+        return {"expression": self.expression}
+
+    def __setstate__(self, state):
+        self.__init__(state["expression"])
+
+    def match(self, value: str) -> Tuple[bool, str]:
+        found = self.regex.search(value)
+        if not found:
+            return False, f"no number matching '{self.pattern}' in '{value}'"
+        try:
+            captured = float(found.group(1))
+        except (TypeError, ValueError):
+            return False, f"'{found.group(1)}' is not a number"
+        if COMPARE_OPERATORS[self.op](captured, self.number):
+            return True, f"{found.group(1)} {self.op} {self.number}"
+        return False, f"{found.group(1)} is not {self.op} {self.number}"
+
+class LiteralMatcher:
+    """A bare value such as '-> 1': the whole value must equal it (case-insensitive)."""
+    def __init__(self, text: str):
+        self.text = text
+        self.lowered = text.lower()
+
+    def match(self, value: str) -> Tuple[bool, str]:
+        if value.strip().lower() == self.lowered:
+            return True, f"value is '{self.text}'"
+        return False, f"expected '{self.text}', got '{value}'"
+
+class NotMatcher:
+    """'!EXPR': inverts another matcher."""
+    def __init__(self, inner):
+        self.inner = inner
+
+    def match(self, value: str) -> Tuple[bool, str]:
+        passed, reason = self.inner.match(value)
+        return not passed, f"not ({reason})"
+
+class AllMatcher:
+    """'A && B && ...': every part has to match the same value."""
+    def __init__(self, parts):
+        self.parts = parts
+
+    def match(self, value: str) -> Tuple[bool, str]:
+        for part in self.parts:
+            passed, reason = part.match(value)
+            if not passed:
+                return False, reason
+        return True, "all conditions matched"
+
+class AnyLineMatcher:
+    """
+    For file contents and command output: passes when any single line
+    satisfies the inner matcher (so '&&' parts apply to the same line).
+    """
+    def __init__(self, inner):
+        self.inner = inner
+
+    def match(self, value: str) -> Tuple[bool, str]:
+        reason = f"no line matched in '{value}'"
+        for line in value.splitlines() or [""]:
+            passed, line_reason = self.inner.match(line)
+            if passed:
+                return True, line_reason
+            reason = line_reason
+        return False, reason
+
+_SPLIT_AND = re.compile(r"\s+&&\s+")
+
+def _compile_part(part: str):
+    if part.startswith("!"):
+        return NotMatcher(_compile_part(part[1:].lstrip()))
+    lowered = part.lower()
+    if lowered.startswith("r:"):
+        return RegexMatcher(part[2:])
+    if lowered.startswith("n:"):
+        return NumericMatcher(part[2:])
+    if lowered.startswith("regex:"):
+        return RegexMatcher(part[6:].strip(), anchored=True)
+    return LiteralMatcher(part)
+
+@lru_cache(maxsize=None)
+def compile_content(content: str):
+    """
+    Compile a content expression into a matcher object with a
+    match(value) -> (passed, reason) method. Identical expressions share
+    one matcher. Returns None for an empty expression.
+    Raises MatcherSyntaxError if malformed.
+    """
+    content = content.strip()
+    if not content:
+        return None
+    lowered = content.lower()
+    if lowered == "exists":
+        return ExistsMatcher()
+    if lowered == "missing":
+        return MissingMatcher()
+    parts = [_compile_part(p.strip()) for p in _SPLIT_AND.split(content)]
+    return parts[0] if len(parts) == 1 else AllMatcher(parts)
@@ -3,14 +3,41 @@
 import os
 import glob
 import yaml
-from typing import List
+from typing import List, Optional
 from sca_structs import SCAFile, Rule, PolicyBlock, RequirementsBlock
+from rule_cache import RuleCache
+from rule_compiler import compile_subrules
 
-def load_sca_file(file_path: str) -> SCAFile:
+# PyYAML only exposes CSafeLoader when it was built against libyaml;
+# fall back to the pure-Python loader otherwise.
+YAML_LOADERS = {"python": yaml.SafeLoader}
+if hasattr(yaml, "CSafeLoader"):
+    YAML_LOADERS["c"] = yaml.CSafeLoader
+
+def get_yaml_loader(name: str = "auto"):
+    """
+    Resolve a loader name to a PyYAML loader class.
+    'auto' picks the libyaml C loader when available, 'c' and 'python' force one.
+    """
+    if name == "auto":
+        return YAML_LOADERS.get("c", yaml.SafeLoader)
+    if name not in YAML_LOADERS:
+        raise ValueError(f"YAML loader '{name}' is not available (have: {', '.join(YAML_LOADERS)})")
+    return YAML_LOADERS[name]
+
+def load_sca_file(file_path: str, loader=None) -> SCAFile:
     """Parse a single .yml file into an SCAFile object."""
+    return build_sca_file(read_yaml(file_path, loader))
+
+def read_yaml(file_path: str, loader=None) -> dict:
+    """The plain YAML data of one .yml file (what the RuleCache stores)."""
+    if loader is None:
+        loader = get_yaml_loader()
     with open(file_path, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
+        return yaml.load(f, Loader=loader) or {}
 
+def build_sca_file(data: dict) -> SCAFile:
+    """Build an SCAFile from the YAML data of one file, compiling its sub-rules."""
     sca = SCAFile()
 
     # Fill 'policy' block
@@ -27,6 +54,7 @@ def load_sca_file(file_path: str) -> SCAFile:
     sca.requirements.description = req_data.get("description", "")
     sca.requirements.condition = req_data.get("condition", "all")
     sca.requirements.rules = req_data.get("rules", [])
+    sca.requirements.compiled = compile_subrules(sca.requirements.rules, "requirements", sca.errors)
 
     # Fill 'checks' array
     checks_data = data.get("checks", [])
@@ -43,23 +71,49 @@ def load_sca_file(file_path: str) -> SCAFile:
             condition=item.get("condition", "all"),
             rules=item.get("rules", [])
         )
+        # Parse sub-rules once here; malformed ones are reported in sca.errors
+        rule_obj.compiled = compile_subrules(rule_obj.rules, f"check {rule_obj.id}", sca.errors)
         sca.checks.append(rule_obj)
 
     return sca
 
-def load_all_rules(rules_dir: str) -> List[Rule]:
+def load_all_policies(rules_dir: str, cache: Optional[RuleCache] = None,
+                      yaml_loader: str = "auto") -> List[SCAFile]:
     """
-    Finds all .yml files in rules_dir, parses each into SCAFile,
-    and merges the checks into a single list of Rule objects.
+    Finds all .yml files in rules_dir and parses each into an SCAFile,
+    keeping the policy/requirements blocks alongside the checks.
+    If a RuleCache is given, the YAML data of unchanged files is loaded from
+    it instead of being re-parsed. yaml_loader selects the YAML loader (see
+    get_yaml_loader).
     """
     pattern = os.path.join(rules_dir, "*.yml")
     files = glob.glob(pattern)
     if not files:
         raise FileNotFoundError(f"No .yml files found in {rules_dir}")
 
-    all_rules = []
+    loader = get_yaml_loader(yaml_loader)
+
+    def read(file_path):
+        return read_yaml(file_path, loader)
+
+    policies = []
     for file_path in files:
-        sca_file = load_sca_file(file_path)
+        if cache is not None:
+            data = cache.load(file_path, read, loader.__name__)
+        else:
+            data = read(file_path)
+        policies.append(build_sca_file(data))
+
+    return policies
+
+def load_all_rules(rules_dir: str, cache: Optional[RuleCache] = None,
+                   yaml_loader: str = "auto") -> List[Rule]:
+    """
+    Finds all .yml files in rules_dir, parses each into SCAFile,
+    and merges the checks into a single list of Rule objects.
+    """
+    all_rules = []
+    for sca_file in load_all_policies(rules_dir, cache=cache, yaml_loader=yaml_loader):
         # We only append the "checks" from each file, ignoring policy/requirements
         all_rules.extend(sca_file.checks)
 
@@ -0,0 +1,93 @@
+# File: profiling.py
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Upper bounds (seconds) of the sub-rule duration histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS = [0.0001, 0.001, 0.01, 0.1, 1.0]
+HISTOGRAM_LABELS = ["<0.1ms", "<1ms", "<10ms", "<100ms", "<1s", ">=1s"]
+
+class Profiler:
+    """
+    Monotonic timers for a scan. Stage timers (load, execute, reports...) are
+    always on and cost a couple of clock reads each. Per-rule and per-sub-rule
+    timings are only collected when 'detailed' is set (--profile); otherwise
+    the callers skip the instrumentation entirely.
+    """
+    def __init__(self, detailed: bool = False):
+        self.detailed = detailed
+        self.stages = {}                       # stage name -> seconds
+        self.rule_times = []                   # (seconds, rule id, title)
+        self.kind_stats = {}                   # sub-rule kind -> [count, total seconds, histogram]
+        self._lock = threading.Lock()
+        self._started = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def begin(self, name: str):
+        """Start timing a stage that doesn't fit in a 'with' block; pair with end()."""
+        self._started[name] = time.monotonic()
+
+    def end(self, name: str) -> float:
+        """Stop a stage started with begin(); returns the accumulated seconds."""
+        elapsed = time.monotonic() - self._started.pop(name)
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+        return self.stages[name]
+
+    def record_subrule(self, kind: str, seconds: float):
+        bucket = len(HISTOGRAM_BOUNDS)
+        for i, bound in enumerate(HISTOGRAM_BOUNDS):
+            if seconds < bound:
+                bucket = i
+                break
+        with self._lock:
+            stats = self.kind_stats.get(kind)
+            if stats is None:
+                stats = self.kind_stats[kind] = [0, 0.0, [0] * len(HISTOGRAM_LABELS)]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2][bucket] += 1
+
+    def record_rule(self, rule_id: int, title: str, seconds: float):
+        with self._lock:
+            self.rule_times.append((seconds, rule_id, title))
+
+    def slowest_rules(self, top_n: int) -> List[Tuple[float, int, str]]:
+        return sorted(self.rule_times, key=lambda t: t[0], reverse=True)[:top_n]
+
+    def to_dict(self, top_n: int = 20) -> Dict:
+        """The 'timings' section of the JSON report."""
+        data = {"stages": {name: round(seconds, 6) for name, seconds in self.stages.items()}}
+        if self.detailed:
+            data["subrule_types"] = {
+                kind: {
+                    "count": count,
+                    "total_seconds": round(total, 6),
+                    "histogram": dict(zip(HISTOGRAM_LABELS, hist))
+                }
+                for kind, (count, total, hist) in sorted(self.kind_stats.items())
+            }
+            data["slowest_rules"] = [
+                {"id": rule_id, "title": title, "seconds": round(seconds, 6)}
+                for seconds, rule_id, title in self.slowest_rules(top_n)
+            ]
+        return data
+
+    def print_summary(self, top_n: int):
+        """Console tables for --profile: slowest checks and the per-type histogram."""
+        print(f"Top {top_n} slowest checks:")
+        print(f"  {'seconds':>9}  {'id':>6}  title")
+        for seconds, rule_id, title in self.slowest_rules(top_n):
+            print(f"  {seconds:9.4f}  {rule_id:>6}  {title[:80]}")
+        print("Sub-rule durations by type:")
+        print(f"  {'type':<4} {'count':>6} {'total s':>9}  " + " ".join(f"{label:>7}" for label in HISTOGRAM_LABELS))
+        for kind, (count, total, hist) in sorted(self.kind_stats.items()):
+            print(f"  {kind or '?':<4} {count:>6} {total:9.3f}  " + " ".join(f"{n:>7}" for n in hist))
@@ -0,0 +1,352 @@
+# File: registry.py
+
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# If you're on Windows, you can import winreg. For non-Windows, handle differently.
+if sys.platform.startswith("win"):
+    import winreg
+
+# Registry value types (same numbers as winreg.REG_*), usable off Windows too
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_MULTI_SZ = 7
+REG_QWORD = 11
+
+HIVE_ALIASES = {
+    "HKLM": "HKEY_LOCAL_MACHINE",
+    "HKEY_LOCAL_MACHINE": "HKEY_LOCAL_MACHINE",
+    "HKCU": "HKEY_CURRENT_USER",
+    "HKEY_CURRENT_USER": "HKEY_CURRENT_USER",
+    "HKU": "HKEY_USERS",
+    "HKEY_USERS": "HKEY_USERS",
+    "HKCR": "HKEY_CLASSES_ROOT",
+    "HKEY_CLASSES_ROOT": "HKEY_CLASSES_ROOT",
+}
+
+def canonical_hive(hive_str: str) -> str:
+    """
+    Maps short/long hive names to the long form, e.g. HKLM -> HKEY_LOCAL_MACHINE.
+    Raises ValueError for anything else.
+    """
+    try:
+        return HIVE_ALIASES[hive_str.upper()]
+    except KeyError:
+        raise ValueError(f"Unsupported hive: {hive_str}")
+
+def split_hive(reg_path: str):
+    """
+    Splits "HKLM\\Software\\MyKey" into ("HKLM", "Software\\MyKey").
+    If no backslash found, path_str might be empty.
+    """
+    parts = reg_path.split("\\", 1)
+    if len(parts) == 1:
+        return parts[0], ""
+    else:
+        return parts[0], parts[1]
+
+###################################################
+# Backends
+###################################################
+
+class RegistryBackend:
+    """
+    The few registry operations the scanner needs. Hives are passed as
+    canonical names (see canonical_hive); missing keys/values raise
+    FileNotFoundError like winreg does.
+    """
+    def open_key(self, hive: str, path: str):
+        raise NotImplementedError
+
+    def query_value(self, handle, name: str) -> Tuple[object, int]:
+        raise NotImplementedError
+
+    def enum_values(self, handle) -> Iterator[Tuple[str, object, int]]:
+        """Every (name, value, type) of an open key, like a winreg.EnumValue loop."""
+        raise NotImplementedError
+
+    def key_timestamp(self, handle) -> Optional[int]:
+        """
+        Last write time of an open key as an integer that grows with every
+        write to the key's values, or None if the backend can't tell.
+        """
+        return None
+
+    def close_key(self, handle):
+        pass
+
+class WinRegBackend(RegistryBackend):
+    """Live registry access through winreg (Windows only)."""
+    def open_key(self, hive: str, path: str):
+        return winreg.OpenKey(getattr(winreg, hive), path)
+
+    def query_value(self, handle, name: str) -> Tuple[object, int]:
+        return winreg.QueryValueEx(handle, name)
+
+    def enum_values(self, handle) -> Iterator[Tuple[str, object, int]]:
+        _, value_count, _ = winreg.QueryInfoKey(handle)
+        for i in range(value_count):
+            yield winreg.EnumValue(handle, i)
+
+    def key_timestamp(self, handle) -> Optional[int]:
+        # 100ns intervals since 1601-01-01, updated on every write to the key
+        return winreg.QueryInfoKey(handle)[2]
+
+    def close_key(self, handle):
+        handle.Close()
+
+class FakeRegistryBackend(RegistryBackend):
+    """
+    In-memory registry for running and measuring scans off Windows.
+    'data' maps full key paths to {value name: value}, e.g.
+    {"HKLM\\System\\CurrentControlSet\\Control\\Lsa": {"LimitBlankPasswordUse": 1}}.
+    Lookups are case-insensitive; every API call is counted in self.calls.
+    Every set_key() advances a logical clock and stamps the key with it, as a
+    registry write updates the key's last write time; set_timestamp() sets
+    one directly.
+    """
+    def __init__(self, data: Dict[str, Dict[str, object]] = None):
+        self.keys = {}
+        self.names = {}    # (hive, path lower, name lower) -> name as written
+        self.timestamps = {}   # (hive, path lower) -> last write time
+        self.clock = 0
+        self.calls = Counter()
+        for key_path, values in (data or {}).items():
+            self.set_key(key_path, values)
+
+    def set_key(self, key_path: str, values: Dict[str, object]):
+        hive, _, path = key_path.partition("\\")
+        key = (canonical_hive(hive), path.lower())
+        entry = self.keys.setdefault(key, {})
+        for name, value in values.items():
+            entry[(name or "").lower()] = (value, infer_reg_type(value))
+            self.names[key + ((name or "").lower(),)] = name or ""
+        self.clock += 1
+        self.timestamps[key] = self.clock
+
+    def set_timestamp(self, key_path: str, timestamp: int):
+        hive, _, path = key_path.partition("\\")
+        self.timestamps[(canonical_hive(hive), path.lower())] = timestamp
+
+    def open_key(self, hive: str, path: str):
+        self.calls["open_key"] += 1
+        key = (hive, path.lower())
+        if key not in self.keys:
+            raise FileNotFoundError(2, "The system cannot find the file specified")
+        return key
+
+    def query_value(self, handle, name: str) -> Tuple[object, int]:
+        self.calls["query_value"] += 1
+        try:
+            return self.keys[handle][(name or "").lower()]
+        except KeyError:
+            raise FileNotFoundError(2, "The system cannot find the file specified")
+
+    def enum_values(self, handle) -> Iterator[Tuple[str, object, int]]:
+        self.calls["enum_values"] += 1
+        for name, (value, reg_type) in self.keys[handle].items():
+            yield self.names[handle + (name,)], value, reg_type
+
+    def key_timestamp(self, handle) -> Optional[int]:
+        self.calls["key_timestamp"] += 1
+        return self.timestamps.get(handle)
+
+    def close_key(self, handle):
+        self.calls["close_key"] += 1
+
+def infer_reg_type(value) -> int:
+    """Best-guess REG_* type for a plain Python value."""
+    if isinstance(value, bool) or isinstance(value, int):
+        return REG_DWORD if 0 <= int(value) <= 0xFFFFFFFF else REG_QWORD
+    if isinstance(value, (list, tuple)):
+        return REG_MULTI_SZ
+    if isinstance(value, (bytes, bytearray)):
+        return REG_BINARY
+    return REG_SZ
+
+###################################################
+# Cached access layer
+###################################################
+
+class RegistryReader:
+    """
+    Per-scan registry access on top of a RegistryBackend. Each key is opened
+    at most once and each value read at most once; later lookups (and
+    failures) are served from memory. Call close() at the end of the scan.
+    Safe to share between threads: the lock only guards the caches, backend
+    calls run outside it, and a thread asking for a key or value another
+    thread is already reading waits for that result (single-flight).
+    """
+    def __init__(self, backend: RegistryBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._handles = {}   # (hive, path lower) -> handle or exception
+        self._values = {}    # (hive, path lower, name lower) -> (value, type) or exception
+        self._enumerated = set()   # (hive, path lower) whose values are all in _values
+        self._pending: Dict[tuple, Future] = {}   # backend reads in flight
+        self.key_hits = 0
+        self.key_misses = 0
+        self.value_hits = 0
+        self.value_misses = 0
+        self.values_enumerated = 0
+
+    def _claim(self, pending_key: tuple) -> Tuple[Future, bool]:
+        """(future, owner) for a backend read; the owner performs it, others wait. Call with the lock held."""
+        future = self._pending.get(pending_key)
+        if future is not None:
+            return future, False
+        future = self._pending[pending_key] = Future()
+        return future, True
+
+    def _open(self, hive: str, path: str):
+        key = (hive, path.lower())
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                self.key_hits += 1
+            else:
+                future, owner = self._claim(("key",) + key)
+                if owner:
+                    self.key_misses += 1
+                else:
+                    self.key_hits += 1
+        if handle is None:
+            if owner:
+                try:
+                    handle = self.backend.open_key(hive, path)
+                except OSError as e:
+                    handle = e
+                with self._lock:
+                    self._handles[key] = handle
+                    del self._pending[("key",) + key]
+                future.set_result(handle)
+            else:
+                handle = future.result()
+        if isinstance(handle, OSError):
+            raise handle
+        return handle
+
+    def key_exists(self, hive: str, path: str) -> bool:
+        try:
+            self._open(hive, path)
+            return True
+        except OSError:
+            return False
+
+    def read_value(self, hive: str, path: str, name: str) -> Tuple[object, int]:
+        """Return (value, type) for hive\\path -> name, raising OSError if absent."""
+        key = (hive, path.lower(), (name or "").lower())
+        with self._lock:
+            result = self._values.get(key)
+            if result is not None:
+                self.value_hits += 1
+            elif key[:2] in self._enumerated:
+                # Prefetched key without this value: no need to ask the backend
+                self.value_hits += 1
+                result = self._values[key] = FileNotFoundError(2, "The system cannot find the file specified")
+            else:
+                future, owner = self._claim(("value",) + key)
+                if owner:
+                    self.value_misses += 1
+                else:
+                    self.value_hits += 1
+        if result is None:
+            if owner:
+                try:
+                    result = self.backend.query_value(self._open(hive, path), name)
+                except OSError as e:
+                    result = e
+                with self._lock:
+                    self._values[key] = result
+                    del self._pending[("value",) + key]
+                future.set_result(result)
+            else:
+                result = future.result()
+        if isinstance(result, OSError):
+            raise result
+        return result
+
+    def key_timestamp(self, hive: str, path: str) -> Optional[int]:
+        """The backend's last write time of hive\\path (None if unknown), raising OSError if the key is absent."""
+        return self.backend.key_timestamp(self._open(hive, path))
+
+    def read_batch(self, groups: Dict[Tuple[str, str], Iterable[str]]):
+        """
+        Read every value of every key in 'groups' ({(hive, path): value names}),
+        opening each key once. Results land in the cache for read_value().
+        """
+        for (hive, path), names in groups.items():
+            for name in names:
+                try:
+                    self.read_value(hive, path, name)
+                except OSError:
+                    pass
+
+    def prefetch(self, keys: Iterable[Tuple[str, str]]) -> bool:
+        """
+        Open each (hive, path) key once and enumerate all of its values into
+        the cache, so later read_value() calls on these keys never reach the
+        backend. Returns False (nothing enumerated) if the backend can't
+        enumerate values; lookups then fall back to one query per value.
+        """
+        for hive, path in keys:
+            try:
+                handle = self._open(hive, path)
+            except OSError:
+                continue
+            key = (hive, path.lower())
+            with self._lock:
+                if key in self._enumerated:
+                    continue
+                future, owner = self._claim(("enum",) + key)
+            if not owner:
+                if future.result() is None:
+                    return False
+                continue
+            complete = False
+            try:
+                values = [((name or "").lower(), (value, reg_type))
+                          for name, value, reg_type in self.backend.enum_values(handle)]
+                complete = True
+            except NotImplementedError:
+                values = None
+            except OSError:
+                # Not enumerated; lookups on this key query the backend
+                values = []
+            with self._lock:
+                for name, entry in values or ():
+                    self._values.setdefault(key + (name,), entry)
+                    self.values_enumerated += 1
+                if complete:
+                    self._enumerated.add(key)
+                del self._pending[("enum",) + key]
+            future.set_result(values)
+            if values is None:
+                return False
+        return True
+
+    def stats(self) -> str:
+        line = f"keys opened {self.key_misses} (reused {self.key_hits}), "
+        if self._enumerated:
+            line += f"keys enumerated {len(self._enumerated)} ({self.values_enumerated} values), "
+        return line + f"values read {self.value_misses} (reused {self.value_hits})"
+
+    def close(self):
+        with self._lock:
+            self._close_all()
+
+    def _close_all(self):
+        for handle in self._handles.values():
+            if not isinstance(handle, OSError):
+                try:
+                    self.backend.close_key(handle)
+                except OSError:
+                    pass
+        self._handles.clear()
+        self._values.clear()
+        self._enumerated.clear()
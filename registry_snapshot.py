@@ -0,0 +1,259 @@
+# File: registry_snapshot.py
+
+import sys
+import json
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from json_stream import JsonStream
+from registry import (
+    RegistryBackend, canonical_hive, infer_reg_type,
+    REG_SZ, REG_EXPAND_SZ, REG_BINARY, REG_DWORD, REG_MULTI_SZ, REG_QWORD
+)
+
+REG_TYPE_NAMES = {
+    "REG_SZ": REG_SZ,
+    "REG_EXPAND_SZ": REG_EXPAND_SZ,
+    "REG_BINARY": REG_BINARY,
+    "REG_DWORD": REG_DWORD,
+    "REG_MULTI_SZ": REG_MULTI_SZ,
+    "REG_QWORD": REG_QWORD,
+}
+
+# Malformed values described in SnapshotBackend.bad_samples
+BAD_SAMPLES = 5
+
+class _KeyNode:
+    """One registry key: lower-cased child names -> _KeyNode, value names -> (value, type)."""
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children = None
+        self.values = None
+
+class SnapshotBackend(RegistryBackend):
+    """
+    Read-only registry backend over an exported snapshot, so scans can run
+    off Windows. Keys are stored as a tree of interned, lower-cased path
+    segments, which keeps large exports compact.
+
+    Use SnapshotBackend.load(path) for a regedit /e export (.reg) or a JSON
+    snapshot (.json: {"HKLM\\...": {"Name": value}}; .jsonl: one
+    {"key": "HKLM\\...", "values": {...}} object per line). JSON values are
+    plain (type inferred) or {"type": "REG_DWORD", "data": 1}. All three
+    formats are read incrementally, one key at a time.
+    Malformed values (e.g. 'dword:xyz', an unknown type) are skipped and
+    counted in 'bad_values'; 'bad_samples' describes the first few.
+    """
+    def __init__(self, keep: Optional[Set[Tuple[str, str]]] = None):
+        self.roots = {}     # canonical hive -> _KeyNode
+        # Optional filter: only these (hive, path lower) keys are stored
+        self.keep = keep
+        self.key_count = 0
+        self.value_count = 0
+        self.bad_values = 0
+        self.bad_samples: List[str] = []
+
+    @classmethod
+    def load(cls, path: str, keep: Optional[Set[Tuple[str, str]]] = None) -> "SnapshotBackend":
+        backend = cls(keep)
+        lower = path.lower()
+        if lower.endswith(".jsonl"):
+            backend.load_jsonl(path)
+        elif lower.endswith(".json"):
+            backend.load_json(path)
+        else:
+            backend.load_reg(path)
+        return backend
+
+    ###################################################
+    # Tree
+    ###################################################
+
+    def _node(self, key_path: str, create: bool) -> Optional[_KeyNode]:
+        hive_str, _, path = key_path.partition("\\")
+        try:
+            hive = canonical_hive(hive_str)
+        except ValueError:
+            return None
+        return self._walk(hive, path, create)
+
+    def _walk(self, hive: str, path: str, create: bool) -> Optional[_KeyNode]:
+        if create and self.keep is not None and (hive, path.lower()) not in self.keep:
+            return None
+        node = self.roots.get(hive)
+        if node is None:
+            if not create:
+                return None
+            node = self.roots[hive] = _KeyNode()
+        for segment in path.lower().split("\\"):
+            if not segment:
+                continue
+            child = node.children.get(segment) if node.children else None
+            if child is None:
+                if not create:
+                    return None
+                if node.children is None:
+                    node.children = {}
+                child = node.children[sys.intern(segment)] = _KeyNode()
+                self.key_count += 1
+            node = child
+        return node
+
+    def _set_value(self, node: _KeyNode, name: str, value, reg_type: int):
+        if node.values is None:
+            node.values = {}
+        if isinstance(value, str):
+            value = sys.intern(value) if len(value) <= 64 else value
+        node.values[sys.intern(name.lower())] = (value, reg_type)
+        self.value_count += 1
+
+    def _bad_value(self, key_path: str, text: str):
+        self.bad_values += 1
+        if len(self.bad_samples) < BAD_SAMPLES:
+            self.bad_samples.append(f"[{key_path}] {text[:120]}")
+
+    ###################################################
+    # RegistryBackend
+    ###################################################
+
+    def open_key(self, hive: str, path: str):
+        node = self._walk(hive, path, create=False)
+        if node is None:
+            raise FileNotFoundError(2, "The system cannot find the file specified")
+        return node
+
+    def query_value(self, handle, name: str) -> Tuple[object, int]:
+        try:
+            return handle.values[(name or "").lower()]
+        except (KeyError, TypeError):
+            raise FileNotFoundError(2, "The system cannot find the file specified")
+
+    def enum_values(self, handle) -> Iterator[Tuple[str, object, int]]:
+        # Names are stored lower-cased; the reader matches case-insensitively anyway
+        for name, (value, reg_type) in (handle.values or {}).items():
+            yield name, value, reg_type
+
+    ###################################################
+    # Loaders
+    ###################################################
+
+    def load_json(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            for key_path, values in JsonStream(f).items():
+                self._add_json_key(key_path, values)
+
+    def load_jsonl(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    item = json.loads(line)
+                    self._add_json_key(item["key"], item.get("values", {}))
+
+    def _add_json_key(self, key_path: str, values: dict):
+        node = self._node(key_path, create=True)
+        if node is None:
+            return
+        if not isinstance(values, dict):
+            self._bad_value(key_path, f"values are not an object: {json.dumps(values)}")
+            return
+        for name, value in values.items():
+            if isinstance(value, dict):
+                reg_type = REG_TYPE_NAMES.get(value.get("type", "REG_SZ"))
+                if reg_type is None:
+                    self._bad_value(key_path, f"{name}: unknown type {value.get('type')!r}")
+                    continue
+                value = value.get("data")
+            else:
+                reg_type = infer_reg_type(value)
+            self._set_value(node, name, value, reg_type)
+
+    def load_reg(self, path: str):
+        """Stream a regedit export (REGEDIT4 or Version 5.00, UTF-16 or ANSI) line by line."""
+        with open(path, "rb") as raw:
+            bom = raw.read(2)
+        encoding = "utf-16" if bom in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+
+        with open(path, "r", encoding=encoding, errors="replace") as f:
+            node = None
+            key_path = ""
+            for line in _logical_lines(f):
+                if line.startswith("["):
+                    key_path = line[1:line.rfind("]")]
+                    # [-HKEY...] deletes a key; nothing to store
+                    node = None if key_path.startswith("-") else self._node(key_path, create=True)
+                elif node is not None and (line.startswith('"') or line.startswith("@")):
+                    try:
+                        parsed = _parse_reg_value(line)
+                    except ValueError:
+                        self._bad_value(key_path, line)
+                        continue
+                    if parsed is not None:
+                        self._set_value(node, *parsed)
+
+def _logical_lines(f) -> Iterable[str]:
+    """Join '\\'-continued lines (long hex data) and drop blanks and comments."""
+    pending = ""
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        if pending:
+            line = pending + line.lstrip()
+            pending = ""
+        if line.endswith("\\") and not line.startswith("["):
+            pending = line[:-1]
+            continue
+        if line and not line.startswith(";"):
+            yield line
+    if pending:
+        yield pending
+
+def _parse_reg_string(line: str, start: int) -> Tuple[str, int]:
+    """Parse a "quoted" .reg string starting at line[start] == '"'; returns (text, index after)."""
+    out = []
+    i = start + 1
+    while i < len(line):
+        ch = line[i]
+        if ch == "\\" and i + 1 < len(line):
+            out.append(line[i + 1])
+            i += 2
+            continue
+        if ch == '"':
+            return "".join(out), i + 1
+        out.append(ch)
+        i += 1
+    return "".join(out), i
+
+def _parse_reg_value(line: str):
+    """
+    Parse '"Name"=data' or '@=data' into (name, value, type); None for
+    deletions and unknown data, ValueError for malformed dword/hex data.
+    """
+    if line.startswith("@"):
+        name, pos = "", 1
+    else:
+        name, pos = _parse_reg_string(line, 0)
+    if pos >= len(line) or line[pos] != "=":
+        return None
+    data = line[pos + 1:].strip()
+
+    if data.startswith('"'):
+        return name, _parse_reg_string(data, 0)[0], REG_SZ
+    if data.lower().startswith("dword:"):
+        return name, int(data[6:], 16), REG_DWORD
+    if data.lower().startswith("hex"):
+        prefix, _, hex_data = data.partition(":")
+        reg_type = REG_BINARY
+        if "(" in prefix:
+            reg_type = int(prefix[prefix.index("(") + 1:prefix.index(")")], 16)
+        raw = bytes(int(b, 16) for b in hex_data.replace(" ", "").split(",") if b)
+        return name, _decode_reg_bytes(raw, reg_type), reg_type
+    return None   # "-" (delete value) or unknown
+
+def _decode_reg_bytes(raw: bytes, reg_type: int):
+    """Turn hex(N): payloads into the Python values winreg would return."""
+    if reg_type in (REG_SZ, REG_EXPAND_SZ):
+        return raw.decode("utf-16-le", errors="replace").rstrip("\x00")
+    if reg_type == REG_MULTI_SZ:
+        return [s for s in raw.decode("utf-16-le", errors="replace").split("\x00") if s]
+    if reg_type in (REG_DWORD, REG_QWORD):
+        return int.from_bytes(raw, "little")
+    return raw
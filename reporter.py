@@ -2,7 +2,7 @@
 
 import json
 import datetime
-from typing import List
+from typing import Iterable, Iterator, List
 from evaluator import RuleResult
 
 ###################################################
@@ -16,12 +16,14 @@ def write_enhanced_json_report(
     passed_count: int,
     failed_count: int,
     json_path: str,
-    benchmark_name: str = ""
+    benchmark_name: str = "",
+    timings: dict = None
 ):
     """
     Writes a JSON report with pass/fail counts, plus the fields from each RuleResult
     (description, rationale, remediation, compliance, condition, etc.).
     The 'benchmark_name' is optional (can be empty).
+    'timings' (Profiler.to_dict()) is added as a "timings" section when given.
     """
     total = len(results)
     score_percent = 0
@@ -40,28 +42,88 @@ def write_enhanced_json_report(
     }
 
     for r in results:
-        item = {
-            "id": r.rule_id,
-            "title": r.title,
-            "status": r.status,
-            "details": r.details,
-            "description": r.description,
-            "rationale": r.rationale,
-            "remediation": r.remediation,
-            "compliance": r.compliance,
-            "condition": r.condition
-        }
-        report_data["checks"].append(item)
+        report_data["checks"].append(check_item(r))
+    if timings is not None:
+        report_data["timings"] = timings
 
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(report_data, f, indent=2)
 
+def check_item(r: RuleResult) -> dict:
+    """The JSON representation of one RuleResult, shared by both JSON formats."""
+    return {
+        "id": r.rule_id,
+        "title": r.title,
+        "status": r.status,
+        "details": r.details,
+        "description": r.description,
+        "rationale": r.rationale,
+        "remediation": r.remediation,
+        "compliance": r.compliance,
+        "condition": r.condition
+    }
+
+###################################################
+# Streaming NDJSON Report
+###################################################
+
+class NdjsonReportWriter:
+    """
+    Writes the JSON report as newline-delimited JSON while the scan runs:
+      {"type": "header", "host": ..., "os": ..., "benchmark_name": ..., "scan_time": ...}
+      {"type": "check", "id": ..., "status": ..., ...}    one per RuleResult
+      {"type": "summary", "passed": ..., "failed": ..., "score_percent": ...}
+    Each line is flushed as it is written, so collectors can tail the file.
+    """
+    def __init__(self, json_path: str, host: str, os_name: str, benchmark_name: str = ""):
+        self.f = open(json_path, "w", encoding="utf-8")
+        self.passed = 0
+        self.failed = 0
+        self._write({
+            "type": "header",
+            "benchmark_name": benchmark_name,
+            "scan_time": datetime.datetime.now().isoformat(),
+            "host": host,
+            "os": os_name
+        })
+
+    def _write(self, record: dict):
+        self.f.write(json.dumps(record, separators=(",", ":")))
+        self.f.write("\n")
+        self.f.flush()
+
+    def write_result(self, r: RuleResult):
+        if r.status == "PASS":
+            self.passed += 1
+        else:
+            self.failed += 1
+        record = {"type": "check"}
+        record.update(check_item(r))
+        self._write(record)
+
+    def close(self, timings: dict = None):
+        """Write the summary trailer (with a "timings" section when given) and close the file."""
+        total = self.passed + self.failed
+        score_percent = 0
+        if total > 0:
+            score_percent = round((self.passed / total) * 100)
+        summary = {
+            "type": "summary",
+            "passed": self.passed,
+            "failed": self.failed,
+            "score_percent": score_percent
+        }
+        if timings is not None:
+            summary["timings"] = timings
+        self._write(summary)
+        self.f.close()
+
 ###################################################
 # Enhanced HTML Report (Bootstrap-based)
 ###################################################
 
 def write_enhanced_html_report(
-    results: List[RuleResult],
+    results: Iterable[RuleResult],
     host: str,
     os_name: str,
     passed_count: int,
@@ -73,14 +135,53 @@ def write_enhanced_html_report(
     Writes an HTML report with a summary and a table of checks.
     Each check has a toggle to reveal description, rationale, remediation, etc.
     The 'benchmark_name' is optional.
+    Rows are streamed to a buffered file as they are rendered, so 'results'
+    may be any iterable and memory use doesn't grow with the number of checks.
     """
-    total = len(results)
+    with open(html_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+        for chunk in iter_html_report(results, host, os_name, passed_count, failed_count, benchmark_name):
+            f.write(chunk)
+
+def iter_html_report(
+    results: Iterable[RuleResult],
+    host: str,
+    os_name: str,
+    passed_count: int,
+    failed_count: int,
+    benchmark_name: str = ""
+) -> Iterator[str]:
+    """
+    Yields the HTML report piece by piece: the header, one chunk per check,
+    then the footer. Totals come from passed_count/failed_count, so 'results'
+    is only iterated once.
+    """
+    total = passed_count + failed_count
     score_percent = 0
     if total > 0:
         score_percent = round((passed_count / total) * 100)
     date_str = datetime.datetime.now().strftime("%b %d, %Y @ %H:%M:%S")
 
-    html = f"""<!DOCTYPE html>
+    yield _html_header(benchmark_name, passed_count, failed_count, score_percent,
+                       date_str, host, os_name, total)
+    for i, r in enumerate(results):
+        yield render_html_row(i, r)
+    yield _HTML_FOOTER
+
+def format_compliance(compliance) -> str:
+    """Convert compliance to a readable string, e.g. 'cis: 2.3.1.2; pci_dss: 8.1'."""
+    compliance_str = ""
+    if compliance:
+        comps = []
+        for cdict in compliance:
+            for key, val_list in cdict.items():
+                comps.append(f"{key}: {', '.join(val_list)}")
+        compliance_str = "; ".join(comps)
+    return compliance_str
+
+def html_page_start(benchmark_name, passed_count, failed_count, score_percent,
+                     date_str, host, os_name, extra_style: str = "") -> str:
+    """Page head, styles and the summary boxes, shared by both HTML formats."""
+    return f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="utf-8">
@@ -119,7 +220,7 @@ def write_enhanced_html_report(
         cursor: pointer;
         color: #0d6efd;
         text-decoration: underline;
-      }}
+      }}{extra_style}
     </style>
 </head>
 <body>
@@ -155,8 +256,18 @@ def write_enhanced_html_report(
   </div>
 
   <hr/>
+"""
 
-  <h4>Checks ({total})</h4>
+def _html_header(benchmark_name, passed_count, failed_count, score_percent,
+                 date_str, host, os_name, total) -> str:
+    """Everything up to the opening <tbody>: page head, summary boxes and table header."""
+    return html_page_start(benchmark_name, passed_count, failed_count, score_percent,
+                            date_str, host, os_name) + html_table_start(f"Checks ({total})")
+
+def html_table_start(heading: str) -> str:
+    """A heading and the checks table up to its opening <tbody>; rows come from render_html_row."""
+    return f"""
+  <h4>{heading}</h4>
   <table class="table table-bordered table-hover mt-3">
     <thead class="table-light">
       <tr>
@@ -169,20 +280,13 @@ def write_enhanced_html_report(
     <tbody>
 """
 
-    for i, r in enumerate(results):
-        row_class = "pass" if r.status == "PASS" else "fail"
-        details_id = f"details-{i}"
-
-        # Convert compliance to a readable string
-        compliance_str = ""
-        if r.compliance:
-            comps = []
-            for cdict in r.compliance:
-                for key, val_list in cdict.items():
-                    comps.append(f"{key}: {', '.join(val_list)}")
-            compliance_str = "; ".join(comps)
-
-        html += f"""
+def render_html_row(i: int, r: RuleResult) -> str:
+    """The two table rows for one check: summary line plus its hidden details panel."""
+    row_class = "pass" if r.status == "PASS" else "fail"
+    details_id = f"details-{i}"
+    compliance_str = format_compliance(r.compliance)
+
+    return f"""
       <tr class="{row_class}">
         <td>{r.rule_id}</td>
         <td>{r.title}</td>
@@ -205,10 +309,12 @@ def write_enhanced_html_report(
       </tr>
 """
 
-    html += """
+HTML_TABLE_END = """
     </tbody>
   </table>
-</div>
+"""
+
+HTML_PAGE_END = """</div>
 
 <script>
 function toggleDetails(id) {
@@ -225,5 +331,249 @@ function toggleDetails(id) {
 </html>
 """
 
-    with open(html_path, "w", encoding="utf-8") as f:
-        f.write(html)
+_HTML_FOOTER = HTML_TABLE_END + HTML_PAGE_END
+
+###################################################
+# Compact HTML Report (client-side rendered)
+###################################################
+
+def write_compact_html_report(
+    results: Iterable[RuleResult],
+    host: str,
+    os_name: str,
+    passed_count: int,
+    failed_count: int,
+    html_path: str,
+    benchmark_name: str = ""
+):
+    """
+    Writes an HTML report for very large result sets. Results are embedded
+    once as compact JSON ({"rows": [[id, passed, details], ...], "texts":
+    {id: [title, description, rationale, remediation, compliance, condition]}}),
+    with long-form text stored once per rule id. The page renders rows lazily
+    (virtual scrolling, filtering, pagination) and builds detail panels on demand.
+    """
+    total = passed_count + failed_count
+    score_percent = 0
+    if total > 0:
+        score_percent = round((passed_count / total) * 100)
+    date_str = datetime.datetime.now().strftime("%b %d, %Y @ %H:%M:%S")
+
+    texts = {}
+    with open(html_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+        f.write(html_page_start(benchmark_name, passed_count, failed_count, score_percent,
+                                 date_str, host, os_name, _COMPACT_STYLE))
+        f.write(_COMPACT_BODY.replace("{total}", str(total)))
+        f.write('<script id="scan-data" type="application/json">{"rows":[')
+        for i, r in enumerate(results):
+            row = [r.rule_id, 1 if r.status == "PASS" else 0, r.details]
+            f.write(("," if i else "") + _script_json(row))
+            if r.rule_id not in texts:
+                texts[r.rule_id] = [r.title, r.description, r.rationale, r.remediation,
+                                    format_compliance(r.compliance), r.condition]
+        f.write('],"texts":')
+        f.write(_script_json({str(k): v for k, v in texts.items()}))
+        f.write("}</script>\n")
+        f.write(_COMPACT_SCRIPT)
+
+def _script_json(value) -> str:
+    """Compact JSON that is safe inside a <script> element."""
+    return json.dumps(value, separators=(",", ":")).replace("<", "\\u003c")
+
+_COMPACT_STYLE = """
+      .controls {
+        display: flex;
+        flex-wrap: wrap;
+        gap: 0.75rem;
+        align-items: center;
+        margin-bottom: 0.75rem;
+      }
+      #viewport {
+        position: relative;
+        height: 70vh;
+        overflow-y: auto;
+        border: 1px solid #dee2e6;
+      }
+      .vrow {
+        position: absolute;
+        left: 0;
+        right: 0;
+        border-bottom: 1px solid #dee2e6;
+      }
+      .vcells {
+        display: flex;
+        height: 40px;
+        align-items: center;
+      }
+      .vcells > div {
+        padding: 0 0.5rem;
+        overflow: hidden;
+        white-space: nowrap;
+        text-overflow: ellipsis;
+      }
+      .vrow .details {
+        display: block;
+        padding: 0.5rem 1rem;
+        background-color: #fff;
+      }"""
+
+_COMPACT_BODY = """
+  <h4>Checks ({total})</h4>
+  <div class="controls">
+    <input id="filter" class="form-control" style="max-width:320px" placeholder="Filter by ID or title">
+    <select id="status-filter" class="form-select" style="max-width:140px">
+      <option value="">All</option>
+      <option value="1">PASS</option>
+      <option value="0">FAIL</option>
+    </select>
+    <select id="page-size" class="form-select" style="max-width:140px">
+      <option value="100">100 / page</option>
+      <option value="1000" selected>1000 / page</option>
+      <option value="10000">10000 / page</option>
+      <option value="0">All</option>
+    </select>
+    <button id="prev" class="btn btn-outline-secondary btn-sm">&laquo; Prev</button>
+    <span id="page-info"></span>
+    <button id="next" class="btn btn-outline-secondary btn-sm">Next &raquo;</button>
+  </div>
+  <div class="vcells table-light fw-bold border">
+    <div style="width:8%">ID</div>
+    <div style="width:57%">Title</div>
+    <div style="width:10%">Status</div>
+    <div style="width:25%">Action</div>
+  </div>
+  <div id="viewport"><div id="spacer"></div></div>
+</div>
+"""
+
+_COMPACT_SCRIPT = """<script>
+var DATA = JSON.parse(document.getElementById("scan-data").textContent);
+var ROW_H = 41;          // collapsed row height in px (40px cells + border)
+var view = [];           // indices into DATA.rows that pass the filters
+var pageRows = [];       // the slice of 'view' on the current page
+var offsets = [];        // top offset of each row in pageRows
+var expanded = {};       // row index -> height of its open detail panel
+var page = 0;
+var viewport = document.getElementById("viewport");
+var spacer = document.getElementById("spacer");
+
+function esc(s) {
+  return String(s).replace(/[&<>"']/g, function (c) {
+    return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+  });
+}
+
+function pageSize() {
+  return parseInt(document.getElementById("page-size").value, 10);
+}
+
+function applyFilters() {
+  var q = document.getElementById("filter").value.toLowerCase();
+  var st = document.getElementById("status-filter").value;
+  view = [];
+  for (var i = 0; i < DATA.rows.length; i++) {
+    var row = DATA.rows[i];
+    if (st !== "" && String(row[1]) !== st) continue;
+    if (q && (row[0] + " " + DATA.texts[row[0]][0]).toLowerCase().indexOf(q) < 0) continue;
+    view.push(i);
+  }
+  page = 0;
+  layout();
+}
+
+function layout() {
+  var size = pageSize();
+  var pages = size ? Math.max(1, Math.ceil(view.length / size)) : 1;
+  page = Math.min(page, pages - 1);
+  pageRows = size ? view.slice(page * size, (page + 1) * size) : view;
+  offsets = new Array(pageRows.length);
+  var y = 0;
+  for (var k = 0; k < pageRows.length; k++) {
+    offsets[k] = y;
+    y += ROW_H + (expanded[pageRows[k]] || 0);
+  }
+  spacer.style.height = y + "px";
+  document.getElementById("page-info").textContent =
+    "Page " + (page + 1) + " of " + pages + " (" + view.length + " checks)";
+  draw();
+}
+
+function firstVisible(top) {
+  var lo = 0, hi = offsets.length - 1;
+  while (lo < hi) {
+    var mid = (lo + hi + 1) >> 1;
+    if (offsets[mid] <= top) lo = mid; else hi = mid - 1;
+  }
+  return lo;
+}
+
+function detailHtml(i) {
+  var row = DATA.rows[i], t = DATA.texts[row[0]];
+  return '<div id="details-' + i + '" class="details">' +
+    "<p><strong>Description:</strong> " + esc(t[1]) + "</p>" +
+    "<p><strong>Rationale:</strong> " + esc(t[2]) + "</p>" +
+    "<p><strong>Remediation:</strong> " + esc(t[3]) + "</p>" +
+    "<p><strong>Compliance:</strong> " + esc(t[4]) + "</p>" +
+    "<p><strong>Condition:</strong> " + esc(t[5]) + "</p>" +
+    "<p><strong>Evaluation:</strong> " + esc(row[2]) + "</p></div>";
+}
+
+function rowHtml(k) {
+  var i = pageRows[k], row = DATA.rows[i];
+  var html = '<div class="vrow ' + (row[1] ? "pass" : "fail") + '" style="top:' + offsets[k] + 'px">' +
+    '<div class="vcells"><div style="width:8%">' + row[0] + "</div>" +
+    '<div style="width:57%" title="' + esc(DATA.texts[row[0]][0]) + '">' + esc(DATA.texts[row[0]][0]) + "</div>" +
+    '<div style="width:10%">' + (row[1] ? "PASS" : "FAIL") + "</div>" +
+    '<div style="width:25%"><span class="toggle-details" onclick="toggleDetails(' + i + ')">View Details</span></div></div>';
+  if (expanded[i]) html += detailHtml(i);
+  return html + "</div>";
+}
+
+function draw() {
+  if (!pageRows.length) {
+    spacer.innerHTML = "";
+    return;
+  }
+  var top = viewport.scrollTop, bottom = top + viewport.clientHeight;
+  var html = "";
+  for (var k = firstVisible(top); k < pageRows.length && offsets[k] < bottom; k++) {
+    html += rowHtml(k);
+  }
+  spacer.innerHTML = html;
+}
+
+function toggleDetails(i) {
+  if (expanded[i]) {
+    delete expanded[i];
+  } else {
+    // Build the panel once off-screen to learn its height, then lay out around it
+    var probe = document.createElement("div");
+    probe.className = "vrow";
+    probe.style.visibility = "hidden";
+    probe.innerHTML = detailHtml(i);
+    spacer.appendChild(probe);
+    expanded[i] = probe.offsetHeight || ROW_H;
+    spacer.removeChild(probe);
+  }
+  layout();
+}
+
+viewport.addEventListener("scroll", draw);
+window.addEventListener("resize", draw);
+document.getElementById("filter").addEventListener("input", applyFilters);
+document.getElementById("status-filter").addEventListener("change", applyFilters);
+document.getElementById("page-size").addEventListener("change", function () { page = 0; layout(); });
+document.getElementById("prev").addEventListener("click", function () {
+  if (page > 0) { page--; viewport.scrollTop = 0; layout(); }
+});
+document.getElementById("next").addEventListener("click", function () {
+  var size = pageSize();
+  if (size && (page + 1) * size < view.length) { page++; viewport.scrollTop = 0; layout(); }
+});
+spacer.style.position = "relative";
+applyFilters();
+</script>
+
+</body>
+</html>
+"""
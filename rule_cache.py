@@ -0,0 +1,124 @@
+# File: rule_cache.py
+
+import os
+import sys
+import json
+import hashlib
+from typing import Callable, Optional
+
+# Bump whenever the stored entry format changes, so entries written by an
+# older scanner are ignored instead of loaded.
+CACHE_FORMAT_VERSION = 5
+
+def default_cache_dir() -> str:
+    """Per-user cache directory: %LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or ~/.cache elsewhere."""
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "windows-audit-cis", "rule_cache")
+
+DEFAULT_CACHE_DIR = default_cache_dir()
+
+class RuleCache:
+    """
+    On-disk cache of the parsed YAML of each .yml file, stored as plain JSON
+    data (never pickles), so a cache hit only skips the YAML parsing and the
+    SCAFile is rebuilt from the data. Entries are keyed by the file's
+    absolute path, size, mtime, SHA-256 and the YAML loader used, and are
+    reused until any of those change.
+    Cached rules decide which commands the scan runs, so the directory is
+    created private to the current user, and on POSIX one that is owned by
+    someone else or writable by group/others is not used at all ('disabled'
+    says why).
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, rebuild: bool = False):
+        self.cache_dir = cache_dir
+        self.rebuild = rebuild   # ignore existing entries, overwrite them
+        self.hits = 0
+        self.misses = 0
+        self.disabled = ""
+        try:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            self.disabled = unsafe_dir_reason(cache_dir)
+        except OSError as e:
+            self.disabled = f"can't create {cache_dir}: {e}"
+
+    def load(self, file_path: str, read: Callable[[str], dict], loader_name: str = "") -> dict:
+        """
+        Return the cached YAML data of file_path, or call read(file_path)
+        and store its result when the entry is missing or stale.
+        """
+        if self.disabled:
+            self.misses += 1
+            return read(file_path)
+        key = file_key(file_path) + [loader_name]
+        entry_path = self._entry_path(key[0])
+
+        if not self.rebuild:
+            cached = self._read_entry(entry_path, key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+        self.misses += 1
+        data = read(file_path)
+        self._write_entry(entry_path, key, data)
+        return data
+
+    def _entry_path(self, abs_path: str) -> str:
+        digest = hashlib.sha1(abs_path.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}-{os.path.basename(abs_path)}.json")
+
+    def _read_entry(self, entry_path: str, key: list) -> Optional[dict]:
+        try:
+            with open(entry_path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # Missing, truncated or unreadable entry: treat as a miss and rewrite it
+            return None
+
+        if (not isinstance(entry, dict) or entry.get("version") != CACHE_FORMAT_VERSION
+                or entry.get("key") != key or not isinstance(entry.get("data"), dict)):
+            return None
+        return entry["data"]
+
+    def _write_entry(self, entry_path: str, key: list, data: dict):
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        entry = {"version": CACHE_FORMAT_VERSION, "key": key, "data": data}
+        try:
+            text = json.dumps(entry, separators=(",", ":"))
+        except (TypeError, ValueError):
+            # YAML values JSON can't hold (e.g. dates): parse this file every time
+            return
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            # A read-only cache dir must never break a scan
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def unsafe_dir_reason(path: str) -> str:
+    """Why 'path' can't be trusted as a cache directory ('' if it can)."""
+    if not hasattr(os, "getuid"):
+        # Windows: the per-user profile directories are private by default
+        return ""
+    st = os.stat(path)
+    if st.st_uid != os.getuid():
+        return f"{path} is owned by another user"
+    if st.st_mode & 0o022:
+        return f"{path} is writable by other users"
+    return ""
+
+def file_key(file_path: str) -> list:
+    """[absolute path, size, mtime_ns, sha256] identifying one version of a rule file."""
+    abs_path = os.path.abspath(file_path)
+    st = os.stat(abs_path)
+    sha = hashlib.sha256()
+    with open(abs_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return [abs_path, st.st_size, st.st_mtime_ns, sha.hexdigest()]
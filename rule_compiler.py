@@ -0,0 +1,145 @@
+# File: rule_compiler.py
+
+from typing import List, Union
+from matchers import compile_content, AnyLineMatcher, ExistsMatcher, MissingMatcher, MatcherSyntaxError
+from registry import canonical_hive, split_hive
+from sca_structs import CompiledSubRule, Rule
+
+class RuleSyntaxError(ValueError):
+    """Raised for a sub-rule that can't be compiled (unknown prefix, bad hive, bad regex...)."""
+
+def compile_matcher(content: str):
+    """Compile the text after the value name/path into a matcher (see matchers.py); None if empty."""
+    try:
+        return compile_content(content)
+    except MatcherSyntaxError as e:
+        raise RuleSyntaxError(str(e))
+
+###################################################
+# Sub-rules
+###################################################
+
+def compile_subrule(sub_rule: str) -> CompiledSubRule:
+    """
+    Parse one sub-rule string, e.g.
+      r:HKLM\\Software\\... -> ValueName -> regex:^1$
+      f:C:\\Windows\\System32\\notepad.exe -> exists
+      cmd:whoami -> r:^nt authority   (c: is accepted as an alias)
+    optionally prefixed with 'not '. Raises RuleSyntaxError if malformed.
+    """
+    raw = sub_rule
+    body = sub_rule.strip()
+    negated = False
+    if body[:4].lower() == "not ":
+        negated = True
+        body = body[4:].lstrip()
+
+    lowered = body.lower()
+    if lowered.startswith("r:"):
+        parts = body[2:].split("->")
+        hive_str, path = split_hive(parts[0].strip())
+        try:
+            hive = canonical_hive(hive_str)
+        except ValueError as e:
+            raise RuleSyntaxError(str(e))
+        value_name = parts[1].strip() if len(parts) > 1 else None
+        target = f"r:{hive.lower()}\\{path.lower()}"
+        if value_name is not None:
+            target += f" -> {value_name.lower()}"
+        content = "->".join(parts[2:])
+        return CompiledSubRule(
+            raw=raw, kind="r", negated=negated, hive=hive, path=path,
+            value_name=value_name, target=target,
+            matcher=compile_matcher(content),
+            key=_subrule_key(negated, target, content)
+        )
+    elif lowered.startswith("f:"):
+        parts = body[2:].split("->", 1)
+        file_path = parts[0].strip()
+        if not file_path:
+            raise RuleSyntaxError("Missing file path")
+        content = parts[1] if len(parts) > 1 else ""
+        matcher = compile_matcher(content)
+        if matcher is None:
+            # A bare f:PATH checks that the file exists
+            matcher = ExistsMatcher()
+        # An existence check reads "exists"/"missing", a content check the
+        # file itself: different values, so different targets
+        prefix = "f" if is_existence_matcher(matcher) else "f-content"
+        target = f"{prefix}:{file_path}"
+        return CompiledSubRule(
+            raw=raw, kind="f", negated=negated, path=file_path,
+            target=target,
+            matcher=_per_line(matcher),
+            key=_subrule_key(negated, target, content)
+        )
+    elif lowered.startswith("cmd:") or lowered.startswith("c:"):
+        parts = body[body.index(":") + 1:].split("->", 1)
+        command = parts[0].strip()
+        if not command:
+            raise RuleSyntaxError("Missing command")
+        content = parts[1] if len(parts) > 1 else ""
+        target = f"cmd:{command}"
+        return CompiledSubRule(
+            raw=raw, kind="cmd", negated=negated, path=command,
+            target=target,
+            matcher=_per_line(compile_matcher(content)),
+            key=_subrule_key(negated, target, content)
+        )
+    raise RuleSyntaxError(f"Unknown prefix in {sub_rule}")
+
+def _subrule_key(negated: bool, target: str, content: str) -> str:
+    """
+    CompiledSubRule.key: the normalized target plus the content expression as
+    written (regexes are case-sensitive text, e.g. \\S vs \\s). Only
+    registry targets are case-folded, so commands or file paths that differ
+    in case never share a key.
+    """
+    key = f"{target} -> {content.strip()}" if content.strip() else target
+    return "not " + key if negated else key
+
+def _per_line(matcher):
+    """File contents and command output are matched line by line (Wazuh semantics)."""
+    if matcher is None or is_existence_matcher(matcher):
+        return matcher
+    return AnyLineMatcher(matcher)
+
+def is_existence_matcher(matcher) -> bool:
+    """True for '-> exists' / '-> missing', which only need the file's presence, not its contents."""
+    return isinstance(matcher, (ExistsMatcher, MissingMatcher))
+
+def compile_subrule_safe(sub_rule: str) -> CompiledSubRule:
+    """Like compile_subrule, but a malformed sub-rule comes back with .error set instead of raising."""
+    try:
+        return compile_subrule(sub_rule)
+    except RuleSyntaxError as e:
+        return CompiledSubRule(raw=sub_rule, target=sub_rule.strip().lower(), error=str(e),
+                               key=sub_rule.strip())
+
+def as_compiled(sub_rule: Union[str, CompiledSubRule]) -> CompiledSubRule:
+    """Accept either a sub-rule string or an already compiled one."""
+    if isinstance(sub_rule, CompiledSubRule):
+        return sub_rule
+    return compile_subrule_safe(sub_rule)
+
+def compile_subrules(sub_rules: List[str], owner: str, errors: List[str]) -> List[CompiledSubRule]:
+    """
+    Compile a list of sub-rules, appending "owner: [sub-rule] reason" to
+    'errors' for each malformed one.
+    """
+    compiled = []
+    for sub_rule in sub_rules:
+        c = compile_subrule_safe(sub_rule)
+        if c.error:
+            errors.append(f"{owner}: [{sub_rule}] {c.error}")
+        compiled.append(c)
+    return compiled
+
+def rule_compiled(rule: Rule) -> List[CompiledSubRule]:
+    """
+    rule.compiled (also works for a RequirementsBlock), compiling on first use
+    for objects built outside the parser.
+    """
+    if len(rule.compiled) != len(rule.rules):
+        rule.compiled = [compile_subrule_safe(s) for s in rule.rules]
+    return rule.compiled
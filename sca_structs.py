@@ -1,7 +1,7 @@
 # File: sca_structs.py
 
 from dataclasses import dataclass, field
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 @dataclass
 class PolicyBlock:
@@ -12,6 +12,23 @@ class PolicyBlock:
     description: str = ""
     references: List[str] = field(default_factory=list)
 
+@dataclass
+class CompiledSubRule:
+    """
+    A sub-rule string parsed once at load time (see rule_compiler.py), e.g.
+    'not r:HKLM\\...\\Lsa -> LimitBlankPasswordUse -> 1'.
+    """
+    raw: str = ""
+    kind: str = ""                      # "r", "f" or "cmd"
+    negated: bool = False               # leading 'not'
+    hive: str = ""                      # registry only, canonical (HKEY_LOCAL_MACHINE, ...)
+    path: str = ""                      # registry key path, file path or command line
+    value_name: Optional[str] = None    # registry only; None checks the key itself
+    target: str = ""                    # normalized "what is read", shared by equivalent sub-rules
+    matcher: object = None              # content check on the read value; None if there is none
+    error: str = ""                     # set when the sub-rule is malformed
+    key: str = ""                       # normalized whole sub-rule; equal keys always give the same result
+
 @dataclass
 class RequirementsBlock:
     """Represents the 'requirements:' section of a Wazuh-style SCA YAML file."""
@@ -19,6 +36,7 @@ class RequirementsBlock:
     description: str = ""
     condition: str = "all"
     rules: List[str] = field(default_factory=list)
+    compiled: List[CompiledSubRule] = field(default_factory=list)
 
 @dataclass
 class Rule:
@@ -34,6 +52,8 @@ class Rule:
     condition: str = "all"
     # sub-rules (registry/file/command checks) go here
     rules: List[str] = field(default_factory=list)
+    # the same sub-rules, parsed by rule_compiler at load time
+    compiled: List[CompiledSubRule] = field(default_factory=list)
 
 @dataclass
 class SCAFile:
@@ -41,3 +61,5 @@ class SCAFile:
     policy: PolicyBlock = field(default_factory=PolicyBlock)
     requirements: RequirementsBlock = field(default_factory=RequirementsBlock)
     checks: List[Rule] = field(default_factory=list)
+    # malformed sub-rules found while compiling, e.g. "check 15500: [r:...] Unsupported hive: XY"
+    errors: List[str] = field(default_factory=list)
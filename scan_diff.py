@@ -0,0 +1,248 @@
+# File: scan_diff.py
+#
+# 'python main.py diff OLD NEW' compares two scans - two JSON reports (either
+# format written by reporter.py) or two scans in a --history database - and
+# lists what changed by rule id: checks newly failing, newly passing, failing
+# or passing with different details, and checks only present in one scan.
+# Both sides are sorted by id (reports of one rule set already are, and the
+# sort is then a single linear pass) and walked in one merge.
+# Writes a compact JSON delta and a small HTML report of the changed rows.
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from operator import itemgetter
+from typing import Iterable, List, Tuple
+
+import history
+from evaluator import RuleResult
+from reporter import (
+    html_page_start,
+    html_table_start,
+    render_html_row,
+    HTML_TABLE_END,
+    HTML_PAGE_END
+)
+
+CATEGORIES = ("newly_failing", "newly_passing", "changed_details", "added", "removed")
+HEADINGS = {
+    "newly_failing": "Newly failing",
+    "newly_passing": "Newly passing",
+    "changed_details": "Changed details",
+    "added": "Only in the new scan",
+    "removed": "Only in the old scan",
+}
+SCAN_FIELDS = ("host", "os", "scan_time", "benchmark_name", "passed", "failed")
+
+_check_id = itemgetter("id")
+
+###################################################
+# Loading both sides
+###################################################
+
+def load_report(path: str) -> Tuple[dict, List[dict]]:
+    """
+    (scan fields, checks) of a JSON report. Unlike aggregate, which streams,
+    the whole report is needed here, so the indented document goes through
+    json.load in one call; NDJSON reports are read line by line and their
+    passed/failed counted.
+    """
+    with open(path, encoding="utf-8") as f:
+        first = f.readline()
+        try:
+            record = json.loads(first)
+        except ValueError:
+            record = None
+        if isinstance(record, dict) and record.get("type") == "header":
+            header = record
+            checks = [c for c in map(json.loads, filter(str.strip, f)) if c.get("type") == "check"]
+        else:
+            f.seek(0)
+            header = json.load(f)
+            checks = header.pop("checks", [])
+    scan = {field: header.get(field, "") for field in SCAN_FIELDS}
+    if "passed" not in header:
+        scan["passed"] = sum(1 for c in checks if c.get("status") == "PASS")
+        scan["failed"] = len(checks) - scan["passed"]
+    return scan, checks
+
+def load_history_scan(conn, scan_id: int) -> Tuple[dict, List[dict]]:
+    """(scan fields, checks) of a scan stored with --history."""
+    stored = history.load_scan(conn, scan_id)
+    return {field: stored[field] for field in SCAN_FIELDS}, stored["checks"]
+
+###################################################
+# Merge
+###################################################
+
+def diff_checks(old_checks: Iterable[dict], new_checks: Iterable[dict]) -> dict:
+    """
+    {category: [(old check, new check), ...]} for every changed check, ordered
+    by id; the missing side of "added"/"removed" is None.
+    """
+    old = sorted(old_checks, key=_check_id)
+    new = sorted(new_checks, key=_check_id)
+    delta = {category: [] for category in CATEGORIES}
+    i = j = 0
+    while i < len(old) and j < len(new):
+        a, b = old[i], new[j]
+        a_id, b_id = a["id"], b["id"]
+        if a_id == b_id:
+            i += 1
+            j += 1
+            if a["status"] != b["status"]:
+                category = "newly_failing" if a["status"] == "PASS" else "newly_passing"
+            elif a["details"] != b["details"]:
+                category = "changed_details"
+            else:
+                continue
+            delta[category].append((a, b))
+        elif a_id < b_id:
+            delta["removed"].append((a, None))
+            i += 1
+        else:
+            delta["added"].append((None, b))
+            j += 1
+    delta["removed"].extend((a, None) for a in old[i:])
+    delta["added"].extend((None, b) for b in new[j:])
+    return delta
+
+def delta_item(category: str, old: dict, new: dict) -> dict:
+    """The compact JSON entry for one changed check."""
+    check = new if new is not None else old
+    item = {"id": check["id"], "title": check.get("title", "")}
+    if category in ("added", "removed"):
+        item["status"] = check["status"]
+        item["details"] = check["details"]
+    else:
+        item["details"] = new["details"]
+        item["old_details"] = old["details"]
+    return item
+
+###################################################
+# Reports
+###################################################
+
+def write_delta_json(delta: dict, old_scan: dict, new_scan: dict, json_path: str):
+    document = {
+        "old": old_scan,
+        "new": new_scan,
+        "counts": {category: len(delta[category]) for category in CATEGORIES},
+    }
+    for category in CATEGORIES:
+        document[category] = [delta_item(category, old, new) for old, new in delta[category]]
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, separators=(",", ":"))
+
+def _row_result(old: dict, new: dict) -> RuleResult:
+    """A RuleResult for render_html_row: the new check, with the old details alongside when both exist."""
+    check = new if new is not None else old
+    details = check["details"]
+    if old is not None and new is not None:
+        details = f"{new['details']}<br><strong>Previous scan ({old['status']}):</strong> {old['details']}"
+    return RuleResult(check["id"], check.get("title", ""), check["status"], details,
+                      check.get("description", ""), check.get("rationale", ""), check.get("remediation", ""),
+                      check.get("compliance", []), check.get("condition", ""))
+
+def write_delta_html(delta: dict, old_scan: dict, new_scan: dict, html_path: str):
+    """Summary of the new scan, then one table per non-empty category, rendered like the full report."""
+    passed, failed = new_scan["passed"] or 0, new_scan["failed"] or 0
+    total = passed + failed
+    score_percent = round(passed / total * 100) if total else 0
+    date_str = datetime.datetime.now().strftime("%b %d, %Y @ %H:%M:%S")
+    title = f"Scan delta: {new_scan['benchmark_name']}" if new_scan["benchmark_name"] else "Scan delta"
+
+    with open(html_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+        f.write(html_page_start(title, passed, failed, score_percent, date_str,
+                                 new_scan["host"], new_scan["os"]))
+        f.write(f"""
+  <p>Compared scan of {new_scan['host']} at {new_scan['scan_time']} with scan of
+     {old_scan['host']} at {old_scan['scan_time']}
+     (passed {old_scan['passed']}, failed {old_scan['failed']}).</p>
+""")
+        i = 0
+        for category in CATEGORIES:
+            if not delta[category]:
+                continue
+            f.write(html_table_start(f"{HEADINGS[category]} ({len(delta[category])})"))
+            for old, new in delta[category]:
+                f.write(render_html_row(i, _row_result(old, new)))
+                i += 1
+            f.write(HTML_TABLE_END)
+        if i == 0:
+            f.write("\n  <p>No changes.</p>\n")
+        f.write(HTML_PAGE_END)
+
+###################################################
+# Command line
+###################################################
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="main.py diff",
+        description="Show what changed between two scans",
+        epilog="Without --db, OLD and NEW are JSON reports (indented or NDJSON). With --db they are "
+               "scan ids in that history database; with --db and --host and no ids, the host's two "
+               "latest scans are compared. Exits with 1 when checks are newly failing.")
+    parser.add_argument("old", nargs="?", help="Earlier report, or scan id with --db")
+    parser.add_argument("new", nargs="?", help="Later report, or scan id with --db")
+    parser.add_argument("--db", default="", help="History database (--history) holding the scans")
+    parser.add_argument("--host", default="", help="With --db: compare this host's two latest scans")
+    parser.add_argument("--json", default="./output/scan_delta.json", help="Where to write the JSON delta")
+    parser.add_argument("--html", default="./output/scan_delta.html", help="Where to write the HTML delta")
+    args = parser.parse_args(argv)
+
+    start = time.monotonic()
+    if args.db:
+        if args.new is not None and not (args.old.isdigit() and args.new.isdigit()):
+            parser.error(f"scan ids must be numbers, got {args.old!r} and {args.new!r}")
+        try:
+            conn = history.connect(args.db, existing=True)
+        except LookupError as e:
+            print(e.args[0])
+            return 1
+        try:
+            if args.old is None and args.host:
+                scans = history.host_trend(conn, args.host, 2)
+                if len(scans) < 2:
+                    print(f"Fewer than two scans of {args.host} in {args.db}")
+                    return 1
+                old_id, new_id = scans[1][0], scans[0][0]
+            elif args.new is not None:
+                old_id, new_id = int(args.old), int(args.new)
+            else:
+                parser.error("give two scan ids, or --host")
+            old_scan, old_checks = load_history_scan(conn, old_id)
+            new_scan, new_checks = load_history_scan(conn, new_id)
+        except LookupError as e:
+            print(e.args[0])
+            return 1
+        finally:
+            conn.close()
+    else:
+        if args.new is None:
+            parser.error("give two reports, or --db")
+        old_scan, old_checks = load_report(args.old)
+        new_scan, new_checks = load_report(args.new)
+    loaded = time.monotonic()
+
+    delta = diff_checks(old_checks, new_checks)
+    merged = time.monotonic()
+
+    for path in (args.json, args.html):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_delta_json(delta, old_scan, new_scan, args.json)
+    write_delta_html(delta, old_scan, new_scan, args.html)
+
+    print(", ".join(f"{HEADINGS[category]}: {len(delta[category])}" for category in CATEGORIES))
+    print(f"Compared {len(old_checks)} and {len(new_checks)} checks in {merged - loaded:.3f}s "
+          f"(loading {loaded - start:.3f}s)")
+    print(f"JSON delta saved to: {args.json}")
+    print(f"HTML delta saved to: {args.html}")
+    return 1 if delta["newly_failing"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
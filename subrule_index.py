@@ -0,0 +1,65 @@
+# File: subrule_index.py
+
+import threading
+from typing import Callable, Dict, List
+
+from executor import ExecResult
+from rule_compiler import rule_compiled
+from sca_structs import CompiledSubRule, SCAFile
+
+class SubRuleIndex:
+    """
+    Global index of the sub-rules of every loaded check: each distinct
+    normalized sub-rule (CompiledSubRule.key) -> ids of the checks using it.
+    The CIS policies for different Windows versions share most of their
+    sub-rules, so when several are loaded each distinct sub-rule is executed
+    (wrap()) and evaluated ('verdicts', see evaluate_rule) once per scan, and
+    the result is fanned out to every check that uses it.
+    """
+    def __init__(self, policies: List[SCAFile]):
+        self.owners: Dict[str, List[int]] = {}
+        self.total = 0
+        for sca_file in policies:
+            for rule in sca_file.checks:
+                for sub_rule in rule_compiled(rule):
+                    self.total += 1
+                    self.owners.setdefault(sub_rule.key, []).append(rule.id)
+        self.verdicts = {}   # key -> (passed, reason), filled while evaluating
+        self._results = {}   # key -> ExecResult
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.reused = 0
+
+    @property
+    def distinct(self) -> int:
+        return len(self.owners)
+
+    def ratio(self) -> float:
+        """Sub-rules per distinct sub-rule (1.0: nothing shared)."""
+        return self.total / self.distinct if self.distinct else 1.0
+
+    def summary(self) -> str:
+        return (f"{self.total} sub-rules, {self.distinct} distinct "
+                f"(dedup ratio {self.ratio():.2f}x)")
+
+    def wrap(self, execute: Callable[[CompiledSubRule], ExecResult]) -> Callable[[CompiledSubRule], ExecResult]:
+        """'execute', but each distinct sub-rule only runs once; later owners get a copy of its result."""
+        def execute_once(sub_rule: CompiledSubRule) -> ExecResult:
+            with self._lock:
+                r_exec = self._results.get(sub_rule.key)
+                if r_exec is not None:
+                    self.reused += 1
+            if r_exec is None:
+                r_exec = execute(sub_rule)
+                with self._lock:
+                    # A concurrent owner may have stored it meanwhile; keep the first
+                    r_exec = self._results.setdefault(sub_rule.key, r_exec)
+                    self.executed += 1
+            if r_exec.sub_rule != sub_rule.raw:
+                # Same sub-rule written differently: report it as this check wrote it
+                r_exec = r_exec._replace(sub_rule=sub_rule.raw)
+            return r_exec
+        return execute_once
+
+    def stats(self) -> str:
+        return f"executed {self.executed}, reused {self.reused}, verdicts cached {len(self.verdicts)}"
@@ -0,0 +1,42 @@
+# File: tests/conftest.py
+#
+# The scanner is a flat set of top-level modules; make them importable
+# from the tests however pytest is started.
+
+import os
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+POLICY_TEMPLATE = """policy:
+  id: test_policy
+  file: test_policy.yml
+  name: Test policy
+  description: Policy written by the tests
+requirements:
+  title: Any host
+  description: Always matches
+  condition: any
+  rules:
+    - "r:HKLM\\\\SOFTWARE\\\\Microsoft\\\\Windows NT\\\\CurrentVersion -> ProductName"
+checks:
+{checks}
+"""
+
+def write_policy(directory, checks, name="test_policy.yml") -> str:
+    """Write a policy file with 'checks' ([(id, condition, [sub-rule, ...]), ...]); returns its path."""
+    lines = []
+    for check_id, condition, rules in checks:
+        lines.append(f"  - id: {check_id}")
+        lines.append(f"    title: Check {check_id}")
+        lines.append(f"    condition: {condition}")
+        lines.append("    rules:")
+        for rule in rules:
+            escaped = rule.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'      - "{escaped}"')
+    path = os.path.join(str(directory), name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(POLICY_TEMPLATE.format(checks="\n".join(lines)))
+    return path
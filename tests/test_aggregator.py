@@ -0,0 +1,84 @@
+# File: tests/test_aggregator.py
+
+import builtins
+import json
+import os
+
+import aggregator
+from aggregator import FleetCounters, aggregate_files
+
+def report(host, os_name, statuses):
+    return {
+        "host": host,
+        "os": os_name,
+        "checks": [{"id": rule_id, "title": f"Check {rule_id}", "status": status, "details": "",
+                    "compliance": [{"cis": ["1.1"]}] if rule_id == 1 else []}
+                   for rule_id, status in statuses.items()],
+    }
+
+def write_report(path, document):
+    path.write_text(json.dumps(document, indent=2), encoding="utf-8")
+    return str(path)
+
+def write_ndjson(path, document, truncate_at=None):
+    lines = [json.dumps({"type": "header", "host": document["host"], "os": document["os"]})]
+    lines += [json.dumps(dict(check, type="check")) for check in document["checks"]]
+    text = "\n".join(lines) + "\n"
+    path.write_text(text if truncate_at is None else text[:truncate_at], encoding="utf-8")
+    return str(path)
+
+def test_counts_by_rule_os_and_tag(tmp_path):
+    files = [
+        write_report(tmp_path / "a.json", report("a", "Windows 10", {1: "PASS", 2: "FAIL"})),
+        write_ndjson(tmp_path / "b.ndjson", report("b", "Windows 11", {1: "FAIL", 2: "FAIL", 3: "PASS"})),
+        write_report(tmp_path / "fleet.json", {"hosts": []}),
+    ]
+    matrix = aggregate_files(files).to_dict()
+    assert matrix["reports"] == 2
+    assert matrix["skipped_files"] == 1
+    assert {name: entry["hosts"] for name, entry in matrix["os"].items()} == {"Windows 10": 1, "Windows 11": 1}
+    rules = {rule["id"]: rule for rule in matrix["rules"]}
+    assert (rules[1]["passed"], rules[1]["failed"]) == (1, 1)
+    assert rules[1]["by_os"] == {"Windows 10": [1, 0], "Windows 11": [0, 1]}
+    assert rules[3]["by_os"] == {"Windows 11": [1, 0]}
+    assert matrix["compliance"] == {"cis:1.1": {"passed": 1, "failed": 1}}
+
+def test_truncated_reports_count_as_errors_only(tmp_path):
+    good = report("good", "Windows 10", {1: "PASS", 2: "PASS"})
+    bad = report("bad", "Windows 11", {1: "FAIL", 2: "FAIL", 3: "FAIL"})
+    text = json.dumps(bad, indent=2)
+    (tmp_path / "bad.json").write_text(text[:text.index('"id": 3')], encoding="utf-8")
+    ndjson = write_ndjson(tmp_path / "bad.ndjson", bad)
+    with open(ndjson, encoding="utf-8") as f:
+        truncate_at = len(f.read()) - 20
+    write_ndjson(tmp_path / "bad.ndjson", bad, truncate_at)
+
+    write_report(tmp_path / "good.json", good)
+
+    counters = FleetCounters()
+    for name in ("bad.json", "good.json", "bad.ndjson"):
+        counters.add_file(str(tmp_path / name))
+    matrix = counters.to_dict()
+    assert matrix["reports"] == 1
+    assert {name: entry["hosts"] for name, entry in matrix["os"].items()} == {"Windows 10": 1}
+    assert [(rule["id"], rule["passed"], rule["failed"]) for rule in matrix["rules"]] == [(1, 1, 0), (2, 1, 0)]
+    assert matrix["compliance"] == {"cis:1.1": {"passed": 1, "failed": 0}}
+    assert sorted(os.path.basename(error["file"]) for error in matrix["errors"]) == ["bad.json", "bad.ndjson"]
+
+def test_report_files_are_closed_when_unreadable_or_skipped(tmp_path, monkeypatch):
+    files = [
+        write_report(tmp_path / "a.json", report("a", "Windows 10", {1: "PASS"})),
+        write_report(tmp_path / "fleet.json", {"hosts": []}),
+    ]
+    (tmp_path / "bad.json").write_text('{"host": "x", "os"', encoding="utf-8")
+    files.append(str(tmp_path / "bad.json"))
+    opened = []
+    def tracking_open(*args, **kwargs):
+        f = builtins.open(*args, **kwargs)
+        opened.append(f)
+        return f
+    monkeypatch.setattr(aggregator, "open", tracking_open, raising=False)
+    counters = aggregate_files(files)
+    assert (counters.reports, counters.skipped, len(counters.errors)) == (1, 1, 1)
+    assert len(opened) == 3
+    assert all(f.closed for f in opened)
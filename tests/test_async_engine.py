@@ -0,0 +1,71 @@
+# File: tests/test_async_engine.py
+
+import time
+
+import pytest
+
+from async_engine import AsyncScanner
+from commands import CommandCache, SHELL_WORKERS_SUPPORTED
+from conftest import write_policy
+from executor import execute_subrule
+from parser import load_all_policies
+from subrule_index import SubRuleIndex
+
+# The commands below use POSIX sh syntax
+pytestmark = pytest.mark.skipif(not SHELL_WORKERS_SUPPORTED, reason="POSIX shell commands")
+
+def scan(tmp_path, checks, **options):
+    """(results as (id, status, details) in yield order, seconds to each result, scanner, index)."""
+    write_policy(tmp_path, checks)
+    rules = [rule for sca_file in load_all_policies(str(tmp_path)) for rule in sca_file.checks]
+    index = SubRuleIndex(load_all_policies(str(tmp_path)))
+    scanner = AsyncScanner(verdicts=index.verdicts, **options)
+    commands = CommandCache(run=scanner.run_command)
+    calls = []
+
+    def execute(sub_rule):
+        calls.append(sub_rule.raw)
+        return execute_subrule(sub_rule, commands=commands)
+
+    start = time.monotonic()
+    results, times = [], []
+    try:
+        for r_result in scanner.run(rules, index.wrap(execute)):
+            results.append((r_result.rule_id, r_result.status, r_result.details))
+            times.append(time.monotonic() - start)
+    finally:
+        scanner.close()
+    return results, times, scanner, index, commands, calls
+
+def test_commands_go_through_the_wrapped_execute(tmp_path):
+    results, _, scanner, index, commands, calls = scan(tmp_path, [
+        (1, "all", ["cmd:echo Alpha -> r:^Alpha$"]),
+        (2, "all", ["cmd:echo Alpha -> r:^Alpha$"]),
+        (3, "all", ["cmd:echo alpha -> r:^alpha$"]),
+        (4, "all", ["cmd:echo Beta -> r:^Alpha$"]),
+    ])
+    assert [status for _, status, _ in results] == ["PASS", "PASS", "PASS", "FAIL"]
+    # The dedup wrapper saw every command sub-rule (checks 1 and 2 may both
+    # miss it when they run at once; the command cache still runs it once)
+    assert index.executed + index.reused == 4
+    assert set(calls) == {"cmd:echo Alpha -> r:^Alpha$", "cmd:echo Beta -> r:^Alpha$",
+                          "cmd:echo alpha -> r:^alpha$"}
+    assert commands.spawns == scanner.spawns == 3
+
+def test_commands_overlap_and_results_stream_in_rule_order(tmp_path):
+    checks = [(1, "all", ["cmd:echo quick -> r:quick"])]
+    checks += [(i, "all", [f"cmd:sleep 0.5; echo {i} -> r:{i}"]) for i in range(2, 7)]
+    results, times, _, _, _, _ = scan(tmp_path, checks, concurrency=8)
+    assert [rule_id for rule_id, _, _ in results] == [1, 2, 3, 4, 5, 6]
+    assert all(status == "PASS" for _, status, _ in results)
+    # The first result is handed out before the slow checks finish...
+    assert times[0] < 0.4
+    # ...and the five half-second commands ran at the same time
+    assert times[-1] < 2.0
+
+def test_scan_budget_times_out_commands(tmp_path):
+    results, _, scanner, _, _, _ = scan(tmp_path, [(1, "all", ["cmd:sleep 5 -> r:x"])],
+                                        scan_timeout=0.3)
+    assert results[0][1] == "FAIL"
+    assert "scan time budget of 0.3s exhausted" in results[0][2]
+    assert scanner.timeouts == 1
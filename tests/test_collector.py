@@ -0,0 +1,49 @@
+# File: tests/test_collector.py
+
+from collector import collect, load_artifact, replay_subrule, subrule_target, write_artifact
+from evaluator import evaluate_subrule
+from executor import ExecResult, execute_subrule
+from rule_compiler import compile_subrule
+
+def echo(sub_rule):
+    """Stand-in for execute_subrule: a command 'prints' its own text."""
+    return ExecResult(sub_rule.raw, sub_rule.path, "")
+
+def test_registry_targets_fold_case_commands_and_files_do_not():
+    assert (subrule_target(r"r:HKLM\SOFTWARE\Test -> Value -> 1")
+            == subrule_target(r"r:hkey_local_machine\software\test -> VALUE -> 0"))
+    assert subrule_target("cmd:echo A") == "cmd:echo A"
+    assert subrule_target("cmd:echo A") != subrule_target("cmd:echo a")
+    assert subrule_target(r"f:C:\Data\File.txt") != subrule_target(r"f:c:\data\file.txt")
+
+def test_case_distinct_commands_collect_and_replay_separately():
+    sub_rules = [compile_subrule(s) for s in ("cmd:echo A -> r:^A$", "cmd:echo a -> r:^a$")]
+    values = collect(sub_rules, echo)
+    assert values == {"cmd:echo A": ("echo A", ""), "cmd:echo a": ("echo a", "")}
+    assert [replay_subrule(s, values).value for s in sub_rules] == ["echo A", "echo a"]
+
+def test_file_existence_and_content_checks_round_trip(tmp_path):
+    config = tmp_path / "sshd_config"
+    config.write_text("Port 22\nPermitRootLogin no\n", encoding="utf-8")
+    missing = tmp_path / "absent.conf"
+    sub_rules = [compile_subrule(s) for s in (
+        f"f:{config} -> exists",
+        f"f:{config} -> r:^PermitRootLogin no",
+        f"not f:{config} -> r:^Port 2222",
+        f"f:{config}",
+        f"not f:{missing}",
+        f"f:{missing} -> r:anything",
+    )]
+    assert subrule_target(sub_rules[0]) != subrule_target(sub_rules[1])
+
+    artifact = tmp_path / "host.json.gz"
+    write_artifact(str(artifact), collect(sub_rules, execute_subrule), "host", "os")
+    values = load_artifact(str(artifact))["values"]
+    assert len(values) == 4
+
+    for sub_rule in sub_rules:
+        live = execute_subrule(sub_rule)
+        replayed = replay_subrule(sub_rule, values)
+        assert (replayed.value, replayed.error) == (live.value, live.error)
+        assert evaluate_subrule(replayed, sub_rule) == evaluate_subrule(live, sub_rule)
+    assert [evaluate_subrule(replay_subrule(s, values), s)[0] for s in sub_rules[:5]] == [True] * 5
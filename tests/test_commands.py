@@ -0,0 +1,85 @@
+# File: tests/test_commands.py
+
+import threading
+import time
+
+import pytest
+
+from commands import CommandCache, ShellWorkerPool, normalize_command, SHELL_WORKERS_SUPPORTED
+
+THREADS = 6
+
+def test_normalize_command_keeps_case_and_quoted_whitespace():
+    assert normalize_command("  net   accounts ") == "net accounts"
+    assert normalize_command('echo  "a  b"') == 'echo "a  b"'
+    assert normalize_command("echo A") != normalize_command("echo a")
+
+def test_command_cache_single_flight():
+    gate = threading.Event()
+    runs = []
+
+    def run(command):
+        runs.append(command)
+        gate.wait(5)
+        return f"output of {command}", ""
+
+    cache = CommandCache(run=run)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("net  accounts")))
+               for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    # Release the one running command once every other caller is waiting on it
+    deadline = time.monotonic() + 5
+    while cache.saved < THREADS - 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join(5)
+    assert runs == ["net  accounts"]
+    assert results == [("output of net  accounts", "")] * THREADS
+    assert (cache.spawns, cache.saved) == (1, THREADS - 1)
+
+def test_command_cache_turns_exceptions_into_errors():
+    def run(command):
+        raise OSError("no shell")
+
+    cache = CommandCache(run=run)
+    assert cache.get("whoami") == ("", "Command error: no shell")
+    assert cache.get("whoami") == ("", "Command error: no shell")
+    assert cache.spawns == 1
+
+needs_workers = pytest.mark.skipif(not SHELL_WORKERS_SUPPORTED, reason="shell workers are POSIX only")
+
+@needs_workers
+def test_worker_output_exit_status_and_isolation(tmp_path):
+    pool = ShellWorkerPool(size=1)
+    try:
+        assert pool.run("echo one; echo two") == ("one\ntwo", "")
+        assert pool.run("exit 3")[1].endswith("non-zero exit status 3.")
+        # State changes stay inside the command's subshell
+        start_dir = pool.run("pwd")[0]
+        assert pool.run(f"cd {tmp_path}; export SCA_TEST=leaked; pwd") == (str(tmp_path), "")
+        assert pool.run("pwd") == (start_dir, "")
+        assert pool.run("echo \"[$SCA_TEST]\"") == ("[]", "")
+        # A command reading stdin gets EOF instead of the following commands
+        assert pool.run("cat") == ("", "")
+        assert pool.run("echo still here") == ("still here", "")
+        assert pool.recycled == 0
+    finally:
+        pool.close()
+
+@needs_workers
+def test_worker_pool_replaces_timed_out_and_dead_workers():
+    pool = ShellWorkerPool(size=1, timeout=0.5)
+    try:
+        output, error = pool.run("sleep 30")
+        assert (output, error) == ("", "Timeout: command did not finish within 0.5s")
+        assert pool.run("echo after timeout") == ("after timeout", "")
+        # $$ is the worker shell itself, even inside the subshell
+        output, error = pool.run("kill -9 $$")
+        assert error
+        assert pool.run("echo after crash") == ("after crash", "")
+        assert pool.recycled == 2
+    finally:
+        pool.close()
@@ -0,0 +1,70 @@
+# File: tests/test_fleet.py
+
+import json
+import os
+
+import pytest
+
+import fleet
+from conftest import write_policy
+
+LSA = r"HKLM\SYSTEM\CurrentControlSet\Control\Lsa"
+
+def write_manifest(directory, entries):
+    path = directory / "manifest.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    return str(path)
+
+def write_snapshot(directory, name, value):
+    (directory / name).write_text(json.dumps({LSA: {"LimitBlankPasswordUse": value}}), encoding="utf-8")
+    return name
+
+def test_duplicate_hosts_are_rejected(tmp_path):
+    manifest = write_manifest(tmp_path, [{"host": "web01", "snapshot": "a.json"},
+                                         {"host": "WEB01", "snapshot": "b.json"}])
+    with pytest.raises(ValueError, match="Duplicate host"):
+        fleet.host_sources(manifest)
+    write_snapshot(tmp_path, "db01.reg", 1)
+    write_snapshot(tmp_path, "db01.json", 1)
+    os.remove(manifest)
+    with pytest.raises(ValueError, match="Duplicate host 'db01'"):
+        fleet.host_sources(str(tmp_path))
+
+def test_report_names_stay_inside_the_hosts_directory():
+    assert fleet.report_name("../x") == "_x"
+    assert fleet.report_name("/etc/passwd") == "_etc_passwd"
+    assert fleet.report_name("C:\\temp\\h") == "C__temp_h"
+    assert fleet.report_name("..") == "_"
+    assert fleet.report_name("web-01.corp") == "web-01.corp"
+
+def test_a_failing_host_does_not_stop_the_fleet(tmp_path, monkeypatch):
+    rules = tmp_path / "rules"
+    rules.mkdir()
+    write_policy(rules, [(1, "all", [f"r:{LSA} -> LimitBlankPasswordUse -> 1"])])
+    data = tmp_path / "data"
+    data.mkdir()
+    manifest = write_manifest(data, [
+        {"host": "../escape", "snapshot": write_snapshot(data, "a.json", 1)},
+        {"host": "broken", "snapshot": write_snapshot(data, "b.json", 0)},
+        {"host": "good", "snapshot": write_snapshot(data, "c.json", 0)},
+    ])
+    write_report = fleet.write_enhanced_json_report
+
+    def failing_write_report(**fields):
+        if fields["host"] == "broken":
+            raise OSError("disk full")
+        write_report(**fields)
+
+    monkeypatch.setattr(fleet, "write_enhanced_json_report", failing_write_report)
+
+    output = tmp_path / "out"
+    status = fleet.main([manifest, "--rules", str(rules), "--output", str(output), "--processes", "1",
+                         "--ignore-requirements", "--no-rule-cache"])
+    assert status == 1
+    rollup = json.loads((output / "fleet.json").read_text(encoding="utf-8"))
+    hosts = {h["host"]: h for h in rollup["hosts"]}
+    assert hosts["broken"]["error"] == "OSError: disk full"
+    assert (hosts["good"]["passed"], hosts["good"]["failed"]) == (0, 1)
+    assert (hosts["../escape"]["passed"], hosts["../escape"]["failed"]) == (1, 0)
+    assert sorted(os.listdir(output / "hosts")) == ["_escape.json", "good.json"]
+    assert not (tmp_path / "escape.json").exists()
@@ -0,0 +1,67 @@
+# File: tests/test_history.py
+
+import pytest
+
+import history
+from evaluator import RuleResult
+
+def results(statuses):
+    return [RuleResult(rule_id, f"Check {rule_id}", status, f"{status.lower()} details", "", "", "", [], "all")
+            for rule_id, status in statuses.items()]
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "history.db")
+    history.record_scan(path, results({1: "PASS", 2: "PASS"}), "web01", "Windows 10", scan_time="2026-01-01T00:00:00")
+    history.record_scan(path, results({1: "FAIL", 2: "PASS"}), "web01", "Windows 10", scan_time="2026-01-02T00:00:00")
+    history.record_scan(path, results({1: "FAIL", 2: "FAIL"}), "web01", "Windows 11", scan_time="2026-01-03T00:00:00")
+    history.record_scan(path, results({1: "PASS", 2: "FAIL"}), "db01", "Windows 10", scan_time="2026-01-02T00:00:00")
+    conn = history.connect(path)
+    yield conn
+    conn.close()
+
+def test_rule_history_and_failing_streak(db):
+    rows = history.rule_history(db, 1, "web01")
+    assert [(scan_time[:10], passed) for scan_time, passed, _ in rows] == [
+        ("2026-01-03", 0), ("2026-01-02", 0), ("2026-01-01", 1)]
+    assert history.failing_since(rows) == "2026-01-02T00:00:00"
+    assert history.failing_since(history.rule_history(db, 1, "db01")) is None
+
+def test_host_trend_and_rule_status_by_host(db):
+    assert [(passed, failed) for _, _, passed, failed in history.host_trend(db, "web01", 2)] == [(0, 2), (1, 1)]
+    assert history.rule_status_by_host(db, 2) == [
+        ("db01", "2026-01-02T00:00:00", 0), ("web01", "2026-01-03T00:00:00", 0)]
+
+def test_regressions_compare_each_hosts_two_latest_scans(db):
+    assert history.regressions(db) == [("web01", 2, "Check 2", "fail details")]
+    assert history.regressions(db, "db01") == []
+
+def test_load_scan_and_unknown_ids(db):
+    scan_id = history.host_trend(db, "web01", 1)[0][0]
+    scan = history.load_scan(db, scan_id)
+    assert (scan["host"], scan["os"], scan["passed"], scan["failed"]) == ("web01", "Windows 11", 0, 2)
+    assert [(c["id"], c["status"]) for c in scan["checks"]] == [(1, "FAIL"), (2, "FAIL")]
+    with pytest.raises(LookupError):
+        history.load_scan(db, 999)
+    with pytest.raises(LookupError):
+        history.host_trend(db, "nobody", 1)
+
+def test_scans_recorded_at_the_same_time_list_newest_id_first(tmp_path):
+    path = str(tmp_path / "history.db")
+    for status in ("PASS", "FAIL"):
+        history.record_scan(path, results({1: status}), "h", "Windows 10", scan_time="2026-01-01T00:00:00")
+    conn = history.connect(path)
+    # The scans index happens to return ties newest first; the order must not depend on it
+    conn.execute("DROP INDEX scans_host_time")
+    try:
+        first, second = history.host_trend(conn, "h", 2)
+    finally:
+        conn.close()
+    assert first[0] > second[0]
+    assert (first[2], first[3]) == (0, 1)
+
+def test_query_of_a_missing_database_does_not_create_it(tmp_path, capsys):
+    path = tmp_path / "typo.db"
+    assert history.main([str(path), "--regressions"]) == 1
+    assert "No history database" in capsys.readouterr().out
+    assert not path.exists()
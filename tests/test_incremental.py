@@ -0,0 +1,119 @@
+# File: tests/test_incremental.py
+
+from conftest import write_policy
+from evaluator import run_checks
+from executor import execute_subrule, prefetch_registry
+from incremental import IncrementalState, merge_results
+from parser import load_all_policies
+from registry import RegistryReader, FakeRegistryBackend
+from rule_compiler import rule_compiled
+from subrule_index import SubRuleIndex
+
+LSA = r"HKLM\SYSTEM\CurrentControlSet\Control\Lsa"
+POLICIES = r"HKLM\SOFTWARE\Policies\Test"
+
+CHECKS = [
+    (1, "all", [f"r:{LSA} -> LimitBlankPasswordUse -> 1"]),
+    (2, "all", [f"r:{POLICIES} -> Enabled -> 1"]),
+    (3, "any", [f"r:{LSA} -> NoLMHash -> 1", f"r:{POLICIES} -> Level -> 2"]),
+]
+
+def scan(policies, backend, state_path=None, refresh=True):
+    """
+    [(id, status, details)] of every check, incremental when 'state_path' is
+    given; refresh=False scans as main.py does without a registry to stamp.
+    """
+    registry = RegistryReader(backend)
+    index = SubRuleIndex(policies)
+    rules = [rule for sca_file in policies for rule in sca_file.checks]
+
+    def execute(sub_rule):
+        return execute_subrule(sub_rule, registry)
+
+    state = None
+    scan_rules = rules
+    if state_path is not None:
+        state = IncrementalState(state_path, "host", exhaustive=False)
+        execute = state.wrap(execute)
+        if refresh:
+            state.refresh(registry, (s for rule in rules for s in rule_compiled(rule)))
+        state.seed_verdicts(index.verdicts)
+        stored = state.stored_results(rules)
+        scan_rules = [rule for rule, r_result in zip(rules, stored) if r_result is None]
+    execute = index.wrap(execute)
+    to_read = (s for rule in scan_rules for s in rule_compiled(rule))
+    prefetch_registry(registry, filter(state.needs_read, to_read) if state else to_read)
+    results = run_checks(scan_rules, execute, verdicts=index.verdicts)
+    if state is not None:
+        results = list(merge_results(stored, results))
+        state.update(rules, results, index.verdicts)
+        state.save()
+    registry.close()
+    return [(r.rule_id, r.status, r.details) for r in results], state
+
+def test_rescan_only_reads_changed_keys_and_matches_a_full_scan(tmp_path):
+    write_policy(tmp_path, CHECKS)
+    policies = load_all_policies(str(tmp_path))
+    backend = FakeRegistryBackend({LSA: {"LimitBlankPasswordUse": 1, "NoLMHash": 0},
+                                   POLICIES: {"Enabled": 0, "Level": 1}})
+    state_path = str(tmp_path / "state.json")
+
+    first, state = scan(policies, backend, state_path)
+    assert first == scan(policies, backend)[0]
+    assert (state.changed_keys, state.evaluated, state.reused) == (2, 3, 0)
+
+    backend.calls.clear()
+    unchanged, state = scan(policies, backend, state_path)
+    assert unchanged == first
+    assert (state.changed_keys, state.evaluated, state.reused) == (0, 0, 3)
+    assert backend.calls["query_value"] == backend.calls["enum_values"] == 0
+
+    backend.set_key(POLICIES, {"Enabled": 1})
+    backend.calls.clear()
+    changed, state = scan(policies, backend, state_path)
+    assert changed == scan(policies, backend)[0]
+    assert [status for _, status, _ in changed] == ["PASS", "PASS", "FAIL"]
+    # Check 1 only reads the Lsa key, which kept its timestamp
+    assert (state.changed_keys, state.evaluated, state.reused) == (1, 2, 1)
+
+def test_state_of_another_host_or_changed_rules_is_not_reused(tmp_path):
+    write_policy(tmp_path, CHECKS)
+    backend = FakeRegistryBackend({LSA: {"LimitBlankPasswordUse": 1}})
+    state_path = str(tmp_path / "state.json")
+    scan(load_all_policies(str(tmp_path)), backend, state_path)
+
+    assert IncrementalState(state_path, "other-host", exhaustive=False).checks == {}
+    assert IncrementalState(state_path, "host", exhaustive=True).checks == {}
+
+    # Check 1 now expects 0: its stored result must not be reused
+    write_policy(tmp_path, [(1, "all", [f"r:{LSA} -> LimitBlankPasswordUse -> 0"])] + CHECKS[1:])
+    results, state = scan(load_all_policies(str(tmp_path)), backend, state_path)
+    assert results[0][1] == "FAIL"
+    assert (state.changed_keys, state.evaluated, state.reused) == (0, 1, 2)
+
+def test_nothing_is_reused_without_a_refresh(tmp_path):
+    write_policy(tmp_path, CHECKS)
+    policies = load_all_policies(str(tmp_path))
+    state_path = str(tmp_path / "state.json")
+    scan(policies, FakeRegistryBackend({LSA: {"LimitBlankPasswordUse": 1, "NoLMHash": 1},
+                                        POLICIES: {"Enabled": 1}}), state_path)
+
+    # Same timestamps, different values: only a refresh could tell the state is stale
+    backend = FakeRegistryBackend({LSA: {"LimitBlankPasswordUse": 0, "NoLMHash": 0},
+                                   POLICIES: {"Enabled": 0}})
+    state = IncrementalState(state_path, "host", exhaustive=False)
+    verdicts = {}
+    state.seed_verdicts(verdicts)
+    assert verdicts == {}
+    results, state = scan(policies, backend, state_path, refresh=False)
+    assert results == scan(policies, backend)[0]
+    assert (state.evaluated, state.reused) == (3, 0)
+
+def test_refresh_only_stamps_the_keys_it_is_given(tmp_path):
+    write_policy(tmp_path, CHECKS)
+    rules = load_all_policies(str(tmp_path))[0].checks
+    backend = FakeRegistryBackend({LSA: {"LimitBlankPasswordUse": 1}, POLICIES: {"Enabled": 1}})
+    state = IncrementalState(str(tmp_path / "state.json"), "host", exhaustive=False)
+    state.refresh(RegistryReader(backend), rule_compiled(rules[1]))
+    assert state.total_keys == 1
+    assert (backend.calls["open_key"], backend.calls["key_timestamp"]) == (1, 1)
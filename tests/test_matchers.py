@@ -0,0 +1,40 @@
+# File: tests/test_matchers.py
+
+import pytest
+
+from matchers import compile_content, MatcherSyntaxError
+from rule_compiler import RuleSyntaxError, compile_subrule
+
+@pytest.mark.parametrize("content, value, passed", [
+    ("1", "1", True),
+    ("1", "0", False),
+    ("Enabled", " enabled ", True),
+    ("r:^Windows 10", "windows 10 Enterprise", True),
+    ("r:^Windows 10", "Windows Server 2019", False),
+    ("!r:^Guest", "Administrator", True),
+    ("regex:^1$", "1", True),
+    ("n:^(\\d+) compare <= 60", "45", True),
+    ("n:^(\\d+) compare <= 60", "90", False),
+    ("n:^(\\d+) compare => 14", "14", True),
+    ("n:^(\\d+) compare > 0", "none", False),
+    ("r:^Audit && r:Success", "Audit Success and Failure", True),
+    ("r:^Audit && r:Success", "Audit Failure", False),
+    ("exists", "exists", True),
+    ("missing", "exists", False),
+])
+def test_content_expressions(content, value, passed):
+    assert compile_content(content).match(value)[0] is passed
+
+def test_invalid_expressions_raise():
+    with pytest.raises(MatcherSyntaxError):
+        compile_content("r:([")
+    with pytest.raises(MatcherSyntaxError):
+        compile_content("n:^\\d+ compare <= 1")
+    with pytest.raises(RuleSyntaxError):
+        compile_subrule("r:HKLM\\SOFTWARE -> Value -> r:([")
+
+def test_command_output_is_matched_line_by_line():
+    sub_rule = compile_subrule("cmd:auditpol -> r:^Logon && r:Success")
+    assert sub_rule.matcher.match("Logoff  Success\nLogon  Success and Failure")[0]
+    # Both parts have to hold on the same line
+    assert not sub_rule.matcher.match("Logon  Failure\nLogoff  Success")[0]
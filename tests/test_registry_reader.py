@@ -0,0 +1,96 @@
+# File: tests/test_registry_reader.py
+
+import threading
+import time
+
+import pytest
+
+from registry import FakeRegistryBackend, RegistryReader, canonical_hive
+
+HKLM = canonical_hive("HKLM")
+THREADS = 6
+
+KEYS = {f"HKLM\\SOFTWARE\\Key{i}": {"Value": i} for i in range(THREADS)}
+
+def run_threads(target, count=THREADS):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert not any(t.is_alive() for t in threads)
+
+class BarrierBackend(FakeRegistryBackend):
+    """Every query waits until all threads are inside the backend at once."""
+    def __init__(self, data):
+        super().__init__(data)
+        self.barrier = threading.Barrier(THREADS, timeout=5)
+
+    def query_value(self, handle, name):
+        self.barrier.wait()
+        return super().query_value(handle, name)
+
+def test_backend_reads_run_in_parallel():
+    backend = BarrierBackend(KEYS)
+    reader = RegistryReader(backend)
+    results = {}
+
+    def read(i):
+        results[i] = reader.read_value(HKLM, f"SOFTWARE\\Key{i}", "Value")
+
+    # With the lock held across backend I/O the barrier would never fill up
+    run_threads(read)
+    assert results == {i: (i, 4) for i in range(THREADS)}
+    assert not backend.barrier.broken
+
+class GatedBackend(FakeRegistryBackend):
+    """query_value blocks until 'gate' is set."""
+    gate = None
+
+    def query_value(self, handle, name):
+        self.gate.wait(5)
+        return super().query_value(handle, name)
+
+def test_concurrent_reads_of_one_value_hit_the_backend_once():
+    backend = GatedBackend({r"HKLM\SOFTWARE\Shared": {"Value": 7}})
+    backend.gate = threading.Event()
+    reader = RegistryReader(backend)
+    results = []
+
+    def read(i):
+        results.append(reader.read_value(HKLM, r"SOFTWARE\Shared", "value"))
+
+    def release():
+        # Open the gate once every other thread is waiting on the first one's read
+        deadline = time.monotonic() + 5
+        while reader.value_hits < THREADS - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        backend.gate.set()
+
+    threading.Thread(target=release).start()
+    run_threads(read)
+    assert results == [(7, 4)] * THREADS
+    assert backend.calls["query_value"] == 1
+    assert backend.calls["open_key"] == 1
+    assert (reader.value_misses, reader.value_hits) == (1, THREADS - 1)
+
+def test_failures_are_cached_and_reraised():
+    backend = FakeRegistryBackend(KEYS)
+    reader = RegistryReader(backend)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            reader.read_value(HKLM, r"SOFTWARE\Missing", "Value")
+        with pytest.raises(OSError):
+            reader.read_value(HKLM, r"SOFTWARE\Key0", "Missing")
+    assert backend.calls["open_key"] == 2
+    assert backend.calls["query_value"] == 1
+
+def test_prefetch_answers_later_reads_from_memory():
+    backend = FakeRegistryBackend(KEYS)
+    reader = RegistryReader(backend)
+    assert reader.prefetch([(HKLM, f"SOFTWARE\\Key{i}") for i in range(THREADS)])
+    run_threads(lambda i: reader.read_value(HKLM, f"SOFTWARE\\key{i}", "VALUE"))
+    with pytest.raises(OSError):
+        reader.read_value(HKLM, r"SOFTWARE\Key0", "Other")
+    assert backend.calls["query_value"] == 0
+    assert backend.calls["enum_values"] == THREADS
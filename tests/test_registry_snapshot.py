@@ -0,0 +1,70 @@
+# File: tests/test_registry_snapshot.py
+
+import json
+
+import pytest
+
+from registry import canonical_hive, REG_BINARY, REG_DWORD, REG_MULTI_SZ, REG_SZ
+from registry_snapshot import SnapshotBackend
+
+REG_EXPORT = r'''Windows Registry Editor Version 5.00
+
+[HKEY_LOCAL_MACHINE\SOFTWARE\Policies\Test]
+"Enabled"=dword:00000001
+"Name"="Audit \"box\""
+"Bad"=dword:xyz
+"Blob"=hex:01,02,\
+  03
+"Paths"=hex(7):61,00,00,00,62,00,00,00,00,00
+@="default"
+
+[-HKEY_LOCAL_MACHINE\SOFTWARE\Removed]
+'''
+
+def query(backend, hive, path, name):
+    return backend.query_value(backend.open_key(canonical_hive(hive), path), name)
+
+@pytest.mark.parametrize("encoding", ["utf-16", "utf-8"])
+def test_reg_export_values_and_malformed_dword(tmp_path, encoding):
+    path = tmp_path / "snap.reg"
+    path.write_text(REG_EXPORT, encoding=encoding)
+    backend = SnapshotBackend.load(str(path))
+    key = r"SOFTWARE\Policies\Test"
+    assert query(backend, "HKLM", key, "enabled") == (1, REG_DWORD)
+    assert query(backend, "HKLM", key, "Name") == ('Audit "box"', REG_SZ)
+    assert query(backend, "HKLM", key, "Blob") == (b"\x01\x02\x03", REG_BINARY)
+    assert query(backend, "HKLM", key, "Paths") == (["a", "b"], REG_MULTI_SZ)
+    assert query(backend, "HKLM", key, "") == ("default", REG_SZ)
+    # The malformed value is skipped, the rest of the key still loads
+    with pytest.raises(FileNotFoundError):
+        query(backend, "HKLM", key, "Bad")
+    assert backend.value_count == 5
+    assert backend.bad_values == 1
+    assert "dword:xyz" in backend.bad_samples[0]
+
+def test_json_snapshot_is_streamed_and_skips_unknown_types(tmp_path):
+    path = tmp_path / "snap.json"
+    data = {
+        r"HKLM\SOFTWARE\A": {"Count": 3, "Label": "x", "Typed": {"type": "REG_DWORD", "data": 7}},
+        r"HKLM\SOFTWARE\B": {"Odd": {"type": "REG_NOPE", "data": 1}, "Kept": "y"},
+        r"HKLM\SOFTWARE\C": ["not", "an", "object"],
+    }
+    # Pad past one read chunk so members straddle the buffer boundary
+    data[r"HKLM\SOFTWARE\Big"] = {f"v{i}": "z" * 50 for i in range(2000)}
+    path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    backend = SnapshotBackend.load(str(path))
+    assert query(backend, "HKLM", r"SOFTWARE\A", "count") == (3, REG_DWORD)
+    assert query(backend, "HKLM", r"SOFTWARE\A", "typed") == (7, REG_DWORD)
+    assert query(backend, "HKLM", r"SOFTWARE\B", "kept") == ("y", REG_SZ)
+    assert query(backend, "HKLM", r"SOFTWARE\Big", "v1999") == ("z" * 50, REG_SZ)
+    assert backend.bad_values == 2
+
+def test_jsonl_snapshot_keep_filter(tmp_path):
+    path = tmp_path / "snap.jsonl"
+    lines = [{"key": r"HKLM\SOFTWARE\Wanted", "values": {"V": 1}},
+             {"key": r"HKLM\SOFTWARE\Other", "values": {"V": 2}}]
+    path.write_text("\n".join(json.dumps(line) for line in lines), encoding="utf-8")
+    backend = SnapshotBackend.load(str(path), keep={(canonical_hive("HKLM"), r"software\wanted")})
+    assert query(backend, "HKLM", r"SOFTWARE\Wanted", "v") == (1, REG_DWORD)
+    with pytest.raises(FileNotFoundError):
+        backend.open_key(canonical_hive("HKLM"), r"SOFTWARE\Other")
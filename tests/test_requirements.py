@@ -0,0 +1,58 @@
+# File: tests/test_requirements.py
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import REPO_DIR, write_policy
+from evaluator import applicable_policies
+from executor import execute_subrule
+from parser import load_all_policies
+from registry import RegistryReader, FakeRegistryBackend
+
+CURRENT_VERSION = "HKLM\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion"
+WINDOWS_10 = [f"r:{CURRENT_VERSION} -> ProductName -> r:^Windows 10"]
+
+def _policies(tmp_path):
+    write_policy(tmp_path, [(1, "all", [f"r:{CURRENT_VERSION} -> ProductName"])])
+    policies = load_all_policies(str(tmp_path))
+    policies[0].requirements.rules = WINDOWS_10
+    policies[0].requirements.compiled = []
+    return policies
+
+def _gate(policies, product_name):
+    registry = RegistryReader(FakeRegistryBackend({CURRENT_VERSION: {"ProductName": product_name}}))
+    return applicable_policies(policies, lambda s: execute_subrule(s, registry))
+
+def test_content_requirement_matches(tmp_path):
+    policies = _policies(tmp_path)
+    rules, skipped = _gate(policies, "Windows 10 Enterprise")
+    assert [rule.id for rule in rules] == [1]
+    assert skipped == []
+
+def test_content_requirement_skips_other_versions(tmp_path):
+    policies = _policies(tmp_path)
+    rules, skipped = _gate(policies, "Windows Server 2019 Datacenter")
+    assert rules == []
+    assert len(skipped) == 1 and "ProductName" in skipped[0][1]
+
+def test_scan_fails_when_no_policy_applies(tmp_path):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    policy = write_policy(rules_dir, [(1, "all", [f"r:{CURRENT_VERSION} -> ProductName"])])
+    with open(policy, encoding="utf-8") as f:
+        text = f.read().replace("-> ProductName\"\nchecks", "-> ProductName -> r:^Windows 10\"\nchecks")
+    with open(policy, "w", encoding="utf-8") as f:
+        f.write(text)
+    snapshot = tmp_path / "snapshot.json"
+    snapshot.write_text(json.dumps({CURRENT_VERSION: {"ProductName": "Windows Server 2019"}}))
+
+    result = subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, "main.py"), "--rules", str(rules_dir), "--no-rule-cache",
+         "--registry-snapshot", str(snapshot), "--json", str(tmp_path / "out" / "scan.json"),
+         "--html", str(tmp_path / "out" / "report.html")],
+        capture_output=True, text=True)
+    assert result.returncode == 1
+    assert "no policy's requirements match this host" in result.stdout
+    assert not (tmp_path / "out" / "scan.json").exists()
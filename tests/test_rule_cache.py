@@ -0,0 +1,103 @@
+# File: tests/test_rule_cache.py
+
+import os
+import stat
+
+import pytest
+
+from conftest import write_policy
+from parser import load_all_policies
+from rule_cache import RuleCache
+
+CHECKS = [(1, "all", ["r:HKLM\\SOFTWARE\\Test -> Enabled -> 1"]),
+          (2, "any", ["f:/etc/hostname", "cmd:echo hi -> r:hi"])]
+
+def test_second_load_is_a_hit_with_equal_policies(tmp_path):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    write_policy(rules_dir, CHECKS)
+    cache_dir = str(tmp_path / "cache")
+
+    first = RuleCache(cache_dir)
+    parsed = load_all_policies(str(rules_dir), cache=first)
+    assert (first.hits, first.misses) == (0, 1)
+
+    second = RuleCache(cache_dir)
+    cached = load_all_policies(str(rules_dir), cache=second)
+    assert (second.hits, second.misses) == (1, 0)
+    assert cached[0].policy == parsed[0].policy
+    for cached_rule, parsed_rule in zip(cached[0].checks, parsed[0].checks):
+        assert (cached_rule.id, cached_rule.condition, cached_rule.rules) == \
+               (parsed_rule.id, parsed_rule.condition, parsed_rule.rules)
+        assert [c.key for c in cached_rule.compiled] == [c.key for c in parsed_rule.compiled]
+
+def test_entries_are_json_and_private(tmp_path):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    write_policy(rules_dir, CHECKS)
+    cache_dir = tmp_path / "cache"
+    load_all_policies(str(rules_dir), cache=RuleCache(str(cache_dir)))
+
+    entries = os.listdir(cache_dir)
+    assert entries and all(name.endswith(".json") for name in entries)
+    if hasattr(os, "getuid"):
+        assert stat.S_IMODE(os.stat(cache_dir).st_mode) == 0o700
+        assert all(stat.S_IMODE(os.stat(cache_dir / name).st_mode) == 0o600 for name in entries)
+
+def test_yaml_loader_is_part_of_the_key(tmp_path):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    write_policy(rules_dir, CHECKS)
+    cache_dir = str(tmp_path / "cache")
+    load_all_policies(str(rules_dir), cache=RuleCache(cache_dir), yaml_loader="python")
+
+    other_loader = RuleCache(cache_dir)
+    load_all_policies(str(rules_dir), cache=other_loader, yaml_loader="auto")
+    same_loader = RuleCache(cache_dir)
+    load_all_policies(str(rules_dir), cache=same_loader, yaml_loader="auto")
+    if other_loader.misses == 0:
+        pytest.skip("'auto' resolves to the pure Python loader here")
+    assert (same_loader.hits, same_loader.misses) == (1, 0)
+
+def test_changed_file_is_a_miss(tmp_path):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    path = write_policy(rules_dir, CHECKS)
+    cache_dir = str(tmp_path / "cache")
+    load_all_policies(str(rules_dir), cache=RuleCache(cache_dir))
+
+    write_policy(rules_dir, CHECKS[:1])
+    os.utime(path, ns=(1, 1))
+    cache = RuleCache(cache_dir)
+    policies = load_all_policies(str(rules_dir), cache=cache)
+    assert cache.misses == 1
+    assert [rule.id for rule in policies[0].checks] == [1]
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_writable_cache_dir_is_not_used(tmp_path):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    write_policy(rules_dir, CHECKS)
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    os.chmod(cache_dir, 0o777)
+
+    cache = RuleCache(str(cache_dir))
+    assert "writable by other users" in cache.disabled
+    policies = load_all_policies(str(rules_dir), cache=cache)
+    assert [rule.id for rule in policies[0].checks] == [1, 2]
+    assert os.listdir(cache_dir) == []
+
+def test_corrupt_entry_is_reparsed(tmp_path):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    write_policy(rules_dir, CHECKS)
+    cache_dir = tmp_path / "cache"
+    load_all_policies(str(rules_dir), cache=RuleCache(str(cache_dir)))
+    for name in os.listdir(cache_dir):
+        (cache_dir / name).write_text("{not json")
+
+    cache = RuleCache(str(cache_dir))
+    policies = load_all_policies(str(rules_dir), cache=cache)
+    assert cache.misses == 1
+    assert [rule.id for rule in policies[0].checks] == [1, 2]
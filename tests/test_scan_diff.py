@@ -0,0 +1,64 @@
+# File: tests/test_scan_diff.py
+
+import json
+
+import pytest
+
+import history
+import scan_diff
+from evaluator import RuleResult
+
+def check(rule_id, status, details="d"):
+    return {"id": rule_id, "title": f"Check {rule_id}", "status": status, "details": details}
+
+def test_diff_checks_categories():
+    old = [check(5, "PASS"), check(1, "PASS"), check(2, "FAIL"), check(3, "FAIL", "a"), check(4, "PASS")]
+    new = [check(1, "FAIL"), check(2, "PASS"), check(3, "FAIL", "b"), check(4, "PASS"), check(6, "FAIL")]
+    delta = scan_diff.diff_checks(old, new)
+    ids = {category: [(a or b)["id"] for a, b in pairs] for category, pairs in delta.items()}
+    assert ids == {"newly_failing": [1], "newly_passing": [2], "changed_details": [3],
+                   "added": [6], "removed": [5]}
+    assert scan_diff.delta_item("changed_details", *delta["changed_details"][0]) == {
+        "id": 3, "title": "Check 3", "details": "b", "old_details": "a"}
+
+def test_diff_of_two_reports(tmp_path):
+    old = {"host": "h", "os": "Windows 10", "scan_time": "t1", "passed": 1, "failed": 0,
+           "checks": [check(1, "PASS")]}
+    (tmp_path / "old.json").write_text(json.dumps(old, indent=2), encoding="utf-8")
+    # The new scan as NDJSON, which carries no totals
+    lines = [{"type": "header", "host": "h", "os": "Windows 10", "scan_time": "t2"},
+             dict(check(1, "FAIL"), type="check"), dict(check(2, "PASS"), type="check")]
+    (tmp_path / "new.ndjson").write_text("\n".join(map(json.dumps, lines)), encoding="utf-8")
+    out_json, out_html = tmp_path / "delta.json", tmp_path / "delta.html"
+    status = scan_diff.main([str(tmp_path / "old.json"), str(tmp_path / "new.ndjson"),
+                             "--json", str(out_json), "--html", str(out_html)])
+    assert status == 1   # a check is newly failing
+    delta = json.loads(out_json.read_text(encoding="utf-8"))
+    assert delta["counts"] == {"newly_failing": 1, "newly_passing": 0, "changed_details": 0,
+                               "added": 1, "removed": 0}
+    assert (delta["new"]["passed"], delta["new"]["failed"]) == (1, 1)
+    assert "Newly failing (1)" in out_html.read_text(encoding="utf-8")
+
+def test_diff_of_a_hosts_two_latest_history_scans(tmp_path):
+    db = str(tmp_path / "history.db")
+    for scan_time, status in (("2026-01-01", "PASS"), ("2026-01-02", "PASS"), ("2026-01-03", "FAIL")):
+        result = RuleResult(1, "Check 1", status, "d", "", "", "", [], "all")
+        history.record_scan(db, [result], "h", "Windows 10", scan_time=scan_time)
+    out_json = tmp_path / "delta.json"
+    assert scan_diff.main(["--db", db, "--host", "h", "--json", str(out_json),
+                           "--html", str(tmp_path / "delta.html")]) == 1
+    delta = json.loads(out_json.read_text(encoding="utf-8"))
+    assert (delta["old"]["scan_time"], delta["new"]["scan_time"]) == ("2026-01-02", "2026-01-03")
+    assert [item["id"] for item in delta["newly_failing"]] == [1]
+
+def test_diff_of_a_missing_history_database(tmp_path, capsys):
+    db = tmp_path / "typo.db"
+    assert scan_diff.main(["--db", str(db), "1", "2"]) == 1
+    assert "No history database" in capsys.readouterr().out
+    assert not db.exists()
+
+def test_non_numeric_scan_ids_are_a_usage_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        scan_diff.main(["--db", str(tmp_path / "history.db"), "latest", "2"])
+    assert exit_info.value.code == 2
+    assert "scan ids must be numbers" in capsys.readouterr().err
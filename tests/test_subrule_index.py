@@ -0,0 +1,46 @@
+# File: tests/test_subrule_index.py
+
+import pytest
+
+from commands import CommandCache, SHELL_WORKERS_SUPPORTED
+from conftest import write_policy
+from evaluator import run_checks
+from executor import execute_subrule
+from parser import load_all_policies
+from registry import RegistryReader, FakeRegistryBackend
+from subrule_index import SubRuleIndex
+
+LSA = r"HKLM\SYSTEM\CurrentControlSet\Control\Lsa"
+
+def scan(policies, execute):
+    index = SubRuleIndex(policies)
+    rules = [rule for sca_file in policies for rule in sca_file.checks]
+    results = run_checks(rules, index.wrap(execute), verdicts=index.verdicts)
+    return {r.rule_id: r.status for r in results}, index
+
+def test_registry_subrules_written_differently_share_one_read(tmp_path):
+    write_policy(tmp_path, [
+        (1, "all", [f"r:{LSA} -> LimitBlankPasswordUse -> 1"]),
+        (2, "all", [r"r:HKEY_LOCAL_MACHINE\system\currentcontrolset\control\lsa -> limitblankpassworduse -> 1"]),
+        (3, "all", [f"r:{LSA} -> LimitBlankPasswordUse -> 0"]),
+    ])
+    backend = FakeRegistryBackend({LSA: {"LimitBlankPasswordUse": 1}})
+    registry = RegistryReader(backend)
+    statuses, index = scan(load_all_policies(str(tmp_path)), lambda s: execute_subrule(s, registry))
+    assert statuses == {1: "PASS", 2: "PASS", 3: "FAIL"}
+    assert index.distinct == 2
+    assert (index.executed, index.reused) == (2, 1)
+    assert backend.calls["query_value"] == 1
+
+@pytest.mark.skipif(not SHELL_WORKERS_SUPPORTED, reason="POSIX shell commands")
+def test_case_distinct_commands_are_evaluated_separately(tmp_path):
+    write_policy(tmp_path, [
+        (1, "all", ["cmd:echo A | grep -c A -> 1"]),
+        (2, "all", ["cmd:echo a | grep -c A -> 1"]),
+    ])
+    commands = CommandCache()
+    statuses, index = scan(load_all_policies(str(tmp_path)), lambda s: execute_subrule(s, commands=commands))
+    # Folded into one key, check 2 would have been given check 1's output
+    assert statuses == {1: "PASS", 2: "FAIL"}
+    assert index.distinct == 2
+    assert commands.spawns == 2